@@ -0,0 +1,254 @@
+"""
+Synthetic Radarr/Sonarr libraries and the matching JustWatch catalogue.
+
+Everything is generated from a seed so two runs with the same parameters
+produce exactly the same library, search results and offers.
+"""
+
+import random
+
+
+PACKAGES = [
+    {"packageId": 8, "clearName": "Netflix", "shortName": "nfx"},
+    {"packageId": 119, "clearName": "Amazon Prime Video", "shortName": "prv"},
+    {"packageId": 337, "clearName": "Disney Plus", "shortName": "dnp"},
+    {"packageId": 350, "clearName": "Apple TV", "shortName": "atp"},
+    {"packageId": 384, "clearName": "HBO Max", "shortName": "hbm"},
+    {"packageId": 149, "clearName": "Movistar Plus", "shortName": "mvp"},
+    {"packageId": 63, "clearName": "Filmin", "shortName": "fmn"},
+    {"packageId": 1773, "clearName": "SkyShowtime", "shortName": "sst"},
+]
+
+WORDS = [
+    "silent",
+    "river",
+    "night",
+    "shadow",
+    "empire",
+    "golden",
+    "last",
+    "winter",
+    "broken",
+    "crown",
+    "storm",
+    "hidden",
+    "city",
+    "dark",
+    "fire",
+    "lost",
+    "secret",
+    "ocean",
+    "iron",
+    "glass",
+    "wild",
+    "red",
+    "queen",
+    "edge",
+    "black",
+    "summer",
+    "north",
+    "echo",
+    "blue",
+    "garden",
+    "stone",
+    "dream",
+    "king",
+    "ghost",
+    "silver",
+    "road",
+    "island",
+    "heart",
+    "star",
+]
+
+
+class Catalogue:
+    """
+    The JustWatch side of a synthetic library.
+
+    Titles are kept as plain dicts keyed by their JustWatch node id. Seasons
+    and episodes are not materialized; they are derived from the show when
+    requested so a 50k series library stays small in memory.
+    """
+
+    def __init__(self, seed):
+        self.seed = seed
+        self.titles = {}
+        self.by_word = {}
+
+    def add(self, node):
+        self.titles[node["id"]] = node
+        first_word = node["title"].split(" ")[0].lower()
+        self.by_word.setdefault(first_word, []).append(node)
+
+    def search(self, query):
+        """
+        Return every title sharing the first word of `query`. Exact title matches
+        rank first, the rest follow by popularity like JustWatch's fuzzy search.
+        """
+        query = query.lower()
+        candidates = self.by_word.get(query.split(" ")[0], [])
+
+        return sorted(
+            candidates,
+            key=lambda node: (node["title"].lower() != query, -node["popularity"]),
+        )
+
+    def get_season(self, season_id):
+        """Build a season node on the fly from its show."""
+        show_id, _, number = season_id.partition("x")
+        show = self.titles.get(show_id.replace("tss", "ts", 1))
+        if not show or not number.isdigit() or int(number) > show["season_count"]:
+            return None
+
+        rng = random.Random(f"{self.seed}-{season_id}")
+        episodes = []
+        for episode in range(1, show["episode_count"] + 1):
+            # Only some episodes carry each offer, like partial season licensing
+            offers = [offer for offer in show["offers"] if rng.random() < 0.8]
+            episodes.append({"id": f"{season_id}e{episode}", "offers": offers})
+
+        return {
+            "id": season_id,
+            "objectType": "SHOW_SEASON",
+            "content": {"title": f"Season {number}"},
+            "episodes": episodes,
+        }
+
+    def churn(self, fraction):
+        """Change the offers of a fraction of the catalogue, as a night of licensing changes."""
+        rng = random.Random(f"{self.seed}-churn-{fraction}")
+        for node in self.titles.values():
+            if rng.random() < fraction:
+                node["offers"] = _random_offers(rng)
+
+
+def _random_offers(rng):
+    offers = []
+    for package in PACKAGES:
+        if rng.random() < 0.15:
+            offers.append(
+                {
+                    "monetizationType": "FLATRATE",
+                    "availableTo": None,
+                    "package": dict(package),
+                }
+            )
+
+    return offers
+
+
+def _random_title(rng, index):
+    words = rng.sample(WORDS, rng.randint(1, 3))
+    return " ".join(word.capitalize() for word in words) + f" {index}"
+
+
+def _node(object_type, jw_id, title, year, imdb_id, tmdb_id, rng):
+    return {
+        "id": jw_id,
+        "objectType": object_type,
+        "title": title,
+        "year": year,
+        "imdbId": imdb_id,
+        "tmdbId": tmdb_id,
+        "popularity": rng.random(),
+        "offers": _random_offers(rng),
+    }
+
+
+def generate_movies(size, seed=1, missing_rate=0.1, year_drift_rate=0.05, remake_rate=0.1):
+    """
+    Generate `size` Radarr movies and the JustWatch catalogue they resolve against.
+
+    :missing_rate: fraction of movies that do not exist on JustWatch at all
+    :year_drift_rate: fraction of movies whose JustWatch year is off by one
+    :remake_rate: fraction of movies with a same-titled decoy from another year
+    """
+    rng = random.Random(f"{seed}-movies")
+    catalogue = Catalogue(seed)
+    movies = []
+
+    for index in range(1, size + 1):
+        title = _random_title(rng, index)
+        year = rng.randint(1950, 2024)
+        tmdb_id = 100000 + index
+        imdb_id = f"tt{1000000 + index}"
+
+        movies.append(
+            {
+                "id": index,
+                "title": title,
+                "year": year,
+                "tmdbId": tmdb_id,
+                "imdbId": imdb_id,
+                "inCinemas": f"{year}-01-01T00:00:00Z",
+                "added": f"{min(year + 1, 2024)}-06-01T00:00:00Z",
+                "monitored": True,
+                "tags": [],
+            }
+        )
+
+        if rng.random() < missing_rate:
+            continue
+
+        jw_year = year + rng.choice([-1, 1]) if rng.random() < year_drift_rate else year
+        catalogue.add(_node("MOVIE", f"tm{index}", title, jw_year, imdb_id, tmdb_id, rng))
+
+        if rng.random() < remake_rate:
+            catalogue.add(
+                _node(
+                    "MOVIE",
+                    f"tm{index + 10000000}",
+                    title,
+                    year + rng.randint(5, 30),
+                    f"tt{9000000 + index}",
+                    900000 + index,
+                    rng,
+                )
+            )
+
+    return movies, catalogue
+
+
+def generate_series(size, seed=1, missing_rate=0.1, max_seasons=5, max_episodes=12):
+    """
+    Generate `size` Sonarr series and the JustWatch catalogue they resolve against.
+
+    Every series carries an IMDB ID so the run never needs the TMDB fallback.
+    """
+    rng = random.Random(f"{seed}-series")
+    catalogue = Catalogue(seed)
+    series = []
+
+    for index in range(1, size + 1):
+        title = _random_title(rng, index)
+        year = rng.randint(1990, 2024)
+        imdb_id = f"tt{2000000 + index}"
+        season_count = rng.randint(1, max_seasons)
+
+        series.append(
+            {
+                "id": index,
+                "title": title,
+                "year": year,
+                "imdbId": imdb_id,
+                "tvdbId": 300000 + index,
+                "added": f"{min(year + 1, 2024)}-06-01T00:00:00Z",
+                "monitored": True,
+                "seasons": [
+                    {"seasonNumber": number, "monitored": True}
+                    for number in range(1, season_count + 1)
+                ],
+                "tags": [],
+            }
+        )
+
+        if rng.random() < missing_rate:
+            continue
+
+        node = _node("SHOW", f"ts{index}", title, year, imdb_id, 200000 + index, rng)
+        node["season_count"] = season_count
+        node["episode_count"] = rng.randint(4, max_episodes)
+        catalogue.add(node)
+
+    return series, catalogue
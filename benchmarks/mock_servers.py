@@ -0,0 +1,342 @@
+"""
+Local HTTP stand-ins for JustWatch and the Radarr/Sonarr v3 APIs.
+
+The servers only implement what Tagarr talks to: the JustWatch GraphQL
+queries (`packages`, `popularTitles`, `node`) plus the locale list, and the
+Arr movie/series, editor and tag endpoints. Each server can add latency and
+answer a configurable share of requests with 5xx or 429 errors.
+"""
+
+import json
+import random
+import re
+import threading
+import time
+
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from benchmarks.library import PACKAGES
+
+
+class Faults:
+    """Latency and failure injection shared by all handlers of a server."""
+
+    def __init__(self, latency=0.0, error_rate=0.0, rate_limit_rate=0.0, seed=1):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def pick(self):
+        """Return the status code to fail with, or None to serve the request."""
+        with self._lock:
+            roll = self._random.random()
+
+        if roll < self.error_rate:
+            return 500
+        if roll < self.error_rate + self.rate_limit_rate:
+            return 429
+        return None
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, handler, faults=None):
+        super().__init__(("127.0.0.1", 0), handler)
+        self.faults = faults or Faults()
+        self.requests = Counter()
+        self.lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, label):
+        with self.lock:
+            self.requests[label] += 1
+
+    def reset_counts(self):
+        with self.lock:
+            self.requests.clear()
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return None
+        return json.loads(self.rfile.read(length))
+
+    def _send(self, status, payload=None):
+        body = json.dumps(payload).encode() if payload is not None else b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self, method):
+        path = urlsplit(self.path).path
+        body = self._read_json() if method in ("POST", "PUT") else None
+        label = self.route_label(method, path, body)
+        self.server.count(label)
+
+        if self.server.faults.latency:
+            time.sleep(self.server.faults.latency)
+
+        status = self.server.faults.pick()
+        if status:
+            return self._send(status, {"message": "injected failure"})
+
+        status, payload = self.route(method, path, body)
+        self._send(status, payload)
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_PUT(self):
+        self._handle("PUT")
+
+    def route_label(self, method, path, body):
+        return f"{method} {path}"
+
+    def route(self, method, path, body):
+        return 404, {"message": "not found"}
+
+
+class JustWatchHandler(_Handler):
+    """Answers the GraphQL queries sent by `tagarr.modules.justwatch.JustWatch`."""
+
+    LOCALES = [
+        {"full_locale": "en_US", "iso_3166_2": "US"},
+        {"full_locale": "es_ES", "iso_3166_2": "ES"},
+        {"full_locale": "nl_NL", "iso_3166_2": "NL"},
+    ]
+
+    def route_label(self, method, path, body):
+        if path.endswith("/graphql") and body:
+            query = body.get("query", "")
+            for operation in ("popularTitles", "packages", "node"):
+                if f"{operation}(" in query:
+                    return f"graphql {operation}"
+        return f"{method} {path}"
+
+    def route(self, method, path, body):
+        if method == "GET" and path == "/content/locales/state":
+            return 200, self.LOCALES
+
+        if method != "POST" or path != "/graphql" or not body:
+            return 404, {"message": "not found"}
+
+        query = body.get("query", "")
+        variables = body.get("variables") or {}
+
+        if "popularTitles(" in query:
+            return 200, {"data": {"popularTitles": self._popular_titles(variables)}}
+        if "node(" in query:
+            return 200, {"data": {"node": self._node(variables["nodeId"])}}
+        if "packages(" in query:
+            return 200, {"data": {"packages": PACKAGES}}
+
+        return 400, {"errors": [{"message": "unsupported query"}]}
+
+    def _popular_titles(self, variables):
+        catalogue = self.server.catalogue
+        gql_filter = variables.get("filter") or {}
+        first = variables.get("first", 20)
+        offset = int(variables.get("after") or 0)
+
+        object_types = set(gql_filter.get("objectTypes") or [])
+        packages = set(gql_filter.get("packages") or [])
+        years = gql_filter.get("releaseYear") or {}
+
+        if gql_filter.get("searchQuery"):
+            candidates = catalogue.search(gql_filter["searchQuery"])
+        else:
+            candidates = catalogue.titles.values()
+
+        matches = []
+        for node in candidates:
+            if object_types and node["objectType"] not in object_types:
+                continue
+            if "min" in years and node["year"] < years["min"]:
+                continue
+            if "max" in years and node["year"] > years["max"]:
+                continue
+            if packages and not any(
+                offer["package"]["shortName"] in packages for offer in node["offers"]
+            ):
+                continue
+            matches.append(node)
+
+        page = matches[offset : offset + first]
+        end_cursor = str(offset + len(page))
+
+        return {
+            "totalCount": len(matches),
+            "pageInfo": {
+                "endCursor": end_cursor,
+                "hasNextPage": offset + len(page) < len(matches),
+            },
+            "edges": [
+                {"cursor": str(offset + index + 1), "node": self._render(node)}
+                for index, node in enumerate(page)
+            ],
+        }
+
+    def _node(self, node_id):
+        catalogue = self.server.catalogue
+        if node_id.startswith("tss"):
+            return catalogue.get_season(node_id)
+
+        node = catalogue.titles.get(node_id)
+        return self._render(node) if node else None
+
+    def _render(self, node):
+        rendered = {
+            "id": node["id"],
+            "objectType": node["objectType"],
+            "content": {
+                "title": node["title"],
+                "originalReleaseYear": node["year"],
+                "externalIds": {"imdbId": node["imdbId"], "tmdbId": str(node["tmdbId"])},
+            },
+            "offers": node["offers"],
+        }
+
+        if node["objectType"] == "SHOW":
+            rendered["seasons"] = [
+                {"id": f"tss{node['id'][2:]}x{number}"}
+                for number in range(1, node["season_count"] + 1)
+            ]
+
+        return rendered
+
+
+class ArrHandler(_Handler):
+    """
+    Answers the Radarr or Sonarr v3 endpoints used by pyarr, depending on
+    `server.resource` being "movie" or "series".
+    """
+
+    _path_re = re.compile(r"^/api/v3/(?P<resource>[a-z]+)(?:/(?P<rest>[a-z0-9]+))?/?$")
+
+    def route_label(self, method, path, body):
+        match = self._path_re.match(path)
+        if not match:
+            return f"{method} {path}"
+
+        rest = match.group("rest")
+        if rest and rest.isdigit():
+            rest = "{id}"
+        return f"{method} {match.group('resource')}{'/' + rest if rest else ''}"
+
+    def route(self, method, path, body):
+        match = self._path_re.match(path)
+        if not match:
+            return 404, {"message": "not found"}
+
+        resource, rest = match.group("resource"), match.group("rest")
+
+        if resource == "tag":
+            return self._tags(method, body)
+        if resource != self.server.resource:
+            return 404, {"message": "not found"}
+        if rest == "editor" and method == "PUT":
+            return self._editor(body)
+
+        items = self.server.items
+        with self.server.lock:
+            if method == "GET" and rest is None:
+                return 200, list(items.values())
+
+            item_id = int(rest) if rest and rest.isdigit() else (body or {}).get("id")
+            if item_id not in items:
+                return 404, {"message": "not found"}
+
+            if method == "GET":
+                return 200, items[item_id]
+            if method == "PUT":
+                items[item_id]["tags"] = list(body.get("tags", []))
+                return 202, items[item_id]
+
+        return 405, {"message": "method not allowed"}
+
+    def _tags(self, method, body):
+        tags = self.server.tags
+        with self.server.lock:
+            if method == "GET":
+                return 200, list(tags.values())
+
+            if method == "POST":
+                label = body["label"].lower()
+                for tag in tags.values():
+                    if tag["label"] == label:
+                        return 201, tag
+
+                tag = {"id": len(tags) + 1, "label": label}
+                tags[tag["id"]] = tag
+                return 201, tag
+
+        return 405, {"message": "method not allowed"}
+
+    def _editor(self, body):
+        id_key = "movieIds" if self.server.resource == "movie" else "seriesIds"
+        tag_ids = set(body.get("tags", []))
+        apply_tags = body.get("applyTags", "add")
+        updated = []
+
+        with self.server.lock:
+            for item_id in body.get(id_key, []):
+                item = self.server.items.get(item_id)
+                if item is None:
+                    continue
+
+                if apply_tags == "add":
+                    item["tags"] = sorted(set(item["tags"]) | tag_ids)
+                elif apply_tags == "remove":
+                    item["tags"] = sorted(set(item["tags"]) - tag_ids)
+                else:
+                    item["tags"] = sorted(tag_ids)
+                updated.append(item)
+
+        return 202, updated
+
+
+def justwatch_server(catalogue, faults=None):
+    server = MockServer(JustWatchHandler, faults)
+    server.catalogue = catalogue
+    return server
+
+
+def arr_server(resource, items, faults=None):
+    """Create a Radarr (`resource="movie"`) or Sonarr (`resource="series"`) stand-in."""
+    server = MockServer(ArrHandler, faults)
+    server.resource = resource
+    server.items = {item["id"]: item for item in items}
+    server.tags = {}
+    return server
@@ -0,0 +1,198 @@
+"""
+End-to-end benchmark of the Tagarr CLI against local mock servers.
+
+For every library size the harness generates a synthetic library, starts a
+JustWatch and a Radarr/Sonarr stand-in, and runs `tag`, `clean` and
+`purge-tag` in a subprocess. Between `tag` and `clean` part of the
+catalogue changes its offers so `clean` has stale tags to remove.
+
+Usage:
+
+    python -m benchmarks.run radarr --size 1000 --size 10000 --size 50000
+    python -m benchmarks.run sonarr --size 1000 --latency 0.02 --rate-limit-rate 0.01
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from pathlib import Path
+from typing import List, Optional
+
+import typer
+import yaml
+
+from rich.console import Console
+from rich.table import Table
+from rich import box
+
+from benchmarks.library import generate_movies, generate_series
+from benchmarks.mock_servers import Faults, arr_server, justwatch_server
+
+
+ROOT = Path(__file__).resolve().parent.parent
+COMMANDS = ["tag", "clean", "purge-tag"]
+PROVIDERS = ["Netflix", "Amazon Prime Video", "Disney Plus"]
+NOT_AVAILABLE_TAG = "no-streaming"
+
+app = typer.Typer()
+
+
+def _write_config(workdir, service, justwatch_url, arr_url, fast_search, **general):
+    config = {
+        "general": {
+            "fast_search": fast_search,
+            "locale": "en_US",
+            "not_available_tag": NOT_AVAILABLE_TAG,
+            "providers": PROVIDERS,
+            **general,
+        },
+        "justwatch": {"url": justwatch_url},
+        service: {"url": arr_url, "api_key": "benchmark", "verify_ssl": False},
+    }
+
+    with open(workdir / ".tagarr.yml", "w") as _file:
+        yaml.safe_dump(config, _file)
+
+
+def _run_command(workdir, service, command, extra_args):
+    """Run one CLI command and return its wall time, exit code and peak RSS in MB."""
+    env = dict(os.environ)
+    env["HOME"] = str(workdir)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(ROOT), env.get("PYTHONPATH")]))
+
+    args = [sys.executable, "-m", "tagarr.main", service, command, *extra_args]
+    with open(workdir / f"{service}-{command}.log", "w") as log:
+        start = time.perf_counter()
+        process = subprocess.Popen(args, cwd=workdir, env=env, stdout=log, stderr=log)
+        _, status, rusage = os.wait4(process.pid, 0)
+        elapsed = time.perf_counter() - start
+
+    # Linux reports ru_maxrss in kilobytes
+    return elapsed, os.waitstatus_to_exitcode(status), rusage.ru_maxrss / 1024
+
+
+def run_benchmark(service, size, faults, churn, fast_search, seed, extra_args):
+    if service == "radarr":
+        items, catalogue = generate_movies(size, seed=seed)
+        resource = "movie"
+    else:
+        items, catalogue = generate_series(size, seed=seed)
+        resource = "series"
+
+    justwatch = justwatch_server(catalogue, Faults(**faults, seed=seed)).start()
+    arr = arr_server(resource, items, Faults(**faults, seed=seed + 1)).start()
+
+    results = []
+    try:
+        with tempfile.TemporaryDirectory(prefix="tagarr-bench-") as tmp:
+            workdir = Path(tmp)
+            # The catalogue churns between runs seconds apart, so clean rechecks every title
+            _write_config(
+                workdir, service, justwatch.url, arr.url, fast_search, clean_recheck_days=0
+            )
+
+            for command in COMMANDS:
+                if command == "clean":
+                    catalogue.churn(churn)
+
+                justwatch.reset_counts()
+                arr.reset_counts()
+
+                args = extra_args if command != "purge-tag" else []
+                elapsed, exit_code, peak_rss = _run_command(workdir, service, command, args)
+
+                results.append(
+                    {
+                        "service": service,
+                        "command": command,
+                        "size": size,
+                        "exit_code": exit_code,
+                        "seconds": round(elapsed, 3),
+                        "items_per_second": round(size / elapsed, 1) if elapsed else None,
+                        "justwatch_requests": sum(justwatch.requests.values()),
+                        "arr_requests": sum(arr.requests.values()),
+                        "peak_rss_mb": round(peak_rss, 1),
+                        "requests": {
+                            **{f"justwatch {k}": v for k, v in justwatch.requests.items()},
+                            **{f"{service} {k}": v for k, v in arr.requests.items()},
+                        },
+                    }
+                )
+    finally:
+        justwatch.stop()
+        arr.stop()
+
+    return results
+
+
+def print_results(results):
+    console = Console()
+
+    table = Table(show_footer=False, row_styles=["none", "dim"], box=box.MINIMAL, pad_edge=False)
+    table.add_column("Command")
+    table.add_column("Size", justify="right")
+    table.add_column("Exit", justify="right")
+    table.add_column("Seconds", justify="right")
+    table.add_column("Items/s", justify="right")
+    table.add_column("JustWatch req", justify="right")
+    table.add_column("Arr req", justify="right")
+    table.add_column("Peak RSS (MB)", justify="right")
+
+    for result in results:
+        table.add_row(
+            f"{result['service']} {result['command']}",
+            str(result["size"]),
+            str(result["exit_code"]),
+            f"{result['seconds']:.2f}",
+            str(result["items_per_second"]),
+            str(result["justwatch_requests"]),
+            str(result["arr_requests"]),
+            f"{result['peak_rss_mb']:.1f}",
+        )
+
+    console.print(table)
+
+
+@app.command()
+def main(
+    service: str = typer.Argument(..., help="radarr or sonarr"),
+    sizes: Optional[List[int]] = typer.Option(
+        None, "--size", help="Library size to benchmark. Repeat for several sizes."
+    ),
+    latency: float = typer.Option(0.0, help="Seconds of latency added to every request."),
+    error_rate: float = typer.Option(0.0, help="Share of requests answered with a 500."),
+    rate_limit_rate: float = typer.Option(0.0, help="Share of requests answered with a 429."),
+    churn: float = typer.Option(
+        0.2, help="Share of the catalogue whose offers change before clean."
+    ),
+    fast_search: bool = typer.Option(True, help="Value of general.fast_search in the config."),
+    seed: int = typer.Option(1, help="Seed for the synthetic library."),
+    json_out: Optional[Path] = typer.Option(None, "--json", help="Also write the results as JSON."),
+    extra_args: Optional[List[str]] = typer.Option(
+        None, "--arg", help="Extra argument passed to tag/clean. Repeat for several."
+    ),
+):
+    if service not in ("radarr", "sonarr"):
+        raise typer.BadParameter("service must be radarr or sonarr")
+
+    faults = {"latency": latency, "error_rate": error_rate, "rate_limit_rate": rate_limit_rate}
+
+    results = []
+    for size in sizes or [1000, 10000, 50000]:
+        results.extend(
+            run_benchmark(service, size, faults, churn, fast_search, seed, extra_args or [])
+        )
+
+    print_results(results)
+
+    if json_out:
+        with open(json_out, "w") as _file:
+            json.dump(results, _file, indent=2)
+
+
+if __name__ == "__main__":
+    app()
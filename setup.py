@@ -31,7 +31,7 @@ setup(
     ],
     license="MIT",
     keywords="tagarr, radarr, sonarr, streaming, tags, netflix, management, library",
-    packages=find_packages(exclude=["ez_setup", "tests*"]),
+    packages=find_packages(exclude=["ez_setup", "tests*", "benchmarks*"]),
     python_requires=">=3.6, <4",
     install_requires=[
         "typer>=0.4.1",
@@ -39,7 +39,7 @@ setup(
         "rich>=12.4.1",
         "requests>=2.27.1",
         "PyYAML>=6.0",
-        "pyarr>=3.1.3",
+        "pyarr>=5.2.0,<6",
     ],
     entry_points={
         "console_scripts": [
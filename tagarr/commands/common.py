@@ -0,0 +1,183 @@
+"""
+Options and run wiring shared by the radarr and sonarr commands.
+"""
+
+import rich
+import sys
+import typer
+
+import tagarr.utils.budget as budget
+import tagarr.utils.output as output
+
+from tagarr.core.planner import Plan
+from tagarr.utils.enums import RunOutput
+from tagarr.utils.sharding import Shard, check_workers, run_workers
+from tagarr.utils.store import TooManyProviders
+
+
+def _parse_shard(value):
+    if value is None:
+        return None
+
+    try:
+        return Shard.parse(value)
+    except ValueError as e:
+        raise typer.BadParameter(str(e))
+
+
+def _parse_time_budget(value):
+    if value is None:
+        return None
+
+    try:
+        return budget.parse_duration(value)
+    except ValueError as e:
+        raise typer.BadParameter(str(e))
+
+
+PROVIDER_OPTION = typer.Option(
+    None,
+    "-p",
+    "--provider",
+    metavar="PROVIDER",
+    help="Sobrescribe los proveedores de streaming configurados.",
+)
+LOCALE_OPTION = typer.Option(
+    None, "-l", "--locale", metavar="LOCALE", help="Tu localización, p. ej: es_ES."
+)
+PROGRESS_OPTION = typer.Option(False, "--progress", help="Muestra una barra de progreso.")
+RESUME_OPTION = typer.Option(
+    False,
+    "--resume",
+    help="Continúa una ejecución interrumpida desde su último punto de control.",
+)
+SHARD_OPTION = typer.Option(
+    None,
+    "--shard",
+    metavar="I/N",
+    callback=_parse_shard,
+    help="Procesa solo la parte I de N de la biblioteca (p. ej. 1/3), repartida por ID.",
+)
+PLAN_SHARD_OPTION = typer.Option(
+    None,
+    "--shard",
+    metavar="I/N",
+    callback=_parse_shard,
+    help="Planifica solo la parte I de N de la biblioteca (p. ej. 1/3), repartida por ID.",
+)
+WORKERS_OPTION = typer.Option(
+    1,
+    "--workers",
+    metavar="N",
+    min=1,
+    help="Reparte la biblioteca entre N procesos en paralelo.",
+)
+CATALOGUE_OPTION = typer.Option(
+    False,
+    "--catalogue",
+    help="Cruza la biblioteca con el catálogo completo de los proveedores.",
+)
+TIME_BUDGET_OPTION = typer.Option(
+    None,
+    "--time-budget",
+    metavar="DURATION",
+    callback=_parse_time_budget,
+    help="Deja de comprobar títulos pasado este tiempo (p. ej. 45m) y aplica lo encontrado.",
+)
+REQUEST_BUDGET_OPTION = typer.Option(
+    None,
+    "--request-budget",
+    metavar="N",
+    min=1,
+    help="Deja de comprobar títulos tras N peticiones a JustWatch/TMDB y aplica lo encontrado.",
+)
+OUTPUT_OPTION = typer.Option(
+    RunOutput.table,
+    "-o",
+    "--output",
+    help=(
+        "Salida: table, jsonl o csv (un registro por cambio, a medida que se escriben) "
+        "o summary (solo recuentos)."
+    ),
+)
+
+
+def streams_records(output_format):
+    """Whether the run writes a record per change to stdout instead of printing tables."""
+    return output_format in (RunOutput.jsonl, RunOutput.csv)
+
+
+def setup_run_output(output_format, loglevel):
+    """The records go to stdout, so the logs of a run streaming them go to stderr."""
+    if streams_records(output_format):
+        output.setup_logging(loglevel, sys.stderr)
+
+
+def progress_disabled(progress, loglevel):
+    """The progress bar is shown only when asked for and debug logging is not active."""
+    return not progress or loglevel == 10
+
+
+def check_parallelism(workers, shard):
+    if workers > 1 and shard:
+        raise typer.BadParameter("--workers y --shard no se pueden combinar")
+    try:
+        check_workers(workers)
+    except ValueError as e:
+        raise typer.BadParameter(str(e), param_hint="--workers")
+
+
+def worker_request_budget(request_budget, workers):
+    """Every worker gets its share of the requests."""
+    return -(-request_budget // workers) if request_budget else None
+
+
+def change_listener(output_format, instance):
+    """Stream the written changes of an instance in the jsonl and csv outputs, else None."""
+    if not streams_records(output_format):
+        return None
+
+    writer = output.RecordWriter(output.CHANGE_COLUMNS, output_format.value)
+    return lambda change: writer.write(output.change_record(instance, change))
+
+
+def write_records_header(output_format):
+    if output_format == RunOutput.csv:
+        output.RecordWriter(output.CHANGE_COLUMNS, "csv").header()
+
+
+def exit_too_many_providers(error):
+    rich.print(f"No se puede guardar la disponibilidad en el almacén local: {error}")
+    raise typer.Exit(code=1)
+
+
+def run_sharded(target, workers, shard, **kwargs):
+    """
+    Run `target` on one shard (or the whole library), or on every shard in
+    `workers` processes. Return the plans by instance.
+    """
+    try:
+        if workers == 1:
+            return target(shard=shard, **kwargs)
+
+        plans = {}
+        for shard_plans in run_workers(target, workers, **kwargs):
+            for name, shard_plan in shard_plans.items():
+                plans.setdefault(name, Plan()).merge(shard_plan)
+    except TooManyProviders as e:
+        exit_too_many_providers(e)
+
+    return plans
+
+
+def print_instance(service, name):
+    rich.print(f"\n[bold]Instancia de {service}: {name}[/bold]")
+
+
+def print_deferred(items):
+    deferred = budget.deferred()
+    if deferred:
+        rich.print(
+            f"Se agotó el presupuesto de la ejecución, {deferred} {items} quedan "
+            "para la próxima."
+        )
@@ -0,0 +1,69 @@
+import rich
+import typer
+
+from pathlib import Path
+from loguru import logger
+
+from tagarr.utils.config import Config
+from tagarr.utils.id_mapping import MappingReader
+from tagarr.utils.store import open_store
+
+app = typer.Typer()
+
+
+@app.command(
+    "import", help="Importa un fichero de mapeo de IDs (TVDB/IMDB → TMDB) al almacén local"
+)
+def import_(
+    file: Path = typer.Argument(
+        ...,
+        exists=True,
+        dir_okay=False,
+        metavar="FILE",
+        help="Fichero CSV o JSON Lines (opcionalmente .gz) con columnas tvdb_id/imdb_id y tmdb_id.",
+    ),
+):
+    """
+    Load a bulk id mapping into the local store, so Sonarr series can be
+    matched by TVDB id without TMDB API calls.
+    """
+    logger.debug("Got import as subcommand")
+
+    store = open_store(config.data_dir)
+    reader = MappingReader(file)
+
+    logger.debug(f"Importing id mappings from {file}")
+    store.add_id_mappings(reader)
+
+    imported = reader.rows - reader.skipped
+    rich.print(
+        f"Importadas {imported} filas de {file} ({reader.skipped} descartadas). "
+        f"El almacén local tiene {store.count_id_mappings()} IDs mapeados."
+    )
+    store.close()
+
+    if reader.rows and not imported:
+        rich.print(
+            "Ninguna fila tiene un ID de TMDB junto a un ID de TVDB o IMDB. Los exports "
+            "diarios de TMDB solo incluyen IDs de TMDB; usa un fichero con las columnas "
+            "tvdb_id/imdb_id y tmdb_id."
+        )
+        raise typer.Exit(code=1)
+
+
+@app.callback()
+def init():
+    """
+    Initializes the command. Reads the configuration.
+    """
+    logger.debug("Got ids as subcommand")
+
+    # Set globals
+    global config
+    global loglevel
+
+    # Hacky way to get the current log level context
+    loglevel = logger._core.min_level
+
+    logger.debug("Reading configuration file")
+    config = Config()
@@ -19,7 +19,7 @@ def list(
     if not locale:
         locale = config.locale
 
-    justwatch_client = justwatch.JustWatch(locale)
+    justwatch_client = justwatch.JustWatch(locale, api_url=config.justwatch_url)
     jw_providers = justwatch_client.get_providers()
 
     output.print_providers(jw_providers)
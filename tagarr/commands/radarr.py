@@ -1,153 +1,403 @@
 import rich
 import typer
 
+from pathlib import Path
 from typing import List, Optional
 from loguru import logger
 
+import tagarr.commands.common as common
+import tagarr.utils.budget as budget
 import tagarr.utils.output as output
 
+from tagarr.core.catalogue import Catalogue
+from tagarr.core.planner import Plan
 from tagarr.core.radarr_actions import RadarrActions
+from tagarr.utils.checkpoint import Checkpoint
 from tagarr.utils.config import Config
+from tagarr.utils.enums import RunOutput
+from tagarr.utils.plan_file import InvalidPlanFile, PlanReader, PlanWriter
+from tagarr.utils.sharding import TagLock
+from tagarr.utils.store import TooManyProviders, open_store
 
 app = typer.Typer()
 
 
+def _get_radarr_actions(locale, resolved=None, catalogue=None, record_checks=True):
+    return RadarrActions(
+        config.radarr_url,
+        config.radarr_api_key,
+        locale,
+        justwatch_url=config.justwatch_url,
+        justwatch_pool_size=config.justwatch_pool_size,
+        verify_ssl=config.radarr_verify_ssl,
+        timeout=config.radarr_timeout,
+        retries=config.radarr_retries,
+        pool_size=config.radarr_pool_size,
+        store=open_store(config.data_dir),
+        tag_lock=TagLock(
+            Path(config.data_dir).expanduser() / "locks" / f"{config.radarr_instance}-tags.lock"
+        ),
+        instance=config.radarr_instance,
+        resolved=resolved,
+        catalogue=catalogue,
+        recheck_interval=config.recheck_days * 86400,
+        clean_max_age=config.clean_recheck_days * 86400,
+        record_checks=record_checks,
+    )
+
+
+def _select_instances():
+    """Select the Radarr instances to run on: the one of --instance, or every configured one."""
+    global instances
+
+    if selected_instance:
+        try:
+            config.use_instance("radarr", selected_instance)
+        except ValueError as e:
+            raise typer.BadParameter(str(e), param_hint="--instance")
+
+        instances = [selected_instance]
+    else:
+        instances = config.instances("radarr")
+
+    return instances
+
+
+def _get_checkpoint(command, resume, shard=None):
+    name = f"{config.radarr_instance}-{command}"
+    if shard:
+        name += f"-{shard.index}of{shard.count}"
+
+    path = Path(config.data_dir).expanduser() / "checkpoints" / f"{name}.jsonl"
+    return Checkpoint(path, resume)
+
+
+def _get_catalogue(catalogue, movie_id=None):
+    """The catalogue to join the library against in catalogue mode, else None."""
+    # Crawling whole catalogues does not pay off for a single item
+    if not catalogue or movie_id:
+        return None
+
+    return Catalogue("movie")
+
+
+def _tag_shard(
+    shard,
+    locale,
+    providers,
+    disable_progress,
+    movie_id,
+    resume,
+    dry_run,
+    catalogue,
+    time_budget=None,
+    request_budget=None,
+    output_format=RunOutput.table,
+):
+    """
+    Resolve and tag the movies of a shard, or of the whole library, in every selected
+    instance. Return the plans by instance.
+    """
+    plans = {}
+    budget.start(time_budget, request_budget)
+
+    # Movies in several instances are resolved only once
+    resolved = {}
+    shared_catalogue = _get_catalogue(catalogue, movie_id)
+
+    for name in instances:
+        config.use_instance("radarr", name)
+        radarr = _get_radarr_actions(locale, resolved, shared_catalogue, record_checks=not dry_run)
+        checkpoint = None if dry_run else _get_checkpoint("tag", resume, shard)
+
+        # Resolve movies to tag and write them as they are found, skipping excluded titles
+        found = radarr.iter_movies_to_tag(
+            providers,
+            config.fast_search,
+            disable_progress,
+            not_available_tag=config.not_available_tag,
+            movie_id=movie_id,
+            checkpoint=checkpoint,
+            shard=shard,
+        )
+        pending = (
+            (arr_id, values)
+            for arr_id, values in found
+            if values["title"] not in config.radarr_excludes
+        )
+
+        # Only the movies whose tags change are written
+        plan = Plan(common.change_listener(output_format, name))
+        radarr.tag_movies(pending, checkpoint, plan=plan, dry_run=dry_run)
+
+        if checkpoint:
+            checkpoint.finish()
+
+        plans[name] = plan
+
+    return plans
+
+
 @app.command(help="Etiqueta películas en Radarr con sus proveedores de streaming")
 def tag(
-    providers: Optional[List[str]] = typer.Option(
-        None,
-        "-p",
-        "--provider",
-        metavar="PROVIDER",
-        help="Sobrescribe los proveedores de streaming configurados.",
-    ),
-    locale: Optional[str] = typer.Option(
-        None, "-l", "--locale", metavar="LOCALE", help="Tu localización, p. ej: es_ES."
-    ),
-    progress: bool = typer.Option(
-        False, "--progress", help="Muestra una barra de progreso."
-    ),
+    providers: Optional[List[str]] = common.PROVIDER_OPTION,
+    locale: Optional[str] = common.LOCALE_OPTION,
+    progress: bool = common.PROGRESS_OPTION,
     movie_id: Optional[int] = typer.Option(
-        None, "--id", metavar="ID",
+        None,
+        "--id",
+        metavar="ID",
         help="ID de Radarr de una película concreta a procesar.",
     ),
+    resume: bool = common.RESUME_OPTION,
+    dry_run: bool = typer.Option(
+        False,
+        "--dry-run",
+        help="Muestra los cambios planificados sin escribir nada en Radarr.",
+    ),
+    shard: Optional[str] = common.SHARD_OPTION,
+    workers: int = common.WORKERS_OPTION,
+    catalogue: bool = common.CATALOGUE_OPTION,
+    time_budget: Optional[str] = common.TIME_BUDGET_OPTION,
+    request_budget: Optional[int] = common.REQUEST_BUDGET_OPTION,
+    output_format: RunOutput = common.OUTPUT_OPTION,
 ):
     """
     Detect movies available on configured streaming providers and add tags
     in Radarr with the provider name (e.g. 'netflix', 'disney plus').
     """
+    common.setup_run_output(output_format, loglevel)
+
     logger.debug("Got tag as subcommand")
     logger.debug(f"Got CLI values for --progress option: {progress}")
 
+    _select_instances()
+
     # Disable the progress bar when debug logging is active
-    if loglevel == 10:
-        disable_progress = True
-    elif progress and loglevel != 10:
-        disable_progress = False
-    else:
-        disable_progress = True
+    disable_progress = common.progress_disabled(progress, loglevel)
 
     # Determine if CLI options should overwrite configuration settings
     if not providers:
         providers = config.providers
     if not locale:
         locale = config.locale
-
-    # Setup Radarr Actions
-    radarr = RadarrActions(config.radarr_url, config.radarr_api_key, locale)
-
-    # Get movies to tag
-    movies_to_tag = radarr.get_movies_to_tag(
-        providers, config.fast_search, disable_progress,
-        not_available_tag=config.not_available_tag, movie_id=movie_id
+    if not catalogue:
+        catalogue = config.catalogue_mode
+
+    common.check_parallelism(workers, shard)
+    common.write_records_header(output_format)
+
+    plans = common.run_sharded(
+        _tag_shard,
+        workers,
+        shard,
+        locale=locale,
+        providers=providers,
+        disable_progress=disable_progress or workers > 1,
+        movie_id=movie_id,
+        resume=resume,
+        dry_run=dry_run,
+        catalogue=catalogue,
+        time_budget=time_budget,
+        request_budget=common.worker_request_budget(request_budget, workers),
+        output_format=output_format,
     )
 
-    # Filter out excluded titles
-    movies_to_tag = {
-        id: values
-        for id, values in movies_to_tag.items()
-        if values["title"] not in config.radarr_excludes
-    }
-
-    if movies_to_tag:
-        # Apply tags automatically
-        radarr.tag_movies(movies_to_tag)
-
-        # Print summary
-        output.print_movies_tagged(movies_to_tag)
-
-        rich.print(f"\nSuccessfully tagged {len(movies_to_tag)} movies in Radarr!")
-    else:
-        rich.print("No movies found on the configured streaming providers to tag.")
+    # The changes were streamed as they were written
+    if common.streams_records(output_format):
+        return
+
+    for name, plan in plans.items():
+        if len(plans) > 1:
+            common.print_instance("Radarr", name)
+
+        movies_tagged = {
+            change.arr_id: {"title": change.title, "providers": change.add}
+            for change in plan.changes
+        }
+
+        if output_format == RunOutput.summary:
+            output.print_change_summary(plan)
+        elif movies_tagged:
+            # Print summary
+            output.print_movies_tagged(movies_tagged)
+
+            if dry_run:
+                rich.print(
+                    f"\nSimulación: se etiquetarían {len(movies_tagged)} películas en Radarr, "
+                    "no se ha escrito nada."
+                )
+            else:
+                rich.print(f"\nSuccessfully tagged {len(movies_tagged)} movies in Radarr!")
+        elif plan.total:
+            rich.print(
+                f"Las {plan.total} películas encontradas en los proveedores de streaming "
+                "configurados ya están etiquetadas."
+            )
+        else:
+            rich.print("No movies found on the configured streaming providers to tag.")
+
+        output.print_plan_counts(plan)
+
+    common.print_deferred("películas")
+
+
+def _clean_shard(
+    shard,
+    locale,
+    providers,
+    disable_progress,
+    movie_id,
+    resume,
+    dry_run,
+    catalogue,
+    time_budget=None,
+    request_budget=None,
+    output_format=RunOutput.table,
+):
+    """
+    Find and clean the movies of a shard, or of the whole library, in every selected
+    instance. Return the plans by instance.
+    """
+    plans = {}
+    budget.start(time_budget, request_budget)
+
+    # Movies in several instances are resolved only once
+    resolved = {}
+    shared_catalogue = _get_catalogue(catalogue, movie_id)
+
+    for name in instances:
+        config.use_instance("radarr", name)
+        radarr = _get_radarr_actions(locale, resolved, shared_catalogue, record_checks=not dry_run)
+        checkpoint = None if dry_run else _get_checkpoint("clean", resume, shard)
+
+        # Resolve movies to clean and write them as they are found, skipping excluded titles
+        found = radarr.iter_movies_to_clean(
+            providers,
+            config.fast_search,
+            disable_progress,
+            not_available_tag=config.not_available_tag,
+            movie_id=movie_id,
+            checkpoint=checkpoint,
+            shard=shard,
+        )
+        pending = (
+            (arr_id, values)
+            for arr_id, values in found
+            if values["title"] not in config.radarr_excludes
+        )
+
+        # Only the movies whose tags change are written
+        plan = Plan(common.change_listener(output_format, name))
+        radarr.clean_tags(pending, checkpoint, plan=plan, dry_run=dry_run)
+
+        if checkpoint:
+            checkpoint.finish()
+
+        plans[name] = plan
+
+    return plans
 
 
 @app.command(help="Elimina etiquetas obsoletas de proveedores de streaming en Radarr")
 def clean(
-    providers: Optional[List[str]] = typer.Option(
-        None,
-        "-p",
-        "--provider",
-        metavar="PROVIDER",
-        help="Sobrescribe los proveedores de streaming configurados.",
-    ),
-    locale: Optional[str] = typer.Option(
-        None, "-l", "--locale", metavar="LOCALE", help="Tu localización, p. ej: es_ES."
-    ),
-    progress: bool = typer.Option(
-        False, "--progress", help="Muestra una barra de progreso."
-    ),
+    providers: Optional[List[str]] = common.PROVIDER_OPTION,
+    locale: Optional[str] = common.LOCALE_OPTION,
+    progress: bool = common.PROGRESS_OPTION,
     movie_id: Optional[int] = typer.Option(
-        None, "--id", metavar="ID",
+        None,
+        "--id",
+        metavar="ID",
         help="ID de Radarr de una película concreta a procesar.",
     ),
+    resume: bool = common.RESUME_OPTION,
+    dry_run: bool = typer.Option(
+        False,
+        "--dry-run",
+        help="Muestra los cambios planificados sin escribir nada en Radarr.",
+    ),
+    shard: Optional[str] = common.SHARD_OPTION,
+    workers: int = common.WORKERS_OPTION,
+    catalogue: bool = common.CATALOGUE_OPTION,
+    time_budget: Optional[str] = common.TIME_BUDGET_OPTION,
+    request_budget: Optional[int] = common.REQUEST_BUDGET_OPTION,
+    output_format: RunOutput = common.OUTPUT_OPTION,
 ):
     """
     Find movies that have streaming provider tags but are no longer available
     on those providers, and remove the stale tags.
     """
+    common.setup_run_output(output_format, loglevel)
+
     logger.debug("Got clean as subcommand")
     logger.debug(f"Got CLI values for --progress option: {progress}")
 
+    _select_instances()
+
     # Disable the progress bar when debug logging is active
-    if loglevel == 10:
-        disable_progress = True
-    elif progress and loglevel != 10:
-        disable_progress = False
-    else:
-        disable_progress = True
+    disable_progress = common.progress_disabled(progress, loglevel)
 
     # Determine if CLI options should overwrite configuration settings
     if not providers:
         providers = config.providers
     if not locale:
         locale = config.locale
+    if not catalogue:
+        catalogue = config.catalogue_mode
+
+    common.check_parallelism(workers, shard)
+    common.write_records_header(output_format)
+
+    plans = common.run_sharded(
+        _clean_shard,
+        workers,
+        shard,
+        locale=locale,
+        providers=providers,
+        disable_progress=disable_progress or workers > 1,
+        movie_id=movie_id,
+        resume=resume,
+        dry_run=dry_run,
+        catalogue=catalogue,
+        time_budget=time_budget,
+        request_budget=common.worker_request_budget(request_budget, workers),
+        output_format=output_format,
+    )
 
-    # Setup Radarr Actions
-    radarr = RadarrActions(config.radarr_url, config.radarr_api_key, locale)
+    # The changes were streamed as they were written
+    if common.streams_records(output_format):
+        return
 
-    # Get movies to clean
-    movies_to_clean = radarr.get_movies_to_clean(
-        providers, config.fast_search, disable_progress,
-        not_available_tag=config.not_available_tag, movie_id=movie_id
-    )
+    for name, plan in plans.items():
+        if len(plans) > 1:
+            common.print_instance("Radarr", name)
 
-    # Filter out excluded titles
-    movies_to_clean = {
-        id: values
-        for id, values in movies_to_clean.items()
-        if values["title"] not in config.radarr_excludes
-    }
+        movies_cleaned = {
+            change.arr_id: {"title": change.title, "tags_removed": change.remove}
+            for change in plan.changes
+        }
 
-    if movies_to_clean:
-        # Clean tags automatically
-        radarr.clean_tags(movies_to_clean)
+        if output_format == RunOutput.summary:
+            output.print_change_summary(plan)
+        elif movies_cleaned:
+            # Print summary
+            output.print_movies_cleaned(movies_cleaned)
 
-        # Print summary
-        output.print_movies_cleaned(movies_to_clean)
+            if dry_run:
+                rich.print(
+                    f"\nSimulación: se eliminarían etiquetas obsoletas de "
+                    f"{len(movies_cleaned)} películas en Radarr, no se ha escrito nada."
+                )
+            else:
+                rich.print(
+                    f"\nSuccessfully cleaned tags from {len(movies_cleaned)} movies in Radarr!"
+                )
+        else:
+            rich.print("No movies with stale streaming provider tags found.")
 
-        rich.print(f"\nSuccessfully cleaned tags from {len(movies_to_clean)} movies in Radarr!")
-    else:
-        rich.print("No movies with stale streaming provider tags found.")
+        output.print_plan_counts(plan)
+
+    common.print_deferred("películas")
 
 
 @app.command(help="Elimina una etiqueta concreta de todas las películas en Radarr")
@@ -159,6 +409,11 @@ def purge_tag(
         metavar="TAG",
         help="Etiqueta a eliminar. Por defecto usa not_available_tag del config.",
     ),
+    dry_run: bool = typer.Option(
+        False,
+        "--dry-run",
+        help="Muestra los cambios planificados sin escribir nada en Radarr.",
+    ),
 ):
     """
     Elimina una etiqueta específica de todas las películas en Radarr.
@@ -166,37 +421,263 @@ def purge_tag(
     """
     logger.debug("Got purge-tag as subcommand")
 
+    _select_instances()
+
     tag_label = tag or config.not_available_tag
 
     if not tag_label:
-        rich.print("No se ha especificado etiqueta. Usa --tag o configura not_available_tag en el archivo de configuración.")
+        rich.print(
+            "No se ha especificado etiqueta. Usa --tag o configura not_available_tag en el archivo de configuración."
+        )
         raise typer.Exit(code=1)
 
-    # Setup Radarr Actions (locale not needed but required by constructor)
+    # Setup Radarr Actions (locale not needed but required by constructor, JustWatch is not used)
     locale = config.locale or "en_US"
-    radarr = RadarrActions(config.radarr_url, config.radarr_api_key, locale)
 
-    # Get movies to purge
-    movies_to_purge = radarr.get_movies_to_purge_tag(tag_label)
+    for name in instances:
+        config.use_instance("radarr", name)
+        radarr = _get_radarr_actions(locale)
+
+        if len(instances) > 1:
+            common.print_instance("Radarr", name)
+
+        # Get movies to purge
+        movies_to_purge = radarr.get_movies_to_purge_tag(tag_label)
+
+        if movies_to_purge:
+            radarr.clean_tags(movies_to_purge, dry_run=dry_run)
+            output.print_movies_cleaned(movies_to_purge)
+
+            if dry_run:
+                rich.print(
+                    f"\nSimulación: la etiqueta '{tag_label}' se eliminaría de "
+                    f"{len(movies_to_purge)} películas en Radarr, no se ha escrito nada."
+                )
+            else:
+                rich.print(
+                    f"\nEtiqueta '{tag_label}' eliminada de {len(movies_to_purge)} películas "
+                    f"en Radarr."
+                )
+        else:
+            rich.print(f"No se encontraron películas con la etiqueta '{tag_label}'.")
+
+
+@app.command(
+    help="Planifica los cambios de etiquetas en Radarr y los guarda en un fichero sin escribirlos"
+)
+def plan(
+    providers: Optional[List[str]] = common.PROVIDER_OPTION,
+    locale: Optional[str] = common.LOCALE_OPTION,
+    progress: bool = common.PROGRESS_OPTION,
+    movie_id: Optional[int] = typer.Option(
+        None,
+        "--id",
+        metavar="ID",
+        help="ID de Radarr de una película concreta a procesar.",
+    ),
+    clean: bool = typer.Option(
+        False,
+        "--clean",
+        help="Planifica la limpieza de etiquetas obsoletas en lugar del etiquetado.",
+    ),
+    out: Path = typer.Option(
+        "tagarr-plan.jsonl",
+        "--out",
+        metavar="FILE",
+        dir_okay=False,
+        help="Fichero del plan (JSON Lines, comprimido con gzip si termina en .gz).",
+    ),
+    shard: Optional[str] = common.PLAN_SHARD_OPTION,
+    catalogue: bool = common.CATALOGUE_OPTION,
+    time_budget: Optional[str] = common.TIME_BUDGET_OPTION,
+    request_budget: Optional[int] = common.REQUEST_BUDGET_OPTION,
+):
+    """
+    Resolve the library like `tag` (or `clean` with --clean) and write the
+    planned tag changes to a plan file, to be applied later with `apply`.
+    """
+    logger.debug("Got plan as subcommand")
+    logger.debug(f"Got CLI values for --progress option: {progress}")
+
+    _select_instances()
+
+    # Disable the progress bar when debug logging is active
+    disable_progress = common.progress_disabled(progress, loglevel)
+
+    # Determine if CLI options should overwrite configuration settings
+    if not providers:
+        providers = config.providers
+    if not locale:
+        locale = config.locale
+    if not catalogue:
+        catalogue = config.catalogue_mode
+
+    # A plan file is made for one instance
+    if len(instances) > 1:
+        rich.print(
+            f"Hay varias instancias de Radarr configuradas ({', '.join(instances)}), "
+            "elige una con --instance."
+        )
+        raise typer.Exit(code=1)
+
+    config.use_instance("radarr", instances[0])
 
-    if movies_to_purge:
-        radarr.clean_tags(movies_to_purge)
-        output.print_movies_cleaned(movies_to_purge)
-        rich.print(f"\nEtiqueta '{tag_label}' eliminada de {len(movies_to_purge)} películas en Radarr.")
+    # Setup Radarr Actions
+    radarr = _get_radarr_actions(
+        locale, catalogue=_get_catalogue(catalogue, movie_id), record_checks=False
+    )
+    budget.start(time_budget, request_budget)
+
+    command = "clean" if clean else "tag"
+    iter_movies = radarr.iter_movies_to_clean if clean else radarr.iter_movies_to_tag
+    found = iter_movies(
+        providers,
+        config.fast_search,
+        disable_progress,
+        not_available_tag=config.not_available_tag,
+        movie_id=movie_id,
+        shard=shard,
+    )
+    pending = (
+        (arr_id, values)
+        for arr_id, values in found
+        if values["title"] not in config.radarr_excludes
+    )
+
+    # Changes are written to the plan file as they are planned
+    plan = Plan()
+    try:
+        with PlanWriter(
+            out, "radarr", command, url=config.radarr_url, instance=instances[0]
+        ) as writer:
+            for change in radarr.plan_movies(pending, plan):
+                writer.write(change)
+    except TooManyProviders as e:
+        common.exit_too_many_providers(e)
+
+    if plan.changes:
+        output.print_changes(plan.changes)
+        rich.print(
+            f"\nCambios de etiquetas de {writer.changes} películas guardados en {out}. "
+            f"Aplícalos con: tagarr radarr apply {out}"
+        )
     else:
-        rich.print(f"No se encontraron películas con la etiqueta '{tag_label}'.")
+        rich.print(f"No hay cambios de etiquetas que planificar, {out} no tiene cambios.")
+
+    output.print_plan_counts(plan)
+    common.print_deferred("películas")
+
+
+@app.command(help="Aplica en Radarr un plan creado con 'plan'")
+def apply(
+    file: Path = typer.Argument(
+        ..., exists=True, dir_okay=False, metavar="FILE", help="Fichero del plan creado con 'plan'."
+    ),
+    dry_run: bool = typer.Option(
+        False,
+        "--dry-run",
+        help="Comprueba el plan contra Radarr sin escribir nada.",
+    ),
+):
+    """
+    Apply a plan file made with `plan` in bulk. Items whose tags changed
+    since the plan was made are skipped.
+    """
+    logger.debug("Got apply as subcommand")
+
+    _select_instances()
+
+    try:
+        reader = PlanReader(file, "radarr")
+    except InvalidPlanFile as e:
+        rich.print(f"No se puede aplicar el plan: {e}")
+        raise typer.Exit(code=1)
+
+    # Plans record the instance they were made for, older ones apply to the selected one
+    plan_instance = reader.header.get("instance")
+    if selected_instance and plan_instance and plan_instance != selected_instance:
+        rich.print(
+            f"No se puede aplicar el plan: se creó para la instancia '{plan_instance}', "
+            f"no para '{selected_instance}'"
+        )
+        raise typer.Exit(code=1)
+
+    try:
+        config.use_instance("radarr", plan_instance or instances[0])
+    except ValueError as e:
+        rich.print(f"No se puede aplicar el plan: {e}")
+        raise typer.Exit(code=1)
+
+    if reader.header.get("url") != config.radarr_url:
+        logger.warning(
+            f"The plan was made against {reader.header.get('url')}, "
+            f"applying it to {config.radarr_url}"
+        )
+
+    # Setup Radarr Actions (locale not needed but required by constructor, JustWatch is not used)
+    locale = config.locale or "en_US"
+    radarr = _get_radarr_actions(locale)
+
+    try:
+        applied, partial, up_to_date, conflicts = radarr.apply_plan(reader, dry_run=dry_run)
+    except InvalidPlanFile as e:
+        rich.print(f"No se puede aplicar el plan: {e}")
+        raise typer.Exit(code=1)
+
+    if applied:
+        output.print_changes(applied)
+
+        if dry_run:
+            rich.print(
+                f"\nSimulación: el plan actualizaría {len(applied)} películas en Radarr, "
+                "no se ha escrito nada."
+            )
+        else:
+            rich.print(f"\nPlan aplicado a {len(applied)} películas en Radarr.")
+    elif not up_to_date and not partial:
+        rich.print("No se ha podido aplicar ningún cambio del plan.")
+
+    if up_to_date:
+        rich.print(f"{len(up_to_date)} películas del plan ya estaban al día.")
+
+    if partial:
+        rich.print(
+            f"Se añadieron las etiquetas de {len(partial)} películas pero no se eliminaron, "
+            "aplica el plan de nuevo para terminarlas."
+        )
+
+    if conflicts:
+        rich.print(
+            f"Se omitieron {len(conflicts)} películas borradas o reetiquetadas desde que se creó "
+            "el plan, ejecuta plan de nuevo para incluirlas."
+        )
+
+    if partial or conflicts:
+        raise typer.Exit(code=1)
 
 
 @app.callback()
-def init():
+def init(
+    instance: Optional[str] = typer.Option(
+        None,
+        "--instance",
+        metavar="NAME",
+        help=(
+            "Usa solo la instancia de Radarr con este nombre. "
+            "Por defecto se usan todas las configuradas."
+        ),
+    ),
+):
     """
-    Initializes the command. Reads the configuration.
+    Initializes the command. Reads the configuration; the Radarr instances are
+    selected by the subcommands that use them.
     """
     logger.debug("Got radarr as subcommand")
 
     # Set globals
     global config
     global loglevel
+    global selected_instance
 
     # Hacky way to get the current log level context
     loglevel = logger._core.min_level
@@ -204,6 +685,8 @@ def init():
     logger.debug("Reading configuration file")
     config = Config()
 
+    selected_instance = instance
+
 
 if __name__ == "__main__":
     app()
@@ -0,0 +1,218 @@
+import time
+
+from datetime import datetime
+from enum import Enum
+from typing import List, Optional
+
+import rich
+import typer
+
+from loguru import logger
+
+import tagarr.utils.output as output
+
+from tagarr.core.radarr_actions import RadarrActions
+from tagarr.utils.budget import parse_duration
+from tagarr.utils.config import Config
+from tagarr.utils.store import open_store
+
+app = typer.Typer()
+
+
+class OutputFormat(str, Enum):
+    table = "table"
+    json = "json"
+    csv = "csv"
+
+
+class Change(str, Enum):
+    added = "added"
+    removed = "removed"
+
+
+def _parse_duration(value):
+    try:
+        return parse_duration(value)
+    except ValueError as e:
+        raise typer.BadParameter(str(e))
+
+
+def _timestamp(value):
+    return datetime.fromtimestamp(value).isoformat(sep=" ", timespec="seconds")
+
+
+def _select_providers(store, names):
+    """Return the (provider_id, bit, name) stored for provider clear names or tag labels."""
+    known = store.get_providers()
+    selected = []
+
+    for name in names:
+        # By clear name or by the tag label it is written as
+        found = [
+            row
+            for row in known
+            if name.lower() in (row[2].lower(), RadarrActions._sanitize_tag(row[2]))
+        ]
+        if not found:
+            available = ", ".join(row[2] for row in known) or "none, run tag or clean first"
+            raise typer.BadParameter(f"'{name}' was never checked, known providers: {available}")
+        selected.extend(found)
+
+    return selected
+
+
+# Shared options
+PROVIDER_OPTION = typer.Option(
+    None,
+    "-p",
+    "--provider",
+    metavar="PROVIDER",
+    help="Solo títulos en este proveedor (se puede repetir).",
+)
+INSTANCE_OPTION = typer.Option(
+    None,
+    "--instance",
+    metavar="NAME",
+    help="Solo esta instancia (p. ej. radarr-4k) o servicio (radarr, sonarr).",
+)
+TAG_OPTION = typer.Option(
+    None, "-t", "--tag", metavar="TAG", help="Solo títulos con esta etiqueta en Radarr/Sonarr."
+)
+OUTPUT_OPTION = typer.Option(OutputFormat.table, "-o", "--output", help="Formato de salida.")
+
+
+@app.command(help="Muestra en qué proveedores está cada título según la última comprobación")
+def titles(
+    providers: Optional[List[str]] = PROVIDER_OPTION,
+    instance: Optional[str] = INSTANCE_OPTION,
+    tag: Optional[str] = TAG_OPTION,
+    no_provider: bool = typer.Option(
+        False,
+        "--no-provider",
+        help="Solo títulos que no están en ninguno de los proveedores comprobados.",
+    ),
+    output_format: OutputFormat = OUTPUT_OPTION,
+):
+    """
+    List the availability of the titles checked by earlier tag/clean/plan
+    runs, from the local store only.
+    """
+    logger.debug("Got titles as subcommand")
+
+    store = open_store(config.data_dir)
+    selected = _select_providers(store, providers or [])
+    bits = [(bit, name) for _, bit, name in store.get_providers()]
+
+    provider_mask = 0
+    for _, bit, _ in selected:
+        provider_mask |= 1 << bit
+
+    rows = store.query_availability(instance, provider_mask, no_provider, tag)
+    store.close()
+
+    records = [
+        {
+            "instance": row_instance,
+            "id": arr_id,
+            "title": title,
+            "providers": [name for bit, name in bits if mask & (1 << bit)],
+            "tags": tags,
+            "checked": _timestamp(checked),
+        }
+        for row_instance, arr_id, title, mask, _, tags, checked in rows
+    ]
+
+    output.print_records(
+        records,
+        [
+            ("instance", "Instance"),
+            ("id", "ID"),
+            ("title", "Title"),
+            ("providers", "Providers"),
+            ("tags", "Tags"),
+            ("checked", "Checked"),
+        ],
+        output_format.value,
+    )
+
+    if output_format == OutputFormat.table:
+        rich.print(f"{len(records)} títulos.")
+
+
+@app.command(help="Muestra qué títulos han entrado o salido de cada proveedor")
+def changes(
+    providers: Optional[List[str]] = PROVIDER_OPTION,
+    instance: Optional[str] = INSTANCE_OPTION,
+    tag: Optional[str] = TAG_OPTION,
+    since: str = typer.Option(
+        "7d", "--since", metavar="DURATION", help="Ventana de cambios: 30m, 12h, 7d, 2w..."
+    ),
+    change: Optional[Change] = typer.Option(
+        None, "--change", help="Solo títulos que han entrado (added) o salido (removed)."
+    ),
+    output_format: OutputFormat = OUTPUT_OPTION,
+):
+    """
+    List the availability changes seen by tag/clean/plan runs within a
+    time window, from the local store only.
+    """
+    logger.debug("Got changes as subcommand")
+
+    window = _parse_duration(since)
+
+    store = open_store(config.data_dir)
+    selected = _select_providers(store, providers or [])
+    rows = store.query_changes(
+        time.time() - window,
+        instance,
+        [provider_id for provider_id, _, _ in selected],
+        change.value if change else None,
+        tag,
+    )
+    store.close()
+
+    records = [
+        {
+            "changed": _timestamp(changed),
+            "instance": row_instance,
+            "id": arr_id,
+            "title": title,
+            "provider": provider,
+            "change": row_change,
+        }
+        for changed, row_instance, arr_id, title, provider, row_change in rows
+    ]
+
+    output.print_records(
+        records,
+        [
+            ("changed", "Changed"),
+            ("instance", "Instance"),
+            ("id", "ID"),
+            ("title", "Title"),
+            ("provider", "Provider"),
+            ("change", "Change"),
+        ],
+        output_format.value,
+    )
+
+    if output_format == OutputFormat.table:
+        rich.print(f"{len(records)} cambios.")
+
+
+@app.callback()
+def init():
+    """
+    Initializes the command. Reads the configuration.
+    """
+    logger.debug("Got report as subcommand")
+
+    # Set globals
+    global config
+    global loglevel
+
+    # Hacky way to get the current log level context
+    loglevel = logger._core.min_level
+
+    logger.debug("Reading configuration file")
+    config = Config()
@@ -1,156 +1,407 @@
 import rich
 import typer
 
+from pathlib import Path
 from typing import List, Optional
 from loguru import logger
 
+import tagarr.commands.common as common
+import tagarr.utils.budget as budget
 import tagarr.utils.output as output
 
+from tagarr.core.catalogue import Catalogue
+from tagarr.core.planner import Plan
 from tagarr.core.sonarr_actions import SonarrActions
+from tagarr.utils.checkpoint import Checkpoint
 from tagarr.utils.config import Config
+from tagarr.utils.enums import RunOutput
+from tagarr.utils.plan_file import InvalidPlanFile, PlanReader, PlanWriter
+from tagarr.utils.sharding import TagLock
+from tagarr.utils.store import TooManyProviders, open_store
 
 app = typer.Typer()
 
 
+def _get_sonarr_actions(locale, resolved=None, catalogue=None, record_checks=True):
+    return SonarrActions(
+        config.sonarr_url,
+        config.sonarr_api_key,
+        locale,
+        justwatch_url=config.justwatch_url,
+        justwatch_pool_size=config.justwatch_pool_size,
+        verify_ssl=config.sonarr_verify_ssl,
+        timeout=config.sonarr_timeout,
+        retries=config.sonarr_retries,
+        pool_size=config.sonarr_pool_size,
+        store=open_store(config.data_dir),
+        tag_lock=TagLock(
+            Path(config.data_dir).expanduser() / "locks" / f"{config.sonarr_instance}-tags.lock"
+        ),
+        tmdb_cache_ttl=config.tmdb_cache_days * 86400,
+        instance=config.sonarr_instance,
+        resolved=resolved,
+        catalogue=catalogue,
+        recheck_interval=config.recheck_days * 86400,
+        clean_max_age=config.clean_recheck_days * 86400,
+        record_checks=record_checks,
+    )
+
+
+def _select_instances():
+    """Select the Sonarr instances to run on: the one of --instance, or every configured one."""
+    global instances
+
+    if selected_instance:
+        try:
+            config.use_instance("sonarr", selected_instance)
+        except ValueError as e:
+            raise typer.BadParameter(str(e), param_hint="--instance")
+
+        instances = [selected_instance]
+    else:
+        instances = config.instances("sonarr")
+
+    return instances
+
+
+def _get_checkpoint(command, resume, shard=None):
+    name = f"{config.sonarr_instance}-{command}"
+    if shard:
+        name += f"-{shard.index}of{shard.count}"
+
+    path = Path(config.data_dir).expanduser() / "checkpoints" / f"{name}.jsonl"
+    return Checkpoint(path, resume)
+
+
+def _get_catalogue(catalogue, series_id=None):
+    """The catalogue to join the library against in catalogue mode, else None."""
+    # Crawling whole catalogues does not pay off for a single item
+    if not catalogue or series_id:
+        return None
+
+    return Catalogue("show")
+
+
+def _tag_shard(
+    shard,
+    locale,
+    providers,
+    disable_progress,
+    series_id,
+    resume,
+    dry_run,
+    catalogue,
+    time_budget=None,
+    request_budget=None,
+    output_format=RunOutput.table,
+):
+    """
+    Resolve and tag the series of a shard, or of the whole library, in every selected
+    instance. Return the plans by instance.
+    """
+    plans = {}
+    budget.start(time_budget, request_budget)
+
+    # Series in several instances are resolved only once
+    resolved = {}
+    shared_catalogue = _get_catalogue(catalogue, series_id)
+
+    for name in instances:
+        config.use_instance("sonarr", name)
+        sonarr = _get_sonarr_actions(locale, resolved, shared_catalogue, record_checks=not dry_run)
+        checkpoint = None if dry_run else _get_checkpoint("tag", resume, shard)
+
+        # Resolve series to tag and write them as they are found, skipping excluded titles
+        found = sonarr.iter_series_to_tag(
+            providers,
+            config.fast_search,
+            disable_progress,
+            tmdb_api_key=config.tmdb_api_key,
+            not_available_tag=config.not_available_tag,
+            series_id=series_id,
+            checkpoint=checkpoint,
+            shard=shard,
+        )
+        pending = (
+            (arr_id, values)
+            for arr_id, values in found
+            if values["title"] not in config.sonarr_excludes
+        )
+
+        # Only the series whose tags change are written
+        plan = Plan(common.change_listener(output_format, name))
+        sonarr.tag_series(pending, checkpoint, plan=plan, dry_run=dry_run)
+
+        if checkpoint:
+            checkpoint.finish()
+
+        plans[name] = plan
+
+    return plans
+
+
 @app.command(help="Etiqueta series en Sonarr con sus proveedores de streaming")
 def tag(
-    providers: Optional[List[str]] = typer.Option(
-        None,
-        "-p",
-        "--provider",
-        metavar="PROVIDER",
-        help="Sobrescribe los proveedores de streaming configurados.",
-    ),
-    locale: Optional[str] = typer.Option(
-        None, "-l", "--locale", metavar="LOCALE", help="Tu localización, p. ej: es_ES."
-    ),
-    progress: bool = typer.Option(
-        False, "--progress", help="Muestra una barra de progreso."
-    ),
+    providers: Optional[List[str]] = common.PROVIDER_OPTION,
+    locale: Optional[str] = common.LOCALE_OPTION,
+    progress: bool = common.PROGRESS_OPTION,
     series_id: Optional[int] = typer.Option(
-        None, "--id", metavar="ID",
+        None,
+        "--id",
+        metavar="ID",
         help="ID de Sonarr de una serie concreta a procesar.",
     ),
+    resume: bool = common.RESUME_OPTION,
+    dry_run: bool = typer.Option(
+        False,
+        "--dry-run",
+        help="Muestra los cambios planificados sin escribir nada en Sonarr.",
+    ),
+    shard: Optional[str] = common.SHARD_OPTION,
+    workers: int = common.WORKERS_OPTION,
+    catalogue: bool = common.CATALOGUE_OPTION,
+    time_budget: Optional[str] = common.TIME_BUDGET_OPTION,
+    request_budget: Optional[int] = common.REQUEST_BUDGET_OPTION,
+    output_format: RunOutput = common.OUTPUT_OPTION,
 ):
     """
     Detect series available on configured streaming providers and add tags
     in Sonarr with the provider name (e.g. 'netflix', 'disney plus').
     Tags are applied at the series level.
     """
+    common.setup_run_output(output_format, loglevel)
+
     logger.debug("Got tag as subcommand")
     logger.debug(f"Got CLI values for --progress option: {progress}")
 
+    _select_instances()
+
     # Disable the progress bar when debug logging is active
-    if loglevel == 10:
-        disable_progress = True
-    elif progress and loglevel != 10:
-        disable_progress = False
-    else:
-        disable_progress = True
+    disable_progress = common.progress_disabled(progress, loglevel)
 
     # Determine if CLI options should overwrite configuration settings
     if not providers:
         providers = config.providers
     if not locale:
         locale = config.locale
-
-    # Setup Sonarr Actions
-    sonarr = SonarrActions(config.sonarr_url, config.sonarr_api_key, locale)
-
-    # Get series to tag
-    series_to_tag = sonarr.get_series_to_tag(
-        providers, config.fast_search, disable_progress,
-        tmdb_api_key=config.tmdb_api_key, not_available_tag=config.not_available_tag,
-        series_id=series_id
+    if not catalogue:
+        catalogue = config.catalogue_mode
+
+    common.check_parallelism(workers, shard)
+    common.write_records_header(output_format)
+
+    plans = common.run_sharded(
+        _tag_shard,
+        workers,
+        shard,
+        locale=locale,
+        providers=providers,
+        disable_progress=disable_progress or workers > 1,
+        series_id=series_id,
+        resume=resume,
+        dry_run=dry_run,
+        catalogue=catalogue,
+        time_budget=time_budget,
+        request_budget=common.worker_request_budget(request_budget, workers),
+        output_format=output_format,
     )
 
-    # Filter out excluded titles
-    series_to_tag = {
-        id: values
-        for id, values in series_to_tag.items()
-        if values["title"] not in config.sonarr_excludes
-    }
-
-    if series_to_tag:
-        # Apply tags automatically
-        sonarr.tag_series(series_to_tag)
-
-        # Print summary
-        output.print_series_tagged(series_to_tag)
-
-        rich.print(f"\nSuccessfully tagged {len(series_to_tag)} series in Sonarr!")
-    else:
-        rich.print("No series found on the configured streaming providers to tag.")
+    # The changes were streamed as they were written
+    if common.streams_records(output_format):
+        return
+
+    for name, plan in plans.items():
+        if len(plans) > 1:
+            common.print_instance("Sonarr", name)
+
+        series_tagged = {
+            change.arr_id: {"title": change.title, "providers": change.add}
+            for change in plan.changes
+        }
+
+        if output_format == RunOutput.summary:
+            output.print_change_summary(plan)
+        elif series_tagged:
+            # Print summary
+            output.print_series_tagged(series_tagged)
+
+            if dry_run:
+                rich.print(
+                    f"\nSimulación: se etiquetarían {len(series_tagged)} series en Sonarr, "
+                    "no se ha escrito nada."
+                )
+            else:
+                rich.print(f"\nSuccessfully tagged {len(series_tagged)} series in Sonarr!")
+        elif plan.total:
+            rich.print(
+                f"Las {plan.total} series encontradas en los proveedores de streaming "
+                "configurados ya están etiquetadas."
+            )
+        else:
+            rich.print("No series found on the configured streaming providers to tag.")
+
+        output.print_plan_counts(plan)
+
+    common.print_deferred("series")
+
+
+def _clean_shard(
+    shard,
+    locale,
+    providers,
+    disable_progress,
+    series_id,
+    resume,
+    dry_run,
+    catalogue,
+    time_budget=None,
+    request_budget=None,
+    output_format=RunOutput.table,
+):
+    """
+    Find and clean the series of a shard, or of the whole library, in every selected
+    instance. Return the plans by instance.
+    """
+    plans = {}
+    budget.start(time_budget, request_budget)
+
+    # Series in several instances are resolved only once
+    resolved = {}
+    shared_catalogue = _get_catalogue(catalogue, series_id)
+
+    for name in instances:
+        config.use_instance("sonarr", name)
+        sonarr = _get_sonarr_actions(locale, resolved, shared_catalogue, record_checks=not dry_run)
+        checkpoint = None if dry_run else _get_checkpoint("clean", resume, shard)
+
+        # Resolve series to clean and write them as they are found, skipping excluded titles
+        found = sonarr.iter_series_to_clean(
+            providers,
+            config.fast_search,
+            disable_progress,
+            tmdb_api_key=config.tmdb_api_key,
+            not_available_tag=config.not_available_tag,
+            series_id=series_id,
+            checkpoint=checkpoint,
+            shard=shard,
+        )
+        pending = (
+            (arr_id, values)
+            for arr_id, values in found
+            if values["title"] not in config.sonarr_excludes
+        )
+
+        # Only the series whose tags change are written
+        plan = Plan(common.change_listener(output_format, name))
+        sonarr.clean_tags(pending, checkpoint, plan=plan, dry_run=dry_run)
+
+        if checkpoint:
+            checkpoint.finish()
+
+        plans[name] = plan
+
+    return plans
 
 
 @app.command(help="Elimina etiquetas obsoletas de proveedores de streaming en Sonarr")
 def clean(
-    providers: Optional[List[str]] = typer.Option(
-        None,
-        "-p",
-        "--provider",
-        metavar="PROVIDER",
-        help="Sobrescribe los proveedores de streaming configurados.",
-    ),
-    locale: Optional[str] = typer.Option(
-        None, "-l", "--locale", metavar="LOCALE", help="Tu localización, p. ej: es_ES."
-    ),
-    progress: bool = typer.Option(
-        False, "--progress", help="Muestra una barra de progreso."
-    ),
+    providers: Optional[List[str]] = common.PROVIDER_OPTION,
+    locale: Optional[str] = common.LOCALE_OPTION,
+    progress: bool = common.PROGRESS_OPTION,
     series_id: Optional[int] = typer.Option(
-        None, "--id", metavar="ID",
+        None,
+        "--id",
+        metavar="ID",
         help="ID de Sonarr de una serie concreta a procesar.",
     ),
+    resume: bool = common.RESUME_OPTION,
+    dry_run: bool = typer.Option(
+        False,
+        "--dry-run",
+        help="Muestra los cambios planificados sin escribir nada en Sonarr.",
+    ),
+    shard: Optional[str] = common.SHARD_OPTION,
+    workers: int = common.WORKERS_OPTION,
+    catalogue: bool = common.CATALOGUE_OPTION,
+    time_budget: Optional[str] = common.TIME_BUDGET_OPTION,
+    request_budget: Optional[int] = common.REQUEST_BUDGET_OPTION,
+    output_format: RunOutput = common.OUTPUT_OPTION,
 ):
     """
     Find series that have streaming provider tags but are no longer available
     on those providers, and remove the stale tags.
     """
+    common.setup_run_output(output_format, loglevel)
+
     logger.debug("Got clean as subcommand")
     logger.debug(f"Got CLI values for --progress option: {progress}")
 
+    _select_instances()
+
     # Disable the progress bar when debug logging is active
-    if loglevel == 10:
-        disable_progress = True
-    elif progress and loglevel != 10:
-        disable_progress = False
-    else:
-        disable_progress = True
+    disable_progress = common.progress_disabled(progress, loglevel)
 
     # Determine if CLI options should overwrite configuration settings
     if not providers:
         providers = config.providers
     if not locale:
         locale = config.locale
+    if not catalogue:
+        catalogue = config.catalogue_mode
+
+    common.check_parallelism(workers, shard)
+    common.write_records_header(output_format)
+
+    plans = common.run_sharded(
+        _clean_shard,
+        workers,
+        shard,
+        locale=locale,
+        providers=providers,
+        disable_progress=disable_progress or workers > 1,
+        series_id=series_id,
+        resume=resume,
+        dry_run=dry_run,
+        catalogue=catalogue,
+        time_budget=time_budget,
+        request_budget=common.worker_request_budget(request_budget, workers),
+        output_format=output_format,
+    )
 
-    # Setup Sonarr Actions
-    sonarr = SonarrActions(config.sonarr_url, config.sonarr_api_key, locale)
+    # The changes were streamed as they were written
+    if common.streams_records(output_format):
+        return
 
-    # Get series to clean
-    series_to_clean = sonarr.get_series_to_clean(
-        providers, config.fast_search, disable_progress,
-        tmdb_api_key=config.tmdb_api_key, not_available_tag=config.not_available_tag,
-        series_id=series_id
-    )
+    for name, plan in plans.items():
+        if len(plans) > 1:
+            common.print_instance("Sonarr", name)
 
-    # Filter out excluded titles
-    series_to_clean = {
-        id: values
-        for id, values in series_to_clean.items()
-        if values["title"] not in config.sonarr_excludes
-    }
+        series_cleaned = {
+            change.arr_id: {"title": change.title, "tags_removed": change.remove}
+            for change in plan.changes
+        }
 
-    if series_to_clean:
-        # Clean tags automatically
-        sonarr.clean_tags(series_to_clean)
+        if output_format == RunOutput.summary:
+            output.print_change_summary(plan)
+        elif series_cleaned:
+            # Print summary
+            output.print_series_cleaned(series_cleaned)
 
-        # Print summary
-        output.print_series_cleaned(series_to_clean)
+            if dry_run:
+                rich.print(
+                    f"\nSimulación: se eliminarían etiquetas obsoletas de "
+                    f"{len(series_cleaned)} series en Sonarr, no se ha escrito nada."
+                )
+            else:
+                rich.print(
+                    f"\nSuccessfully cleaned tags from {len(series_cleaned)} series in Sonarr!"
+                )
+        else:
+            rich.print("No series with stale streaming provider tags found.")
 
-        rich.print(f"\nSuccessfully cleaned tags from {len(series_to_clean)} series in Sonarr!")
-    else:
-        rich.print("No series with stale streaming provider tags found.")
+        output.print_plan_counts(plan)
+
+    common.print_deferred("series")
 
 
 @app.command(help="Elimina una etiqueta concreta de todas las series en Sonarr")
@@ -162,6 +413,11 @@ def purge_tag(
         metavar="TAG",
         help="Etiqueta a eliminar. Por defecto usa not_available_tag del config.",
     ),
+    dry_run: bool = typer.Option(
+        False,
+        "--dry-run",
+        help="Muestra los cambios planificados sin escribir nada en Sonarr.",
+    ),
 ):
     """
     Elimina una etiqueta específica de todas las series en Sonarr.
@@ -169,37 +425,264 @@ def purge_tag(
     """
     logger.debug("Got purge-tag as subcommand")
 
+    _select_instances()
+
     tag_label = tag or config.not_available_tag
 
     if not tag_label:
-        rich.print("No se ha especificado etiqueta. Usa --tag o configura not_available_tag en el archivo de configuración.")
+        rich.print(
+            "No se ha especificado etiqueta. Usa --tag o configura not_available_tag en el archivo de configuración."
+        )
         raise typer.Exit(code=1)
 
-    # Setup Sonarr Actions (locale not needed but required by constructor)
+    # Setup Sonarr Actions (locale not needed but required by constructor, JustWatch is not used)
     locale = config.locale or "en_US"
-    sonarr = SonarrActions(config.sonarr_url, config.sonarr_api_key, locale)
 
-    # Get series to purge
-    series_to_purge = sonarr.get_series_to_purge_tag(tag_label)
+    for name in instances:
+        config.use_instance("sonarr", name)
+        sonarr = _get_sonarr_actions(locale)
+
+        if len(instances) > 1:
+            common.print_instance("Sonarr", name)
+
+        # Get series to purge
+        series_to_purge = sonarr.get_series_to_purge_tag(tag_label)
+
+        if series_to_purge:
+            sonarr.clean_tags(series_to_purge, dry_run=dry_run)
+            output.print_series_cleaned(series_to_purge)
+
+            if dry_run:
+                rich.print(
+                    f"\nSimulación: la etiqueta '{tag_label}' se eliminaría de "
+                    f"{len(series_to_purge)} series en Sonarr, no se ha escrito nada."
+                )
+            else:
+                rich.print(
+                    f"\nEtiqueta '{tag_label}' eliminada de {len(series_to_purge)} series "
+                    f"en Sonarr."
+                )
+        else:
+            rich.print(f"No se encontraron series con la etiqueta '{tag_label}'.")
+
+
+@app.command(
+    help="Planifica los cambios de etiquetas en Sonarr y los guarda en un fichero sin escribirlos"
+)
+def plan(
+    providers: Optional[List[str]] = common.PROVIDER_OPTION,
+    locale: Optional[str] = common.LOCALE_OPTION,
+    progress: bool = common.PROGRESS_OPTION,
+    series_id: Optional[int] = typer.Option(
+        None,
+        "--id",
+        metavar="ID",
+        help="ID de Sonarr de una serie concreta a procesar.",
+    ),
+    clean: bool = typer.Option(
+        False,
+        "--clean",
+        help="Planifica la limpieza de etiquetas obsoletas en lugar del etiquetado.",
+    ),
+    out: Path = typer.Option(
+        "tagarr-plan.jsonl",
+        "--out",
+        metavar="FILE",
+        dir_okay=False,
+        help="Fichero del plan (JSON Lines, comprimido con gzip si termina en .gz).",
+    ),
+    shard: Optional[str] = common.PLAN_SHARD_OPTION,
+    catalogue: bool = common.CATALOGUE_OPTION,
+    time_budget: Optional[str] = common.TIME_BUDGET_OPTION,
+    request_budget: Optional[int] = common.REQUEST_BUDGET_OPTION,
+):
+    """
+    Resolve the library like `tag` (or `clean` with --clean) and write the
+    planned tag changes to a plan file, to be applied later with `apply`.
+    """
+    logger.debug("Got plan as subcommand")
+    logger.debug(f"Got CLI values for --progress option: {progress}")
+
+    _select_instances()
+
+    # Disable the progress bar when debug logging is active
+    disable_progress = common.progress_disabled(progress, loglevel)
+
+    # Determine if CLI options should overwrite configuration settings
+    if not providers:
+        providers = config.providers
+    if not locale:
+        locale = config.locale
+    if not catalogue:
+        catalogue = config.catalogue_mode
+
+    # A plan file is made for one instance
+    if len(instances) > 1:
+        rich.print(
+            f"Hay varias instancias de Sonarr configuradas ({', '.join(instances)}), "
+            "elige una con --instance."
+        )
+        raise typer.Exit(code=1)
+
+    config.use_instance("sonarr", instances[0])
 
-    if series_to_purge:
-        sonarr.clean_tags(series_to_purge)
-        output.print_series_cleaned(series_to_purge)
-        rich.print(f"\nEtiqueta '{tag_label}' eliminada de {len(series_to_purge)} series en Sonarr.")
+    # Setup Sonarr Actions
+    sonarr = _get_sonarr_actions(
+        locale, catalogue=_get_catalogue(catalogue, series_id), record_checks=False
+    )
+    budget.start(time_budget, request_budget)
+
+    command = "clean" if clean else "tag"
+    iter_series = sonarr.iter_series_to_clean if clean else sonarr.iter_series_to_tag
+    found = iter_series(
+        providers,
+        config.fast_search,
+        disable_progress,
+        tmdb_api_key=config.tmdb_api_key,
+        not_available_tag=config.not_available_tag,
+        series_id=series_id,
+        shard=shard,
+    )
+    pending = (
+        (arr_id, values)
+        for arr_id, values in found
+        if values["title"] not in config.sonarr_excludes
+    )
+
+    # Changes are written to the plan file as they are planned
+    plan = Plan()
+    try:
+        with PlanWriter(
+            out, "sonarr", command, url=config.sonarr_url, instance=instances[0]
+        ) as writer:
+            for change in sonarr.plan_series(pending, plan):
+                writer.write(change)
+    except TooManyProviders as e:
+        common.exit_too_many_providers(e)
+
+    if plan.changes:
+        output.print_changes(plan.changes)
+        rich.print(
+            f"\nCambios de etiquetas de {writer.changes} series guardados en {out}. "
+            f"Aplícalos con: tagarr sonarr apply {out}"
+        )
     else:
-        rich.print(f"No se encontraron series con la etiqueta '{tag_label}'.")
+        rich.print(f"No hay cambios de etiquetas que planificar, {out} no tiene cambios.")
+
+    output.print_plan_counts(plan)
+    common.print_deferred("series")
+
+
+@app.command(help="Aplica en Sonarr un plan creado con 'plan'")
+def apply(
+    file: Path = typer.Argument(
+        ..., exists=True, dir_okay=False, metavar="FILE", help="Fichero del plan creado con 'plan'."
+    ),
+    dry_run: bool = typer.Option(
+        False,
+        "--dry-run",
+        help="Comprueba el plan contra Sonarr sin escribir nada.",
+    ),
+):
+    """
+    Apply a plan file made with `plan` in bulk. Items whose tags changed
+    since the plan was made are skipped.
+    """
+    logger.debug("Got apply as subcommand")
+
+    _select_instances()
+
+    try:
+        reader = PlanReader(file, "sonarr")
+    except InvalidPlanFile as e:
+        rich.print(f"No se puede aplicar el plan: {e}")
+        raise typer.Exit(code=1)
+
+    # Plans record the instance they were made for, older ones apply to the selected one
+    plan_instance = reader.header.get("instance")
+    if selected_instance and plan_instance and plan_instance != selected_instance:
+        rich.print(
+            f"No se puede aplicar el plan: se creó para la instancia '{plan_instance}', "
+            f"no para '{selected_instance}'"
+        )
+        raise typer.Exit(code=1)
+
+    try:
+        config.use_instance("sonarr", plan_instance or instances[0])
+    except ValueError as e:
+        rich.print(f"No se puede aplicar el plan: {e}")
+        raise typer.Exit(code=1)
+
+    if reader.header.get("url") != config.sonarr_url:
+        logger.warning(
+            f"The plan was made against {reader.header.get('url')}, "
+            f"applying it to {config.sonarr_url}"
+        )
+
+    # Setup Sonarr Actions (locale not needed but required by constructor, JustWatch is not used)
+    locale = config.locale or "en_US"
+    sonarr = _get_sonarr_actions(locale)
+
+    try:
+        applied, partial, up_to_date, conflicts = sonarr.apply_plan(reader, dry_run=dry_run)
+    except InvalidPlanFile as e:
+        rich.print(f"No se puede aplicar el plan: {e}")
+        raise typer.Exit(code=1)
+
+    if applied:
+        output.print_changes(applied)
+
+        if dry_run:
+            rich.print(
+                f"\nSimulación: el plan actualizaría {len(applied)} series en Sonarr, "
+                "no se ha escrito nada."
+            )
+        else:
+            rich.print(f"\nPlan aplicado a {len(applied)} series en Sonarr.")
+    elif not up_to_date and not partial:
+        rich.print("No se ha podido aplicar ningún cambio del plan.")
+
+    if up_to_date:
+        rich.print(f"{len(up_to_date)} series del plan ya estaban al día.")
+
+    if partial:
+        rich.print(
+            f"Se añadieron las etiquetas de {len(partial)} series pero no se eliminaron, "
+            "aplica el plan de nuevo para terminarlas."
+        )
+
+    if conflicts:
+        rich.print(
+            f"Se omitieron {len(conflicts)} series borradas o reetiquetadas desde que se creó "
+            "el plan, ejecuta plan de nuevo para incluirlas."
+        )
+
+    if partial or conflicts:
+        raise typer.Exit(code=1)
 
 
 @app.callback()
-def init():
+def init(
+    instance: Optional[str] = typer.Option(
+        None,
+        "--instance",
+        metavar="NAME",
+        help=(
+            "Usa solo la instancia de Sonarr con este nombre. "
+            "Por defecto se usan todas las configuradas."
+        ),
+    ),
+):
     """
-    Initializes the command. Reads the configuration.
+    Initializes the command. Reads the configuration; the Sonarr instances are
+    selected by the subcommands that use them.
     """
     logger.debug("Got sonarr as subcommand")
 
     # Set globals
     global config
     global loglevel
+    global selected_instance
 
     # Hacky way to get the current log level context
     loglevel = logger._core.min_level
@@ -207,6 +690,8 @@ def init():
     logger.debug("Reading configuration file")
     config = Config()
 
+    selected_instance = instance
+
 
 if __name__ == "__main__":
     app()
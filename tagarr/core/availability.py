@@ -0,0 +1,148 @@
+"""
+Availability of titles on the configured providers, as bitmasks.
+
+Every run builds a `ProviderIndex` of its providers, which gives each one a
+bit. The providers a title streams on are then a single integer: the
+episodes of a serie are aggregated with a bitwise OR, and the provider tags
+of an item are stale where its tag bits are not in its availability mask.
+
+Without a local store bits are assigned in package ID order, so the same
+provider set always gives the same bits. With one, the store hands them out
+for good, and `AvailabilityLog` keeps the mask of every title checked with
+the changes since the last check, which `tagarr report` answers from.
+"""
+
+from datetime import datetime
+
+from loguru import logger
+
+import tagarr.utils.metrics as metrics
+
+
+ADDED = "added"
+REMOVED = "removed"
+
+
+class ProviderIndex:
+    def __init__(self, jw_providers, positions=None):
+        # Provider ID -> {"short_name": ..., "clear_name": ...}, in the configured order
+        self.providers = jw_providers
+
+        if positions is None:
+            positions = {
+                provider_id: position for position, provider_id in enumerate(sorted(jw_providers))
+            }
+        self._bits = {provider_id: 1 << positions[provider_id] for provider_id in jw_providers}
+
+        # Mask with every provider, a title with it cannot gain more
+        self.all = self.mask(jw_providers)
+
+    def __len__(self):
+        return len(self._bits)
+
+    def mask(self, provider_ids):
+        """The mask of the configured providers among `provider_ids`."""
+        mask = 0
+        for provider_id in provider_ids:
+            mask |= self._bits.get(provider_id, 0)
+
+        return mask
+
+    def offers_mask(self, jw_data):
+        """The mask of the configured providers with an offer in JustWatch title, season or episode data."""
+        return self.mask(offer["provider_id"] for offer in jw_data.get("offers", ()))
+
+    def offers_expiry(self, jw_data):
+        """
+        The time the first configured provider stops offering JustWatch title,
+        season or episode data, None if no offer has an end date. A provider
+        with several offers leaves with the last one.
+        """
+        ends = {}
+        for offer in jw_data.get("offers", ()):
+            provider_id = offer["provider_id"]
+            if provider_id not in self._bits or ends.get(provider_id, 0) is None:
+                continue
+
+            end = _timestamp(offer.get("available_to"))
+            ends[provider_id] = None if end is None else max(end, ends.get(provider_id, end))
+
+        return min((end for end in ends.values() if end is not None), default=None)
+
+    def bits(self, mask):
+        """The (provider ID, bit) of the providers of `mask`."""
+        return [(provider_id, bit) for provider_id, bit in self._bits.items() if mask & bit]
+
+    def names(self, mask):
+        """The lowercase clear names of the providers of `mask`, in the configured order."""
+        return [
+            provider_details["clear_name"].lower()
+            for provider_id, provider_details in self.providers.items()
+            if mask & self._bits[provider_id]
+        ]
+
+    def label_bits(self, sanitize):
+        """Tag label -> bit of every provider, `sanitize` turns a clear name into its tag label."""
+        return {
+            sanitize(provider_details["clear_name"]): self._bits[provider_id]
+            for provider_id, provider_details in self.providers.items()
+        }
+
+
+def _timestamp(value):
+    """The time of a JustWatch date, None if it has none."""
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except (AttributeError, ValueError):
+        return None
+
+
+def provider_index(jw_providers, store=None):
+    """The `ProviderIndex` of a run, with the bits of the local store when there is one."""
+    if store is None:
+        return ProviderIndex(jw_providers)
+
+    names = {provider_id: details["clear_name"] for provider_id, details in jw_providers.items()}
+    return ProviderIndex(jw_providers, store.provider_bits(names))
+
+
+class AvailabilityLog:
+    """Keeps the availability of the checked titles in the local store, with what changed."""
+
+    def __init__(self, store, instance):
+        self.store = store
+        self.instance = instance
+
+    def checked(self):
+        """Arr ID -> time of the last check of the items of the instance."""
+        return self.store.get_checked(self.instance)
+
+    def record(self, arr_id, title, jw_id, mask, index, tags):
+        previous = self.store.get_availability(self.instance, arr_id)
+
+        changes = []
+        if previous is not None:
+            previous_mask, previous_providers, _ = previous
+
+            # Only providers checked both times can have changed
+            checked = previous_providers & index.all
+            changes = [
+                (provider_id, ADDED)
+                for provider_id, _ in index.bits(mask & ~previous_mask & checked)
+            ]
+            changes += [
+                (provider_id, REMOVED)
+                for provider_id, _ in index.bits(previous_mask & ~mask & checked)
+            ]
+
+        if changes:
+            logger.debug(f"Availability of {title} changed: {changes}")
+            metrics.increment("availability.changes", len(changes))
+
+        self.store.set_availability(
+            self.instance, arr_id, title, jw_id, mask, index.all, sorted(tags), changes
+        )
+
+    def record_tags(self, tags):
+        """Keep the tags written to items, Arr ID -> tag labels, so the report shows the tags they have now."""
+        self.store.set_availability_tags(self.instance, tags)
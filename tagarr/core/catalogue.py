@@ -0,0 +1,83 @@
+"""
+Catalogue mode: resolve the library against the catalogues of the providers.
+
+The default mode looks every library item up on JustWatch, a search and one
+or more details requests per title. In catalogue mode the titles with a
+flatrate offer on each configured provider are crawled instead, a page of
+`CATALOGUE_PAGE_SIZE` titles per request, and the library is joined against
+them locally by TMDB and IMDB ID. An item that is in no catalogue is not on
+any provider.
+
+The cost is the size of the provider catalogues instead of the size of the
+library, so it pays off for libraries much larger than what the configured
+providers have of it. One `Catalogue` can be shared by the instances of a run:
+every provider is crawled once.
+"""
+
+from loguru import logger
+
+import tagarr.utils.filters as filters
+import tagarr.utils.metrics as metrics
+
+from tagarr.modules.justwatch.justwatch import CATALOGUE_PAGE_SIZE
+
+
+class Catalogue:
+    """The titles on the crawled providers, by external ID."""
+
+    def __init__(self, content_type, page_size=CATALOGUE_PAGE_SIZE):
+        self.content_type = content_type
+        self.page_size = page_size
+
+        # Provider IDs already crawled
+        self.crawled = set()
+
+        # JustWatch ID -> provider IDs, and ("tmdb" | "imdb", ID) -> JustWatch ID
+        self._providers = {}
+        self._ids = {}
+
+    def crawl(self, justwatch_client, jw_providers):
+        """Crawl the catalogue of every provider of `jw_providers` that was not crawled yet."""
+        for provider_id, provider_details in jw_providers.items():
+            if provider_id in self.crawled:
+                continue
+
+            logger.debug(
+                f"Crawling the {self.content_type} catalogue of {provider_details['clear_name']}"
+            )
+            titles = 0
+
+            for item in justwatch_client.iter_catalogue(
+                provider_details["short_name"], self.content_type, self.page_size
+            ):
+                self._add(item, provider_id)
+                titles += 1
+
+            logger.debug(f"{provider_details['clear_name']} has {titles} titles")
+            metrics.increment("catalogue.titles", titles)
+            self.crawled.add(provider_id)
+
+    def _add(self, item, provider_id):
+        jw_id = item["id"]
+        self._providers.setdefault(jw_id, set()).add(provider_id)
+
+        external_ids = item.get("external_ids", [])
+        for tmdb_id in filters.get_tmdb_ids(external_ids):
+            self._ids[("tmdb", tmdb_id)] = jw_id
+        for imdb_id in filters.get_imdb_ids(external_ids):
+            self._ids[("imdb", imdb_id)] = jw_id
+
+    def find(self, ids):
+        """
+        Return the JustWatch ID and the provider IDs of the title with the
+        TMDB or IMDB ID of `ids`, or (None, set()) if it is in no catalogue.
+        """
+        for provider, value in (("tmdb", ids.get("tmdb")), ("imdb", ids.get("imdb"))):
+            jw_id = self._ids.get((provider, value)) if value else None
+
+            if jw_id is not None:
+                metrics.increment("catalogue.matched")
+                return jw_id, self._providers[jw_id]
+
+        metrics.increment("catalogue.unmatched")
+        return None, set()
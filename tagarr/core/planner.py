@@ -0,0 +1,183 @@
+"""
+Planning of tag writes.
+
+Before anything is written, the tags an item should have are compared with
+the tag IDs it already has. Every item is classified as:
+
+- `noop`: all the tags to add are there and none of the tags to remove is
+- `add` / `remove`: only tags to add, or only tags to remove
+- `update`: both
+
+Only the items that are not `noop` are written, so on a library whose
+availability did not change a run sends no writes at all. The deltas are
+kept as tag labels: a tag to add may not exist yet and is created when the
+change is applied.
+
+Plans can also be saved and applied later (`plan` / `apply`). Applying groups
+the changes with the same delta into bulk editor requests, and leaves out the
+items whose tags changed since they were planned.
+"""
+
+from collections import Counter
+
+import tagarr.utils.metrics as metrics
+
+
+NOOP = "noop"
+ADD = "add"
+REMOVE = "remove"
+UPDATE = "update"
+
+ACTIONS = [ADD, REMOVE, UPDATE, NOOP]
+
+# Items per bulk editor request
+EDITOR_BATCH_SIZE = 250
+
+
+class Change:
+    """The tag delta of one Arr item."""
+
+    def __init__(self, arr_id, title, current, add=(), remove=()):
+        self.arr_id = arr_id
+        self.title = title
+        self.current = sorted(current)
+        self.add = list(add)
+        self.remove = list(remove)
+
+    @property
+    def action(self):
+        if self.add and self.remove:
+            return UPDATE
+        if self.add:
+            return ADD
+        if self.remove:
+            return REMOVE
+
+        return NOOP
+
+    def to_dict(self):
+        return {
+            "id": self.arr_id,
+            "title": self.title,
+            "tags": self.current,
+            "add": self.add,
+            "remove": self.remove,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data["id"], data.get("title"), data["tags"], data.get("add", []), data.get("remove", [])
+        )
+
+    def target(self, tag_ids):
+        """The tag IDs of the item once the change is applied, None while a tag to add does not exist."""
+        if any(label not in tag_ids for label in self.add):
+            return None
+
+        tags = set(self.current) | {tag_ids[label] for label in self.add}
+        return tags - {tag_ids[label] for label in self.remove if label in tag_ids}
+
+    def remaining(self, tags, tag_ids):
+        """
+        The change left to apply to an item that now has the `tags` IDs, e.g.
+        only the removal once the tags were added, or None when its tags
+        changed other than by this change since it was planned.
+        """
+        delta = {tag_ids[label] for label in self.add + self.remove if label in tag_ids}
+        if set(tags) - delta != set(self.current) - delta:
+            return None
+
+        return Change(
+            self.arr_id,
+            self.title,
+            tags,
+            [label for label in self.add if tag_ids.get(label) not in tags],
+            [label for label in self.remove if tag_ids.get(label) in tags],
+        )
+
+
+def plan_change(arr_id, title, current, tag_ids, add=(), remove=()):
+    """
+    Return the `Change` that takes an item with the `current` tag IDs to one
+    with the `add` labels and without the `remove` labels. `tag_ids` maps the
+    labels of the existing tags to their IDs.
+    """
+    current = set(current)
+    add = [label for label in dict.fromkeys(add) if tag_ids.get(label) not in current]
+    remove = [label for label in dict.fromkeys(remove) if tag_ids.get(label) in current]
+
+    return Change(arr_id, title, current, add, remove)
+
+
+class Plan:
+    """
+    Counts of the planned changes by action, and the changes that were
+    written. With a listener the changes are handed to it instead of kept.
+    """
+
+    def __init__(self, listener=None):
+        self.counts = Counter()
+        self.changes = []
+
+        # Called with every written change, e.g. to stream it
+        self.listener = listener
+
+    def __getstate__(self):
+        # Plans of shard processes are sent back without it
+        return dict(self.__dict__, listener=None)
+
+    def add(self, change):
+        action = change.action
+        self.counts[action] += 1
+        metrics.increment(f"plan.{action}")
+
+    def done(self, change):
+        """
+        Keep a change once it was written, or once planned when nothing is
+        written (dry runs and plan files), so a failed write is not reported.
+        """
+        if self.listener is not None:
+            self.listener(change)
+        else:
+            self.changes.append(change)
+
+    def merge(self, other):
+        """Add the counts and changes of another plan, e.g. of another shard."""
+        self.counts.update(other.counts)
+        self.changes.extend(other.changes)
+
+    @property
+    def total(self):
+        return sum(self.counts.values())
+
+
+def group_changes(changes, current_tags, tag_ids):
+    """
+    Sort planned changes out against the `current_tags` (Arr ID -> tag IDs) of
+    the library. Return the batches of changes with the same delta, keyed by
+    (add, remove), with what is left of the ones partly applied; the changes
+    that are already applied; and the conflicts, changes whose item was
+    deleted or whose tags changed since planning.
+    """
+    batches = {}
+    up_to_date = []
+    conflicts = []
+
+    for change in changes:
+        tags = current_tags.get(change.arr_id)
+        left = change.remaining(tags, tag_ids) if tags is not None else None
+
+        if left is None:
+            conflicts.append(change)
+        elif left.action == NOOP:
+            up_to_date.append(change)
+        else:
+            batches.setdefault((tuple(left.add), tuple(left.remove)), []).append(left)
+
+    return batches, up_to_date, conflicts
+
+
+def batched(items, size=EDITOR_BATCH_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
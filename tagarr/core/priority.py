@@ -0,0 +1,64 @@
+"""
+Priority order of the library items of a budgeted run.
+
+A run with a time or request budget may not get through the whole library,
+so it resolves first the items whose refresh is worth the most:
+
+1. never checked: not in the availability of the local store,
+2. added to Radarr/Sonarr in the last `RECENTLY_ADDED` seconds,
+3. tagged with a provider, a tag that goes stale when the title leaves it,
+4. the rest,
+5. tagged with `not_available_tag`, which seldom changes.
+
+Within a group the newest items come first in the first two, and the ones
+checked longest ago in the others, so successive budgeted runs cycle
+through the library.
+"""
+
+import time
+
+from datetime import datetime
+
+
+RECENTLY_ADDED = 7 * 86400
+
+NEVER_CHECKED = 0
+ADDED = 1
+TAGGED = 2
+OTHER = 3
+NOT_AVAILABLE = 4
+
+
+def added_time(item):
+    """The time an Arr object was added, 0 if unknown."""
+    try:
+        return datetime.fromisoformat(item["added"].replace("Z", "+00:00")).timestamp()
+    except (KeyError, AttributeError, ValueError):
+        return 0.0
+
+
+def prioritize(items, checked, provider_tag_ids, not_available_tag_id=None, now=None):
+    """
+    Sort Arr objects by priority. `checked` maps Arr IDs to the time of their
+    last check, `provider_tag_ids` are the IDs of the provider tags.
+    """
+    now = now if now is not None else time.time()
+
+    def key(item):
+        tags = set(item.get("tags", []))
+        last_checked = checked.get(item["id"])
+
+        if not_available_tag_id is not None and not_available_tag_id in tags:
+            return NOT_AVAILABLE, last_checked or 0
+        if last_checked is None:
+            return NEVER_CHECKED, -added_time(item)
+
+        added = added_time(item)
+        if now - added < RECENTLY_ADDED:
+            return ADDED, -added
+        if tags & provider_tag_ids:
+            return TAGGED, last_checked
+
+        return OTHER, last_checked
+
+    return sorted(items, key=key)
@@ -1,25 +1,102 @@
 import re
+import threading
+
 
 from loguru import logger
 from rich.progress import Progress
 from pyarr import RadarrAPI
 
+import tagarr.core.planner as planner
+import tagarr.core.priority as priority
+import tagarr.core.schedule as schedule
+import tagarr.utils.budget as budget
 import tagarr.utils.filters as filters
+import tagarr.utils.metrics as metrics
+import tagarr.utils.pipeline as pipeline
+import tagarr.utils.tracing as tracing
 
+from tagarr.core.availability import AvailabilityLog, provider_index
+from tagarr.core.resolver import Lookup, Resolver
 from tagarr.modules.justwatch import JustWatch
-from tagarr.modules.justwatch.exceptions import JustWatchNotFound, JustWatchTooManyRequests
+from tagarr.utils.checkpoint import library_snapshot
+from tagarr.utils.sessions import configure_arr_session
 
 
 class RadarrActions:
-    def __init__(self, url, api_key, locale):
+    def __init__(
+        self,
+        url,
+        api_key,
+        locale,
+        justwatch_url=None,
+        justwatch_pool_size=10,
+        verify_ssl=True,
+        timeout=30,
+        retries=3,
+        pool_size=10,
+        store=None,
+        tag_lock=None,
+        instance="radarr",
+        resolved=None,
+        catalogue=None,
+        recheck_interval=schedule.RECHECK_INTERVAL,
+        clean_max_age=schedule.CLEAN_MAX_AGE,
+        record_checks=True,
+    ):
         logger.debug(f"Initializing PyRadarr")
         self.radarr_client = RadarrAPI(url, api_key)
+        configure_arr_session(self.radarr_client.session, verify_ssl, timeout, retries, pool_size)
+
+        # The JustWatch client and the resolver are made on first use, applying a plan needs neither
+        self.locale = locale
+        self.justwatch_url = justwatch_url
+        self.justwatch_pool_size = justwatch_pool_size
+        self.instance = instance
+        self._justwatch_client = None
+        self._resolver = None
+
+        self.store = store
+        self.schedule = None
+        if store is not None:
+            self.schedule = schedule.CheckSchedule(store, instance, recheck_interval)
+        self.clean_max_age = clean_max_age
+        self.availability = AvailabilityLog(store, instance) if store is not None else None
+
+        # Runs that write nothing read the schedule and the availability but leave them as they are
+        self.record_checks = record_checks
+
+        # Providers of the titles resolved in this run, shared with the other instances
+        self.resolved = resolved
+
+        # Provider catalogues to join the library against instead of looking every title up
+        self.catalogue = catalogue
+
+        # Cache for tags: label -> tag_id. The writer thread replaces it instead of
+        # changing it, so other threads can iterate over the one they hold
+        self._tag_cache = {}
 
-        logger.debug(f"Initializing JustWatch API with locale: {locale}")
-        self.justwatch_client = JustWatch(locale)
+        # Held while creating a tag, shared with other shards
+        self.tag_lock = tag_lock or threading.Lock()
 
-        # Cache for tags: label -> tag_id
-        self._tag_cache = {}
+    def _init_justwatch(self):
+        if self._justwatch_client is None:
+            logger.debug(f"Initializing JustWatch API with locale: {self.locale}")
+            self._justwatch_client = JustWatch(
+                self.locale, api_url=self.justwatch_url, pool_size=self.justwatch_pool_size
+            )
+            self._resolver = Resolver(
+                self._justwatch_client, "movie", self.store, instance=self.instance
+            )
+
+    @property
+    def justwatch_client(self):
+        self._init_justwatch()
+        return self._justwatch_client
+
+    @property
+    def resolver(self):
+        self._init_justwatch()
+        return self._resolver
 
     def _load_tags(self):
         """Load all existing tags from Radarr into the cache."""
@@ -41,71 +118,143 @@ class RadarrActions:
         if label in self._tag_cache:
             return self._tag_cache[label]
 
-        logger.debug(f"Creating new tag: {label}")
-        result = self.radarr_client.create_tag(label)
-        self._tag_cache[label] = result["id"]
-        return result["id"]
-
-    def _get_provider_tag_labels(self):
-        """Get the set of all provider tag labels that are managed by Tagarr."""
-        return {label for label in self._tag_cache.keys()}
-
-    def _get_jw_movie_data(self, title, jw_entry):
-        jw_id = jw_entry["id"]
-        jw_movie_data = {}
-        jw_tmdb_ids = []
-
-        try:
-            logger.debug(f"Querying JustWatch API with ID: {jw_id} for title: {title}")
-            jw_movie_data = self.justwatch_client.get_movie(jw_id)
-
-            jw_tmdb_ids = filters.get_tmdb_ids(jw_movie_data.get("external_ids", []))
-            logger.debug(f"Got TMDB ID's: {jw_tmdb_ids} from JustWatch API")
-        except JustWatchNotFound:
-            logger.warning(f"Could not find title: {title} with JustWatch ID: {jw_id}")
-        except JustWatchTooManyRequests:
-            logger.error(f"JustWatch API returned 'Too Many Requests'")
-
-        return jw_movie_data, jw_tmdb_ids
-
-    def _find_movie(self, movie, jw_providers, fast):
-        title = movie["title"]
-        tmdb_id = movie["tmdbId"]
-        release_year = filters.get_release_date(movie, format="%Y")
-        providers = [values["short_name"] for _, values in jw_providers.items()]
+        with self.tag_lock:
+            # Another shard may have created it in the meantime
+            self._load_tags()
+            if label in self._tag_cache:
+                return self._tag_cache[label]
+
+            logger.debug(f"Creating new tag: {label}")
+            result = self.radarr_client.create_tag(label)
+            self._tag_cache = {**self._tag_cache, label: result["id"]}
+            return result["id"]
+
+    def _get_tag_labels(self, tag_ids):
+        """The labels of the loaded tags among `tag_ids`."""
+        return [label for label, tag_id in self._tag_cache.items() if tag_id in tag_ids]
+
+    def _record(self, item, jw_id, mask, index):
+        """Keep the availability of a checked item for `tagarr report`."""
+        if self.availability is not None and self.record_checks:
+            self.availability.record(
+                item["id"],
+                item["title"],
+                jw_id,
+                mask,
+                index,
+                self._get_tag_labels(item.get("tags", [])),
+            )
 
-        jw_query_payload = {}
-        if fast:
-            jw_query_payload.update({"page_size": 3})
-            jw_query_payload.update(
-                {"monetization_types": ["flatrate"], "providers": providers}
+    def _record_tags(self, tags):
+        """Keep the tags of written items, Arr ID -> tag IDs, for `tagarr report`."""
+        if self.availability is not None:
+            self.availability.record_tags(
+                {arr_id: self._get_tag_labels(tag_ids) for arr_id, tag_ids in tags.items()}
             )
 
-            if release_year:
-                jw_query_payload.update(
-                    {
-                        "release_year_from": int(release_year),
-                        "release_year_until": int(release_year),
-                    }
-                )
+    def _prioritize(self, radarr_movies, index, not_available_tag):
+        """Order the movies of a budgeted run by priority, see `tagarr.core.priority`."""
+        if not budget.limited():
+            return radarr_movies
 
-        logger.debug(f"Query JustWatch API with title: {title}")
-        jw_query_data = self.justwatch_client.query_title(title, "movie", fast, **jw_query_payload)
+        if not self._tag_cache:
+            self._load_tags()
 
-        for entry in jw_query_data["items"]:
-            jw_id = entry["id"]
-            jw_movie_data, jw_tmdb_ids = self._get_jw_movie_data(title, entry)
+        label_bits = index.label_bits(self._sanitize_tag)
+        provider_tag_ids = {
+            tag_id for label, tag_id in self._tag_cache.items() if label in label_bits
+        }
+        not_available_tag_id = None
+        if not_available_tag:
+            not_available_tag_id = self._tag_cache.get(self._sanitize_tag(not_available_tag))
+        checked = self.availability.checked() if self.availability is not None else {}
 
-            if tmdb_id in jw_tmdb_ids:
-                logger.debug(f"Found JustWatch ID: {jw_id} for {title} with TMDB ID: {tmdb_id}")
-                return jw_id, jw_movie_data
+        return priority.prioritize(radarr_movies, checked, provider_tag_ids, not_available_tag_id)
 
-        return None, None
+    def _get_provider_tag_labels(self):
+        """Get the set of all provider tag labels that are managed by Tagarr."""
+        return {label for label in self._tag_cache.keys()}
 
-    def get_movies_to_tag(self, providers, fast=True, disable_progress=False, not_available_tag=None, movie_id=None):
-        """Find movies available on streaming providers and return them with provider names."""
-        tag_movies = {}
+    def _get_lookup(self, movie, index, fast):
+        release_year = filters.get_release_date(movie, format="%Y")
+        providers = [values["short_name"] for _, values in index.providers.items()]
+
+        return Lookup(
+            movie["id"],
+            movie["title"],
+            {"tmdb": movie["tmdbId"], "imdb": movie.get("imdbId")},
+            year=release_year,
+            providers=providers,
+            fast=fast,
+        )
 
+    def _get_movie_providers(self, movie, index, fast, recheck=False, max_age=None):
+        """
+        Return the JustWatch ID of a movie and the availability mask of the
+        configured providers it streams on. Movies are skipped until their
+        recheck is due (see `tagarr.core.schedule`), unless `recheck` is set;
+        With a `max_age` the ones on a provider checked longer ago are due too.
+        """
+        radarr_id = movie["id"]
+        title = movie["title"]
+        lookup = self._get_lookup(movie, index, fast)
+
+        # Joining is free, so the recheck schedule does not apply
+        if self.catalogue is not None:
+            jw_id, provider_ids = self.catalogue.find(lookup.ids)
+            mask = index.mask(provider_ids)
+            self._record(movie, jw_id, mask, index)
+            return jw_id, mask
+
+        fingerprint = schedule.fingerprint(lookup, index.providers.keys())
+
+        if self.schedule and not recheck:
+            pending = self.schedule.pending(radarr_id, fingerprint, max_age)
+            if pending:
+                outcome, jw_id, mask = pending
+                logger.debug(f"Skipping {title} ({outcome}) until its next recheck")
+                return jw_id, mask
+
+        shared = self.resolved.get(fingerprint) if self.resolved is not None else None
+        if shared:
+            logger.debug(f"Reusing the providers of {title} resolved for another instance")
+            metrics.increment("resolve.shared")
+            jw_id, mask, outcome, expires = shared
+        else:
+            with tracing.item("radarr", radarr_id, title):
+                jw_id, jw_movie_data = self.resolver.resolve(lookup)
+
+            mask = index.offers_mask(jw_movie_data) if jw_movie_data else 0
+            expires = index.offers_expiry(jw_movie_data) if mask else None
+
+            outcome = schedule.AVAILABLE
+            if not mask:
+                outcome = schedule.NO_PROVIDER if jw_movie_data else schedule.NOT_FOUND
+
+            if self.resolved is not None and not lookup.failed:
+                self.resolved[fingerprint] = (jw_id, mask, outcome, expires)
+
+        if not lookup.failed:
+            if self.schedule and self.record_checks:
+                self.schedule.record(radarr_id, fingerprint, outcome, jw_id, expires)
+            self._record(movie, jw_id, mask, index)
+
+        return jw_id, mask
+
+    def iter_movies_to_tag(
+        self,
+        providers,
+        fast=True,
+        disable_progress=False,
+        not_available_tag=None,
+        movie_id=None,
+        checkpoint=None,
+        shard=None,
+    ):
+        """
+        Find movies available on streaming providers and yield them with provider
+        names as (radarr_id, movie_data) pairs, each one as soon as it is resolved.
+        """
         if movie_id:
             logger.debug(f"Getting movie with ID {movie_id} from Radarr")
             radarr_movies = [self.radarr_client.get_movie(id_=movie_id)]
@@ -113,12 +262,24 @@ class RadarrActions:
             logger.debug("Getting all the movies from Radarr")
             radarr_movies = self.radarr_client.get_movie()
 
+        if shard:
+            radarr_movies = shard.filter(radarr_movies)
+            logger.debug(f"Processing shard {shard}: {len(radarr_movies)} movies")
+
         raw_jw_providers = self.justwatch_client.get_providers()
         jw_providers = filters.get_providers(raw_jw_providers, providers)
+        index = provider_index(jw_providers, self.store)
+        if self.catalogue is not None:
+            self.catalogue.crawl(self.justwatch_client, jw_providers)
+        radarr_movies = self._prioritize(radarr_movies, index, not_available_tag)
         logger.debug(
             f"Got the following providers: {', '.join([v['clear_name'] for _, v in jw_providers.items()])}"
         )
 
+        if checkpoint:
+            snapshot = library_snapshot(radarr_movies, ["tmdbId", "imdbId"])
+            checkpoint.begin("radarr tag", snapshot, jw_providers.keys())
+
         progress = Progress(disable=disable_progress)
         with progress:
             for movie in progress.track(radarr_movies):
@@ -126,82 +287,243 @@ class RadarrActions:
                 title = movie["title"]
                 tmdb_id = movie["tmdbId"]
 
+                if checkpoint and checkpoint.has_result(radarr_id):
+                    result = checkpoint.get_result(radarr_id)
+                    if result:
+                        yield radarr_id, dict(result, radarr_object=movie)
+                    continue
+
+                # Out of budget, the item is left for the next run
+                if budget.exhausted():
+                    continue
+
                 logger.debug(
                     f"Processing title: {title} with Radarr ID: {radarr_id} and TMDB ID: {tmdb_id}"
                 )
 
-                jw_id, jw_movie_data = self._find_movie(movie, jw_providers, fast)
-
-                matched_providers = []
-                if jw_movie_data:
-                    movie_providers = filters.get_jw_providers(jw_movie_data)
-                    matched_providers = list(set(movie_providers.keys()) & set(jw_providers.keys()))
-
-                if matched_providers:
-                    clear_names = [
-                        provider_details["clear_name"].lower()
-                        for provider_id, provider_details in jw_providers.items()
-                        if provider_id in matched_providers
-                    ]
-
-                    tag_movies.update(
-                        {
-                            radarr_id: {
-                                "title": title,
-                                "radarr_object": movie,
-                                "tmdb_id": tmdb_id,
-                                "jw_id": jw_id,
-                                "providers": clear_names,
-                            }
-                        }
-                    )
+                jw_id, mask = self._get_movie_providers(movie, index, fast, recheck=bool(movie_id))
+                clear_names = index.names(mask)
+
+                result = None
+                if clear_names:
+                    result = {
+                        "title": title,
+                        "radarr_object": movie,
+                        "tmdb_id": tmdb_id,
+                        "jw_id": jw_id,
+                        "providers": clear_names,
+                    }
 
                     logger.debug(f"{title} is streaming on {', '.join(clear_names)}")
                 elif not_available_tag:
-                    tag_movies.update(
-                        {
-                            radarr_id: {
-                                "title": title,
-                                "radarr_object": movie,
-                                "tmdb_id": tmdb_id,
-                                "jw_id": jw_id,
-                                "providers": [not_available_tag],
-                            }
-                        }
+                    result = {
+                        "title": title,
+                        "radarr_object": movie,
+                        "tmdb_id": tmdb_id,
+                        "jw_id": jw_id,
+                        "providers": [not_available_tag],
+                    }
+
+                    logger.debug(
+                        f"{title} is not available on any provider, tagging with '{not_available_tag}'"
                     )
 
-                    logger.debug(f"{title} is not available on any provider, tagging with '{not_available_tag}'")
+                if checkpoint:
+                    checkpoint.add_result(radarr_id, result)
 
-        return tag_movies
+                if result:
+                    yield radarr_id, result
 
-    def tag_movies(self, movies_with_providers):
-        """Add streaming provider tags to movies in Radarr."""
-        logger.debug("Starting the tagging process for movies")
-        self._load_tags()
+    def get_movies_to_tag(self, *args, **kwargs):
+        """Find movies available on streaming providers and return them with provider names."""
+        return dict(self.iter_movies_to_tag(*args, **kwargs))
+
+    def _plan(self, movies, plan, checkpoint=None):
+        """Plan the tag change of each (radarr_id, movie_data) pair, yield the ones to write."""
+        for radarr_id, movie_data in movies:
+            if checkpoint and checkpoint.is_written(radarr_id):
+                continue
 
-        for radarr_id, movie_data in movies_with_providers.items():
             movie_obj = movie_data["radarr_object"]
-            title = movie_data["title"]
-            provider_names = movie_data["providers"]
+            change = planner.plan_change(
+                radarr_id,
+                movie_data["title"],
+                movie_obj.get("tags", []),
+                self._tag_cache,
+                add=[self._sanitize_tag(name) for name in movie_data.get("providers", [])],
+                remove=movie_data.get("tags_removed", []),
+            )
+            plan.add(change)
+
+            if change.action == planner.NOOP:
+                logger.debug(f"Tags of movie {change.title} (ID: {radarr_id}) are up to date")
+                continue
+
+            yield change, movie_obj
 
-            current_tags = set(movie_obj.get("tags", []))
+    def _put_movie(self, movie_obj):
+        # pyarr's upd_movie prints the type of every movie it updates to stdout. `_put` is
+        # private, setup.py pins the pyarr versions it was tested with
+        return self.radarr_client._put("movie", self.radarr_client.ver_uri, data=movie_obj)
 
-            for provider_name in provider_names:
-                tag_id = self._get_or_create_tag(provider_name)
-                current_tags.add(tag_id)
+    def apply_change(self, change, movie_obj, checkpoint=None):
+        """Write a planned tag change of one movie to Radarr, return whether it was written."""
+        current_tags = set(movie_obj.get("tags", []))
 
+        with tracing.item("radarr", change.arr_id, change.title), tracing.phase("write"):
+            current_tags.update(self._get_or_create_tag(label) for label in change.add)
+            current_tags.difference_update(self._tag_cache[label] for label in change.remove)
             movie_obj["tags"] = list(current_tags)
 
             try:
-                logger.debug(f"Updating tags for movie: {title} (ID: {radarr_id})")
-                self.radarr_client.upd_movie(movie_obj)
+                logger.debug(
+                    f"Updating tags for movie: {change.title} (ID: {change.arr_id}), "
+                    f"adding {change.add}, removing {change.remove}"
+                )
+                self._put_movie(movie_obj)
             except Exception as e:
-                logger.error(f"Failed to update tags for {title}: {e}")
+                logger.error(f"Failed to update tags for {change.title}: {e}")
+                return False
 
-    def get_movies_to_clean(self, providers, fast=True, disable_progress=False, not_available_tag=None, movie_id=None):
-        """Find movies with stale streaming provider tags."""
-        clean_movies = {}
+        self._record_tags({change.arr_id: current_tags})
+
+        if checkpoint:
+            checkpoint.mark_written(change.arr_id)
+
+        return True
+
+    def _write(self, movies, checkpoint=None, plan=None, dry_run=False):
+        if isinstance(movies, dict):
+            movies = movies.items()
+
+        plan = plan if plan is not None else planner.Plan()
+        changes = self._plan(movies, plan, checkpoint)
 
+        if dry_run:
+            for change, _ in changes:
+                plan.done(change)
+            return
+
+        def write(entry):
+            if self.apply_change(*entry, checkpoint):
+                plan.done(entry[0])
+
+        pipeline.run(changes, write)
+
+    def plan_movies(self, movies, plan):
+        """Plan the tag changes of (radarr_id, movie_data) pairs, yield the ones with a delta."""
+        self._load_tags()
+
+        if isinstance(movies, dict):
+            movies = movies.items()
+
+        for change, _ in self._plan(movies, plan):
+            plan.done(change)
+            yield change
+
+    def _edit_tags(self, radarr_ids, labels, apply_tags):
+        """Add (`apply_tags` "add") or remove tags of many movies with the Radarr movie editor."""
+        if apply_tags == "add":
+            tag_ids = [self._get_or_create_tag(label) for label in labels]
+        else:
+            tag_ids = [self._tag_cache[label] for label in labels if label in self._tag_cache]
+
+        if tag_ids:
+            self.radarr_client.upd_movies(
+                {"movieIds": radarr_ids, "tags": tag_ids, "applyTags": apply_tags}
+            )
+
+    def apply_plan(self, changes, dry_run=False):
+        """
+        Apply planned changes in bulk, one editor request per batch of movies
+        with the same delta. Returns the changes that are applied; the ones
+        partly applied, whose tags were added but not removed; the ones that
+        already were; and the conflicts, whose movie was deleted or had its
+        tags changed since the plan was made. Applying the plan again
+        finishes the partly applied changes.
+        """
+        self._load_tags()
+
+        logger.debug("Getting all the movies from Radarr")
+        current_tags = {
+            movie["id"]: set(movie.get("tags", [])) for movie in self.radarr_client.get_movie()
+        }
+
+        batches, up_to_date, conflicts = planner.group_changes(
+            changes, current_tags, self._tag_cache
+        )
+        applied = []
+        partial = []
+
+        for change in conflicts:
+            logger.warning(
+                f"{change.title} (ID: {change.arr_id}) was deleted or its tags changed since "
+                f"the plan was made, skipping it"
+            )
+
+        for (add, remove), batch in batches.items():
+            for chunk in planner.batched(batch):
+                radarr_ids = [change.arr_id for change in chunk]
+
+                if dry_run:
+                    applied.extend(chunk)
+                    continue
+
+                logger.debug(
+                    f"Updating tags of {len(radarr_ids)} movies, "
+                    f"adding {list(add)}, removing {list(remove)}"
+                )
+                added = False
+                try:
+                    if add:
+                        self._edit_tags(radarr_ids, add, "add")
+                        added = True
+                    if remove:
+                        self._edit_tags(radarr_ids, remove, "remove")
+                except Exception as e:
+                    logger.error(f"Failed to update tags of {len(radarr_ids)} movies: {e}")
+
+                    # The tags were added but not removed, applying the plan again removes them
+                    if added:
+                        self._record_tags(
+                            {
+                                change.arr_id: set(change.current)
+                                | {self._tag_cache[label] for label in add}
+                                for change in chunk
+                            }
+                        )
+                        partial.extend(chunk)
+                    continue
+
+                self._record_tags(
+                    {change.arr_id: change.target(self._tag_cache) for change in chunk}
+                )
+                applied.extend(chunk)
+
+        return applied, partial, up_to_date, conflicts
+
+    def tag_movies(self, movies_with_providers, checkpoint=None, plan=None, dry_run=False):
+        """
+        Add streaming provider tags to movies in Radarr. Takes a dict or an
+        iterable of (radarr_id, movie_data) pairs, which is written while it
+        is still being produced. Only the movies missing a tag are written;
+        with `dry_run` nothing is, the `plan` just counts the changes.
+        """
+        logger.debug("Starting the tagging process for movies")
+        self._load_tags()
+        self._write(movies_with_providers, checkpoint, plan, dry_run)
+
+    def iter_movies_to_clean(
+        self,
+        providers,
+        fast=True,
+        disable_progress=False,
+        not_available_tag=None,
+        movie_id=None,
+        checkpoint=None,
+        shard=None,
+    ):
+        """Find movies with stale provider tags, yielding (radarr_id, movie_data) pairs."""
         if movie_id:
             logger.debug(f"Getting movie with ID {movie_id} from Radarr")
             radarr_movies = [self.radarr_client.get_movie(id_=movie_id)]
@@ -209,6 +531,10 @@ class RadarrActions:
             logger.debug("Getting all the movies from Radarr")
             radarr_movies = self.radarr_client.get_movie()
 
+        if shard:
+            radarr_movies = shard.filter(radarr_movies)
+            logger.debug(f"Processing shard {shard}: {len(radarr_movies)} movies")
+
         # Load tags and build reverse lookup (tag_id -> label)
         self._load_tags()
         tag_id_to_label = {v: k for k, v in self._tag_cache.items()}
@@ -216,17 +542,23 @@ class RadarrActions:
         # Build the set of provider tag labels we manage
         raw_jw_providers = self.justwatch_client.get_providers()
         jw_providers = filters.get_providers(raw_jw_providers, providers)
-        provider_labels = {v["clear_name"].lower() for _, v in jw_providers.items()}
+        index = provider_index(jw_providers, self.store)
+        if self.catalogue is not None:
+            self.catalogue.crawl(self.justwatch_client, jw_providers)
+        radarr_movies = self._prioritize(radarr_movies, index, not_available_tag)
+        label_bits = index.label_bits(self._sanitize_tag)
 
         # Include not_available_tag as a managed label
         not_available_label = self._sanitize_tag(not_available_tag) if not_available_tag else None
-        managed_labels = set(provider_labels)
+        managed_labels = set(label_bits)
         if not_available_label:
             managed_labels.add(not_available_label)
 
-        logger.debug(
-            f"Got the following providers: {', '.join(provider_labels)}"
-        )
+        logger.debug(f"Got the following providers: {', '.join(label_bits)}")
+
+        if checkpoint:
+            snapshot = library_snapshot(radarr_movies, ["tmdbId", "imdbId"])
+            checkpoint.begin("radarr clean", snapshot, jw_providers.keys())
 
         progress = Progress(disable=disable_progress)
         with progress:
@@ -235,6 +567,12 @@ class RadarrActions:
                 title = movie["title"]
                 current_tags = movie.get("tags", [])
 
+                if checkpoint and checkpoint.has_result(radarr_id):
+                    result = checkpoint.get_result(radarr_id)
+                    if result:
+                        yield radarr_id, dict(result, radarr_object=movie)
+                    continue
+
                 # Find which current tags are managed tags (providers + not_available_tag)
                 current_provider_tags = {}
                 for tag_id in current_tags:
@@ -246,51 +584,49 @@ class RadarrActions:
                 if not current_provider_tags:
                     continue
 
-                logger.debug(
-                    f"Processing title: {title} with Radarr ID: {radarr_id}"
-                )
+                # Out of budget, the item is left for the next run
+                if budget.exhausted():
+                    continue
 
-                # Find which providers the movie is currently on
-                jw_id, jw_movie_data = self._find_movie(movie, jw_providers, fast)
-
-                current_jw_providers = set()
-                if jw_movie_data:
-                    movie_providers = filters.get_jw_providers(jw_movie_data)
-                    matched_providers = list(set(movie_providers.keys()) & set(jw_providers.keys()))
-                    current_jw_providers = {
-                        provider_details["clear_name"].lower()
-                        for provider_id, provider_details in jw_providers.items()
-                        if provider_id in matched_providers
-                    }
+                logger.debug(f"Processing title: {title} with Radarr ID: {radarr_id}")
+
+                # Find which providers the movie is currently on, rechecking the
+                # ones on a provider checked too long ago so that ended offers are noticed
+                jw_id, mask = self._get_movie_providers(
+                    movie, index, fast, recheck=bool(movie_id), max_age=self.clean_max_age
+                )
 
                 # Find stale tags
                 stale_tags = {}
                 for tag_id, label in current_provider_tags.items():
                     if label == not_available_label:
                         # not_available_tag is stale if the movie now has providers
-                        if current_jw_providers:
+                        if mask:
                             stale_tags[tag_id] = label
                     else:
                         # Provider tags are stale if no longer on that provider
-                        if label not in current_jw_providers:
+                        if not mask & label_bits[label]:
                             stale_tags[tag_id] = label
 
+                result = None
                 if stale_tags:
-                    clean_movies.update(
-                        {
-                            radarr_id: {
-                                "title": title,
-                                "radarr_object": movie,
-                                "tags_removed": list(stale_tags.values()),
-                                "stale_tag_ids": list(stale_tags.keys()),
-                            }
-                        }
-                    )
-                    logger.debug(
-                        f"{title} has stale tags: {', '.join(stale_tags.values())}"
-                    )
+                    result = {
+                        "title": title,
+                        "radarr_object": movie,
+                        "tags_removed": list(stale_tags.values()),
+                        "stale_tag_ids": list(stale_tags.keys()),
+                    }
+                    logger.debug(f"{title} has stale tags: {', '.join(stale_tags.values())}")
+
+                if checkpoint:
+                    checkpoint.add_result(radarr_id, result)
 
-        return clean_movies
+                if result:
+                    yield radarr_id, result
+
+    def get_movies_to_clean(self, *args, **kwargs):
+        """Find movies with stale streaming provider tags."""
+        return dict(self.iter_movies_to_clean(*args, **kwargs))
 
     def get_movies_to_purge_tag(self, tag_label):
         """Find all movies that have a specific tag."""
@@ -319,20 +655,12 @@ class RadarrActions:
 
         return purge_movies
 
-    def clean_tags(self, movies_with_stale_tags):
-        """Remove stale streaming provider tags from movies in Radarr."""
+    def clean_tags(self, movies_with_stale_tags, checkpoint=None, plan=None, dry_run=False):
+        """
+        Remove stale streaming provider tags from movies in Radarr. Like
+        `tag_movies`, takes a dict or an iterable of (radarr_id, movie_data) pairs.
+        """
         logger.debug("Starting the tag cleanup process for movies")
 
-        for radarr_id, movie_data in movies_with_stale_tags.items():
-            movie_obj = movie_data["radarr_object"]
-            title = movie_data["title"]
-            stale_tag_ids = set(movie_data["stale_tag_ids"])
-
-            current_tags = set(movie_obj.get("tags", []))
-            movie_obj["tags"] = list(current_tags - stale_tag_ids)
-
-            try:
-                logger.debug(f"Cleaning tags for movie: {title} (ID: {radarr_id})")
-                self.radarr_client.upd_movie(movie_obj)
-            except Exception as e:
-                logger.error(f"Failed to clean tags for {title}: {e}")
+        # The tags were loaded when the movies to clean were found
+        self._write(movies_with_stale_tags, checkpoint, plan, dry_run)
@@ -0,0 +1,260 @@
+"""
+Resolution of Radarr/Sonarr items to JustWatch titles.
+
+A `Resolver` runs a chain of steps and stops at the first one that finds the
+title. The default chain, cheapest first:
+
+- `stored`: the JustWatch ID an earlier run resolved the item to, which only
+  costs the details request
+- `search`: a title search, matching the TMDB and IMDB IDs of the results
+  against the IDs the Arr object already has
+
+Search results are ranked by title similarity and year distance before they
+are compared, so the likely match is compared first. Results without external
+IDs need a details request to compare.
+
+Searches escalate through `SEARCH_TIERS`: the narrow query first, then a
+wider year window, and only then a large page without provider filters.
+A tier is only queried when the narrower ones found nothing, and every tier
+is queried at most once per item.
+
+More steps can be appended with `add_step`, e.g. Sonarr translates TVDB IDs to
+TMDB IDs. The JustWatch ID and the name of the step that matched are kept in
+the local store, so the next run goes straight to the details.
+"""
+
+import re
+import unicodedata
+
+from difflib import SequenceMatcher
+from loguru import logger
+
+import tagarr.utils.filters as filters
+import tagarr.utils.metrics as metrics
+import tagarr.utils.tracing as tracing
+
+from tagarr.modules.justwatch.exceptions import JustWatchNotFound, JustWatchTooManyRequests
+
+
+# Search tiers, cheapest first. `year_window` widens the release year filter
+# (None drops it) and `filtered` keeps the flatrate and provider filters.
+SEARCH_TIERS = [
+    {"name": "exact", "page_size": 3, "year_window": 0, "filtered": True},
+    {"name": "year", "page_size": 3, "year_window": 1, "filtered": True},
+    {"name": "open", "page_size": 20, "year_window": None, "filtered": False},
+]
+
+
+def normalize_title(title):
+    """Lowercase, strip accents and punctuation: "Amélie!" -> "amelie"."""
+    title = unicodedata.normalize("NFKD", title or "")
+    title = "".join(char for char in title if not unicodedata.combining(char))
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", title.lower()).split())
+
+
+def title_similarity(title, other):
+    return SequenceMatcher(None, normalize_title(title), normalize_title(other)).ratio()
+
+
+def year_distance(year, other):
+    if not year or not other:
+        return None
+
+    return abs(int(year) - int(other))
+
+
+class Candidate:
+    """A search result with its similarity to the item being resolved."""
+
+    def __init__(self, entry, lookup):
+        self.entry = entry
+        self.similarity = title_similarity(lookup.title, entry.get("title", lookup.title))
+        self.year_distance = year_distance(lookup.year, entry.get("original_release_year"))
+
+    @property
+    def sort_key(self):
+        return (
+            -round(self.similarity, 2),
+            self.year_distance if self.year_distance is not None else 1,
+        )
+
+
+def rank_candidates(lookup, entries):
+    """Sort search results best first, keeping the JustWatch order between equals."""
+    return sorted((Candidate(entry, lookup) for entry in entries), key=lambda c: c.sort_key)
+
+
+class Lookup:
+    """An Arr item being resolved: its external IDs and the search results the steps share."""
+
+    def __init__(self, arr_id, title, ids, year=None, providers=None, fast=True):
+        self.arr_id = arr_id
+        self.title = title
+        self.ids = {source: value for source, value in ids.items() if value}
+        self.year = int(year) if year else None
+        self.providers = providers or []
+        self.fast = fast
+        self.search_results = {}
+        self.step = None
+        self.tier = None
+
+        # Set when JustWatch errors, so a miss is not mistaken for "not on JustWatch"
+        self.failed = False
+
+    @property
+    def fingerprint(self):
+        return ";".join(f"{source}={value}" for source, value in sorted(self.ids.items()))
+
+
+class Resolver:
+    def __init__(self, justwatch_client, content_type, store=None, instance=None):
+        self.justwatch_client = justwatch_client
+        self.content_type = content_type
+        self.store = store
+        self.instance = instance or content_type
+
+        self.steps = [("stored", self.from_store), ("search", self.from_search)]
+
+    def add_step(self, name, step):
+        """Append a step: a callable taking a `Lookup` and returning (jw_id, jw_data)."""
+        self.steps.append((name, step))
+
+    def resolve(self, lookup):
+        """Return (jw_id, jw_data) for the item, or (None, None) when no step finds it."""
+        for name, step in self.steps:
+            jw_id, jw_data = step(lookup)
+
+            if jw_data:
+                logger.debug(f"Resolved {lookup.title} to JustWatch ID: {jw_id} using {name}")
+                lookup.step = name
+                metrics.increment(f"resolve.step.{name}")
+                tracing.annotate(step=name, tier=lookup.tier)
+                if self.store is not None and name != "stored":
+                    self.store.set_resolution(
+                        self.instance, lookup.arr_id, lookup.fingerprint, jw_id, name
+                    )
+
+                return jw_id, jw_data
+
+        logger.debug(f"Could not find {lookup.title} using IDs: {lookup.fingerprint}")
+        metrics.increment("resolve.miss")
+        return None, None
+
+    def _get_details(self, jw_id):
+        with tracing.phase("details"):
+            if self.content_type == "movie":
+                return self.justwatch_client.get_movie(jw_id)
+
+            return self.justwatch_client.get_show(jw_id)
+
+    def get_details(self, lookup, jw_id):
+        try:
+            logger.debug(f"Querying JustWatch API with ID: {jw_id} for title: {lookup.title}")
+            return self._get_details(jw_id)
+        except JustWatchNotFound:
+            logger.warning(f"Could not find title: {lookup.title} with JustWatch ID: {jw_id}")
+        except JustWatchTooManyRequests:
+            logger.error(f"JustWatch API returned 'Too Many Requests'")
+            lookup.failed = True
+
+        return {}
+
+    def tiers(self, lookup):
+        """The search tiers for an item: all of them in fast mode, else only the widest."""
+        if not lookup.fast:
+            return SEARCH_TIERS[-1:]
+
+        # Without a release year the year tiers are the same query
+        if lookup.year is None:
+            return [tier for tier in SEARCH_TIERS if tier["name"] != "year"]
+
+        return SEARCH_TIERS
+
+    @staticmethod
+    def _tier_payload(lookup, tier):
+        # One page per tier, ranking needs all the results of the tier
+        payload = {"page_size": tier["page_size"], "max_items": tier["page_size"]}
+
+        if tier["filtered"]:
+            payload["monetization_types"] = ["flatrate"]
+            payload["providers"] = lookup.providers
+
+        if tier["year_window"] is not None and lookup.year:
+            payload["release_year_from"] = lookup.year - tier["year_window"]
+            payload["release_year_until"] = lookup.year + tier["year_window"]
+
+        return payload
+
+    def search(self, lookup, tier):
+        """Search JustWatch by title once per lookup and tier, the steps share the results."""
+        if tier["name"] not in lookup.search_results:
+            logger.debug(f"Query JustWatch API with title: {lookup.title} ({tier['name']} tier)")
+            metrics.increment(f"search.queries.{tier['name']}")
+
+            with tracing.phase("search"):
+                lookup.search_results[tier["name"]] = list(
+                    self.justwatch_client.query_title(
+                        lookup.title,
+                        self.content_type,
+                        **self._tier_payload(lookup, tier),
+                    )
+                )
+
+        return lookup.search_results[tier["name"]]
+
+    def match(self, lookup, ids):
+        """Return the search result with any of the `ids` ({"tmdb": ..., "imdb": ...})."""
+        for tier in self.tiers(lookup):
+            for candidate in rank_candidates(lookup, self.search(lookup, tier)):
+                entry = candidate.entry
+                jw_id = entry["id"]
+
+                # Results without external IDs need the details to compare
+                if "external_ids" not in entry:
+                    entry["details"] = self.get_details(lookup, jw_id)
+                    entry["external_ids"] = entry["details"].get("external_ids", [])
+
+                tmdb_ids = filters.get_tmdb_ids(entry["external_ids"])
+                imdb_ids = filters.get_imdb_ids(entry["external_ids"])
+
+                if ids.get("tmdb") in tmdb_ids or ids.get("imdb") in imdb_ids:
+                    logger.debug(
+                        f"Found JustWatch ID: {jw_id} for {lookup.title} with IDs: {ids} "
+                        f"({tier['name']} tier)"
+                    )
+                    lookup.tier = tier["name"]
+                    metrics.increment(f"search.tier.{tier['name']}")
+
+                    return jw_id, entry.get("details") or self.get_details(lookup, jw_id)
+
+        return None, None
+
+    def from_store(self, lookup):
+        if self.store is None:
+            return None, None
+
+        resolution = self.store.get_resolution(self.instance, lookup.arr_id, lookup.fingerprint)
+        if resolution is None:
+            return None, None
+
+        jw_id, step = resolution
+        try:
+            logger.debug(
+                f"Querying JustWatch API with ID: {jw_id} for {lookup.title}, found by {step}"
+            )
+            return jw_id, self._get_details(jw_id)
+        except JustWatchNotFound:
+            logger.debug(f"Stored JustWatch ID: {jw_id} for {lookup.title} no longer exists")
+            self.store.delete_resolution(self.instance, lookup.arr_id)
+        except JustWatchTooManyRequests:
+            logger.error(f"JustWatch API returned 'Too Many Requests'")
+            lookup.failed = True
+
+        return None, None
+
+    def from_search(self, lookup):
+        ids = {source: lookup.ids[source] for source in ("tmdb", "imdb") if source in lookup.ids}
+        if not ids:
+            return None, None
+
+        return self.match(lookup, ids)
@@ -0,0 +1,117 @@
+"""
+Recheck schedule of the library items, so a run only looks up the ones
+whose availability may have changed.
+
+Items that were not found on JustWatch or that are not on any of the
+configured providers are rechecked with exponential backoff: 1 day, 2 days,
+4 days... capped at 30 days. Items on a provider are rechecked when the
+first of their offers ends, from the end dates JustWatch gives, or after the
+recheck interval when none has one; meanwhile the availability stored at
+their last check is used. Cleaning also rechecks the items on a provider
+last checked longer than a maximum age ago, so a tag whose offer ended
+without an end date is not kept for the whole interval. The schedule starts
+over when the item changes (other external IDs, a new title or another
+provider set); a re-added item gets a new Arr ID and starts without one.
+"""
+
+import hashlib
+import time
+
+from loguru import logger
+
+import tagarr.utils.metrics as metrics
+
+from tagarr.core.resolver import normalize_title
+
+
+AVAILABLE = "available"
+NOT_FOUND = "not_found"
+NO_PROVIDER = "no_provider"
+
+FIRST_RECHECK = 86400
+MAX_RECHECK = 30 * 86400
+
+# Recheck interval of the items on a provider whose offers have no end date
+RECHECK_INTERVAL = 7 * 86400
+
+# Age after which cleaning rechecks the items on a provider anyway
+CLEAN_MAX_AGE = 86400
+
+
+def fingerprint(lookup, provider_ids):
+    """Hash of everything that, when changed, makes an earlier outcome meaningless."""
+    providers = ",".join(sorted(str(provider_id) for provider_id in provider_ids))
+    value = f"{lookup.fingerprint}|{normalize_title(lookup.title)}|{providers}"
+
+    return hashlib.sha1(value.encode("utf-8")).hexdigest()[:16]
+
+
+def earliest(*times):
+    """The earliest of `times` that is not None, or None."""
+    return min((value for value in times if value is not None), default=None)
+
+
+class CheckSchedule:
+    def __init__(self, store, instance, interval=RECHECK_INTERVAL):
+        self.store = store
+        self.instance = instance
+
+        # 0 rechecks the items on a provider on every run
+        self.interval = interval
+
+    def pending(self, arr_id, fingerprint, max_age=None):
+        """
+        Return (outcome, jw_id, mask) while the item is not due for a recheck,
+        else None. `mask` is the availability stored at its last check. With a
+        `max_age` (seconds) the items on a provider checked longer ago are due.
+        """
+        check = self.store.get_check(self.instance, arr_id)
+        if check is None:
+            return None
+
+        check_fingerprint, outcome, jw_id, _, next_check = check
+        if check_fingerprint != fingerprint or next_check <= time.time():
+            return None
+
+        mask = 0
+        if outcome == AVAILABLE:
+            availability = self.store.get_availability(self.instance, arr_id)
+            if availability is None:
+                return None
+
+            mask, _, checked = availability
+            if max_age is not None and checked <= time.time() - max_age:
+                return None
+
+        metrics.increment(f"schedule.skipped.{outcome}")
+        return outcome, jw_id, mask
+
+    def record(self, arr_id, fingerprint, outcome, jw_id=None, expires=None):
+        """
+        Schedule the next check of an item after its `outcome`: at `expires`,
+        the end of its first offer, or after the interval if it is available,
+        with backoff otherwise.
+        """
+        if outcome == AVAILABLE:
+            if not self.interval:
+                self.store.delete_check(self.instance, arr_id)
+                return
+
+            next_check = earliest(expires, time.time() + self.interval)
+            logger.debug(
+                f"Rechecking {self.instance} ID {arr_id} ({outcome}) in "
+                f"{max(next_check - time.time(), 0) / 86400:.1f} days"
+            )
+            self.store.set_check(self.instance, arr_id, fingerprint, outcome, jw_id, 0, next_check)
+            return
+
+        check = self.store.get_check(self.instance, arr_id)
+        failures = 1
+        if check is not None and check[0] == fingerprint:
+            failures = check[3] + 1
+
+        delay = min(FIRST_RECHECK * 2 ** (failures - 1), MAX_RECHECK)
+        logger.debug(f"Rechecking {self.instance} ID {arr_id} ({outcome}) in {delay // 86400} days")
+        self.store.set_check(
+            self.instance, arr_id, fingerprint, outcome, jw_id, failures, time.time() + delay
+        )
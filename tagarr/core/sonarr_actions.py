@@ -1,27 +1,112 @@
 import re
+import threading
+
 
 from loguru import logger
 from rich.progress import Progress
 from pyarr import SonarrAPI
 
+import tagarr.core.planner as planner
+import tagarr.core.priority as priority
+import tagarr.core.schedule as schedule
 import tagarr.modules.pytmdb as pytmdb
+import tagarr.utils.budget as budget
 import tagarr.utils.filters as filters
+import tagarr.utils.metrics as metrics
+import tagarr.utils.pipeline as pipeline
+import tagarr.utils.tracing as tracing
 
+from tagarr.core.availability import AvailabilityLog, provider_index
+from tagarr.core.resolver import Lookup, Resolver
 from tagarr.modules.justwatch import JustWatch
-from tagarr.modules.justwatch.exceptions import JustWatchNotFound, JustWatchTooManyRequests
+from tagarr.utils.checkpoint import library_snapshot
+from tagarr.utils.sessions import configure_arr_session
 
 
 class SonarrActions:
-    def __init__(self, url, api_key, locale):
+    def __init__(
+        self,
+        url,
+        api_key,
+        locale,
+        justwatch_url=None,
+        justwatch_pool_size=10,
+        verify_ssl=True,
+        timeout=30,
+        retries=3,
+        pool_size=10,
+        store=None,
+        tag_lock=None,
+        tmdb_cache_ttl=2592000,
+        instance="sonarr",
+        resolved=None,
+        catalogue=None,
+        recheck_interval=schedule.RECHECK_INTERVAL,
+        clean_max_age=schedule.CLEAN_MAX_AGE,
+        record_checks=True,
+    ):
         logger.debug(f"Initializing PySonarr")
         self.sonarr_client = SonarrAPI(url, api_key, ver_uri="/v3")
+        configure_arr_session(self.sonarr_client.session, verify_ssl, timeout, retries, pool_size)
+
+        # The JustWatch client and the resolver are made on first use, applying a plan needs neither
+        self.locale = locale
+        self.justwatch_url = justwatch_url
+        self.justwatch_pool_size = justwatch_pool_size
+        self.instance = instance
+        self._justwatch_client = None
+        self._resolver = None
+
+        self.schedule = None
+        if store is not None:
+            self.schedule = schedule.CheckSchedule(store, instance, recheck_interval)
+        self.clean_max_age = clean_max_age
+        self.availability = AvailabilityLog(store, instance) if store is not None else None
 
-        logger.debug(f"Initializing JustWatch API with locale: {locale}")
-        self.justwatch_client = JustWatch(locale)
+        # Runs that write nothing read the schedule and the availability but leave them as they are
+        self.record_checks = record_checks
 
-        # Cache for tags: label -> tag_id
+        # Providers of the titles resolved in this run, shared with the other instances
+        self.resolved = resolved
+
+        # Provider catalogues to join the library against instead of looking every title up
+        self.catalogue = catalogue
+
+        # Cache for tags: label -> tag_id. The writer thread replaces it instead of
+        # changing it, so other threads can iterate over the one they hold
         self._tag_cache = {}
 
+        # Held while creating a tag, shared with other shards
+        self.tag_lock = tag_lock or threading.Lock()
+
+        # The TMDB client is created once per run, on first use
+        self.store = store
+        self.tmdb_cache_ttl = tmdb_cache_ttl
+        self.tmdb = None
+
+    def _init_justwatch(self):
+        if self._justwatch_client is None:
+            logger.debug(f"Initializing JustWatch API with locale: {self.locale}")
+            self._justwatch_client = JustWatch(
+                self.locale, api_url=self.justwatch_url, pool_size=self.justwatch_pool_size
+            )
+
+            # Series without a direct match fall back to translating the TVDB ID
+            self._resolver = Resolver(
+                self._justwatch_client, "show", self.store, instance=self.instance
+            )
+            self._resolver.add_step("tmdb", self._find_using_tvdb_id)
+
+    @property
+    def justwatch_client(self):
+        self._init_justwatch()
+        return self._justwatch_client
+
+    @property
+    def resolver(self):
+        self._init_justwatch()
+        return self._resolver
+
     def _load_tags(self):
         """Load all existing tags from Sonarr into the cache."""
         logger.debug("Loading existing tags from Sonarr")
@@ -42,132 +127,221 @@ class SonarrActions:
         if label in self._tag_cache:
             return self._tag_cache[label]
 
-        logger.debug(f"Creating new tag: {label}")
-        result = self.sonarr_client.create_tag(label)
-        self._tag_cache[label] = result["id"]
-        return result["id"]
+        with self.tag_lock:
+            # Another shard may have created it in the meantime
+            self._load_tags()
+            if label in self._tag_cache:
+                return self._tag_cache[label]
+
+            logger.debug(f"Creating new tag: {label}")
+            result = self.sonarr_client.create_tag(label)
+            self._tag_cache = {**self._tag_cache, label: result["id"]}
+            return result["id"]
+
+    def _get_tag_labels(self, tag_ids):
+        """The labels of the loaded tags among `tag_ids`."""
+        return [label for label, tag_id in self._tag_cache.items() if tag_id in tag_ids]
+
+    def _record(self, item, jw_id, mask, index):
+        """Keep the availability of a checked item for `tagarr report`."""
+        if self.availability is not None and self.record_checks:
+            self.availability.record(
+                item["id"],
+                item["title"],
+                jw_id,
+                mask,
+                index,
+                self._get_tag_labels(item.get("tags", [])),
+            )
+
+    def _record_tags(self, tags):
+        """Keep the tags of written items, Arr ID -> tag IDs, for `tagarr report`."""
+        if self.availability is not None:
+            self.availability.record_tags(
+                {arr_id: self._get_tag_labels(tag_ids) for arr_id, tag_ids in tags.items()}
+            )
 
-    def _get_jw_serie_data(self, title, jw_entry):
-        jw_id = jw_entry["id"]
-        jw_serie_data = {}
-        jw_imdb_ids = []
-        jw_tmdb_ids = []
+    def _prioritize(self, sonarr_series, index, not_available_tag):
+        """Order the series of a budgeted run by priority, see `tagarr.core.priority`."""
+        if not budget.limited():
+            return sonarr_series
 
-        try:
-            logger.debug(f"Querying JustWatch API with ID: {jw_id} for title: {title}")
-            jw_serie_data = self.justwatch_client.get_show(jw_id)
+        if not self._tag_cache:
+            self._load_tags()
 
-            jw_imdb_ids = filters.get_imdb_ids(jw_serie_data.get("external_ids", []))
-            logger.debug(f"Got IMDB ID's: {jw_imdb_ids} from JustWatch API")
+        label_bits = index.label_bits(self._sanitize_tag)
+        provider_tag_ids = {
+            tag_id for label, tag_id in self._tag_cache.items() if label in label_bits
+        }
+        not_available_tag_id = None
+        if not_available_tag:
+            not_available_tag_id = self._tag_cache.get(self._sanitize_tag(not_available_tag))
+        checked = self.availability.checked() if self.availability is not None else {}
 
-            jw_tmdb_ids = filters.get_tmdb_ids(jw_serie_data.get("external_ids", []))
-            logger.debug(f"Got TMDB ID's: {jw_tmdb_ids} from JustWatch API")
-        except JustWatchNotFound:
-            logger.warning(f"Could not find title: {title} with JustWatch ID: {jw_id}")
-        except JustWatchTooManyRequests:
-            logger.error(f"JustWatch API returned 'Too Many Requests'")
+        return priority.prioritize(sonarr_series, checked, provider_tag_ids, not_available_tag_id)
 
-        return jw_serie_data, jw_imdb_ids, jw_tmdb_ids
+    def _get_tmdb_id(self, tvdb_id):
+        """Translate a TVDB ID to a TMDB ID, trying the imported id mapping before TMDB."""
+        if self.store is not None:
+            tmdb_id = self.store.get_tmdb_id("tv", "tvdb", tvdb_id)
+            if tmdb_id:
+                logger.debug(f"Got TMDB ID: {tmdb_id} for TVDB ID: {tvdb_id} from the id mapping")
+                return tmdb_id
 
-    def _find_using_imdb_id(self, title, sonarr_id, imdb_id, fast, jw_query_payload={}):
-        logger.debug(
-            f"Processing title: {title} with Sonarr ID: {sonarr_id} and IMDB ID: {imdb_id}"
-        )
+        if self.tmdb is None:
+            return 0
+
+        logger.debug(f"Trying to obtain the TMDB ID using TVDB ID: {tvdb_id} from TMDB API")
+        with tracing.phase("tmdb"):
+            tmdb_find_result = self.tmdb.find.find_by_id(tvdb_id, "tvdb_id").get("tv_results", [])
+        if tmdb_find_result:
+            return int(tmdb_find_result[0].get("id", 0))
+
+        return 0
+
+    def _find_using_tvdb_id(self, lookup):
+        """Resolver step: match the search results by the TMDB ID of the TVDB ID."""
+        tvdb_id = lookup.ids.get("tvdb")
+        if not tvdb_id or (self.tmdb is None and self.store is None):
+            return None, None
 
-        logger.debug(f"Query JustWatch API with title: {title}")
-        jw_query_data = self.justwatch_client.query_title(title, "show", fast, **jw_query_payload)
+        tmdb_id = self._get_tmdb_id(tvdb_id)
+        if tmdb_id == 0 or tmdb_id == lookup.ids.get("tmdb"):
+            logger.debug(
+                f"Could not find a new TMDB ID for {lookup.title} using TVDB ID: {tvdb_id}"
+            )
+            return None, None
 
-        for entry in jw_query_data["items"]:
-            jw_id = entry["id"]
-            jw_serie_data, jw_imdb_ids, _ = self._get_jw_serie_data(title, entry)
+        return self.resolver.match(lookup, {"tmdb": tmdb_id})
 
-            if imdb_id in jw_imdb_ids:
-                logger.debug(f"Found JustWatch ID: {jw_id} for {title} with IMDB ID: {imdb_id}")
-                return jw_id, jw_serie_data
+    def _get_tmdb_client(self, tmdb_api_key):
+        if self.tmdb is None:
+            logger.debug("Initializing TMDB API")
+            self.tmdb = pytmdb.TMDB(tmdb_api_key, cache=self.store, cache_ttl=self.tmdb_cache_ttl)
 
-        logger.debug(f"Could not find {title} using IMDB ID: {imdb_id}")
-        return None, None
+        return self.tmdb
+
+    def _get_lookup(self, serie, index, fast):
+        title = serie["title"]
+        providers = [values["short_name"] for _, values in index.providers.items()]
 
-    def _find_using_tvdb_id(self, title, sonarr_id, tvdb_id, fast, jw_query_payload={}):
+        ids = {
+            "tmdb": serie.get("tmdbId"),
+            "imdb": serie.get("imdbId"),
+            "tvdb": serie.get("tvdbId"),
+        }
         logger.debug(
-            f"Processing title: {title} with Sonarr ID: {sonarr_id} and TVDB ID: {tvdb_id}"
+            f"{title} has IMDB ID: {ids['imdb']}, TMDB ID: {ids['tmdb']} and TVDB ID: {ids['tvdb']}"
         )
 
-        logger.debug(f"Query JustWatch API with title: {title}")
-        jw_query_data = self.justwatch_client.query_title(title, "show", fast, jw_query_payload)
+        return Lookup(serie["id"], title, ids, year=serie["year"], providers=providers, fast=fast)
+
+    def _get_serie_providers(self, sonarr_id, title, jw_serie_data, index):
+        """
+        Aggregate the availability masks of every episode of every season,
+        return it with the earliest end of their offers.
+        """
+        mask = 0
+        expires = None
+
+        logger.debug(f"Look up season data for {title}")
+        with tracing.item("sonarr", sonarr_id, title), tracing.phase("seasons"):
+            for jw_season in jw_serie_data.get("seasons", []):
+                # Once on every provider, the remaining seasons cannot add any
+                if mask == index.all:
+                    metrics.increment("seasons.skipped")
+                    continue
 
-        logger.debug(f"Trying to obtain the TMDB ID using TVDB ID: {tvdb_id} from TMDB API")
-        tmdb_id = 0
-        tmdb_find_result = self.tmdb.find.find_by_id(tvdb_id, "tvdb_id").get("tv_results", [])
-        if tmdb_find_result:
-            tmdb_id = int(tmdb_find_result[0].get("id", 0))
+                jw_season_data = self.justwatch_client.get_season(jw_season["id"])
 
-        if tmdb_id != 0:
-            for entry in jw_query_data["items"]:
-                jw_id = entry["id"]
-                jw_serie_data, _, jw_tmdb_ids = self._get_jw_serie_data(title, entry)
+                for episode in jw_season_data.get("episodes", []):
+                    mask |= index.offers_mask(episode)
+                    expires = schedule.earliest(expires, index.offers_expiry(episode))
 
-                if tmdb_id in jw_tmdb_ids:
-                    logger.debug(f"Found JustWatch ID: {jw_id} for {title} with TMDB ID: {tmdb_id}")
-                    return jw_id, jw_serie_data
+        return mask, expires
 
-        else:
-            logger.debug("Could not find a TMDB ID")
+    def _find_in_catalogue(self, lookup, index, tmdb_api_key):
+        """Join a serie against the crawled catalogues, translating a lone TVDB ID."""
+        ids = dict(lookup.ids)
+        if not ids.get("tmdb") and not ids.get("imdb") and ids.get("tvdb"):
+            if tmdb_api_key:
+                self._get_tmdb_client(tmdb_api_key)
+            ids["tmdb"] = self._get_tmdb_id(ids["tvdb"])
 
-        logger.debug(f"Could not find {title} using TVDB ID: {tvdb_id}")
-        return None, None
+        jw_id, provider_ids = self.catalogue.find(ids)
 
-    def _find_serie(self, serie, jw_providers, tmdb_api_key, fast):
+        return jw_id, index.mask(provider_ids)
+
+    def _find_serie_providers(self, serie, index, tmdb_api_key, fast, recheck=False, max_age=None):
+        """
+        Return the JustWatch ID of a serie and the availability mask of the
+        configured providers it streams on. Series are skipped until their
+        recheck is due (see `tagarr.core.schedule`), unless `recheck` is set;
+        With a `max_age` the ones on a provider checked longer ago are due too.
+        """
         sonarr_id = serie["id"]
         title = serie["title"]
-        release_year = serie["year"]
-        providers = [values["short_name"] for _, values in jw_providers.items()]
-
-        jw_query_payload = {}
-        if fast:
-            jw_query_payload = {
-                "page_size": 3,
-                "release_year_from": release_year,
-                "release_year_until": release_year,
-                "monetization_types": ["flatrate"],
-                "providers": providers,
-            }
-
-        imdb_id = serie.get("imdbId", None)
-        tvdb_id = serie.get("tvdbId", None)
-        logger.debug(f"{title} has IMDB ID: {imdb_id} and TVDB_ID: {tvdb_id}")
-
-        jw_id = None
-        jw_serie_data = None
-
-        if tmdb_api_key:
-            self.tmdb = pytmdb.TMDB(tmdb_api_key)
-
-        if imdb_id:
-            jw_id, jw_serie_data = self._find_using_imdb_id(
-                title, sonarr_id, imdb_id, fast, jw_query_payload
-            )
-            if not jw_serie_data and tvdb_id and tmdb_api_key:
-                logger.debug(f"Could not find {title} using IMDB, falling back to TMDB")
-                jw_id, jw_serie_data = self._find_using_tvdb_id(title, sonarr_id, tvdb_id, fast)
-        elif tvdb_id and tmdb_api_key:
-            jw_id, jw_serie_data = self._find_using_tvdb_id(
-                title, sonarr_id, tvdb_id, fast, jw_query_payload
-            )
+        lookup = self._get_lookup(serie, index, fast)
+
+        # Joining is free, so the recheck schedule does not apply
+        if self.catalogue is not None:
+            jw_id, mask = self._find_in_catalogue(lookup, index, tmdb_api_key)
+            self._record(serie, jw_id, mask, index)
+            return jw_id, mask
+
+        fingerprint = schedule.fingerprint(lookup, index.providers.keys())
+
+        if self.schedule and not recheck:
+            pending = self.schedule.pending(sonarr_id, fingerprint, max_age)
+            if pending:
+                outcome, jw_id, mask = pending
+                logger.debug(f"Skipping {title} ({outcome}) until its next recheck")
+                return jw_id, mask
+
+        shared = self.resolved.get(fingerprint) if self.resolved is not None else None
+        if shared:
+            logger.debug(f"Reusing the providers of {title} resolved for another instance")
+            metrics.increment("resolve.shared")
+            jw_id, mask, outcome, expires = shared
         else:
-            logger.debug(
-                f"No IMDB ID provided by Sonarr and no TMDB configuration set. Skipping serie: {title}"
-            )
-
-        return jw_id, jw_serie_data
-
-    def get_series_to_tag(
-        self, providers, fast=True, disable_progress=False, tmdb_api_key=None, not_available_tag=None, series_id=None
+            if tmdb_api_key:
+                self._get_tmdb_client(tmdb_api_key)
+
+            with tracing.item("sonarr", sonarr_id, title):
+                jw_id, jw_serie_data = self.resolver.resolve(lookup)
+
+            mask, expires = 0, None
+            if jw_serie_data:
+                mask, expires = self._get_serie_providers(sonarr_id, title, jw_serie_data, index)
+
+            outcome = schedule.AVAILABLE
+            if not mask:
+                outcome = schedule.NO_PROVIDER if jw_serie_data else schedule.NOT_FOUND
+
+            if self.resolved is not None and not lookup.failed:
+                self.resolved[fingerprint] = (jw_id, mask, outcome, expires)
+
+        if not lookup.failed:
+            if self.schedule and self.record_checks:
+                self.schedule.record(sonarr_id, fingerprint, outcome, jw_id, expires)
+            self._record(serie, jw_id, mask, index)
+
+        return jw_id, mask
+
+    def iter_series_to_tag(
+        self,
+        providers,
+        fast=True,
+        disable_progress=False,
+        tmdb_api_key=None,
+        not_available_tag=None,
+        series_id=None,
+        checkpoint=None,
+        shard=None,
     ):
-        """Find series available on streaming providers and return them with provider names.
+        """Find series available on streaming providers and yield them with provider names
+        as (sonarr_id, serie_data) pairs, each one as soon as it is resolved.
         Tags are applied at the series level, so all providers from all episodes are aggregated."""
-        tag_series = {}
-
         if series_id:
             logger.debug(f"Getting series with ID {series_id} from Sonarr")
             sonarr_series = [self.sonarr_client.get_series(id_=series_id)]
@@ -175,104 +349,264 @@ class SonarrActions:
             logger.debug("Getting all the series from Sonarr")
             sonarr_series = self.sonarr_client.get_series()
 
+        if shard:
+            sonarr_series = shard.filter(sonarr_series)
+            logger.debug(f"Processing shard {shard}: {len(sonarr_series)} series")
+
         raw_jw_providers = self.justwatch_client.get_providers()
         jw_providers = filters.get_providers(raw_jw_providers, providers)
+        index = provider_index(jw_providers, self.store)
+        if self.catalogue is not None:
+            self.catalogue.crawl(self.justwatch_client, jw_providers)
+        sonarr_series = self._prioritize(sonarr_series, index, not_available_tag)
         logger.debug(
             f"Got the following providers: {', '.join([v['clear_name'] for _, v in jw_providers.items()])}"
         )
 
+        if checkpoint:
+            snapshot = library_snapshot(sonarr_series, ["tmdbId", "imdbId", "tvdbId"])
+            checkpoint.begin("sonarr tag", snapshot, jw_providers.keys())
+
         progress = Progress(disable=disable_progress)
         with progress:
             for serie in progress.track(sonarr_series):
                 sonarr_id = serie["id"]
                 title = serie["title"]
 
-                jw_id, jw_serie_data = self._find_serie(
-                    serie, jw_providers, tmdb_api_key, fast
-                )
-
-                all_providers = set()
-                if jw_serie_data:
-                    logger.debug(f"Look up season data for {title}")
-                    jw_seasons = jw_serie_data.get("seasons", [])
-
-                    for jw_season in jw_seasons:
-                        jw_season_id = jw_season["id"]
-                        jw_season_data = self.justwatch_client.get_season(jw_season_id)
-                        jw_episodes = jw_season_data.get("episodes", [])
-
-                        for episode in jw_episodes:
-                            episode_providers = filters.get_jw_providers(episode)
+                if checkpoint and checkpoint.has_result(sonarr_id):
+                    result = checkpoint.get_result(sonarr_id)
+                    if result:
+                        yield sonarr_id, dict(result, sonarr_object=serie)
+                    continue
 
-                            providers_match = [
-                                provider_details["clear_name"].lower()
-                                for provider_id, provider_details in jw_providers.items()
-                                if provider_id in episode_providers.keys()
-                            ]
+                # Out of budget, the item is left for the next run
+                if budget.exhausted():
+                    continue
 
-                            all_providers.update(providers_match)
+                jw_id, mask = self._find_serie_providers(
+                    serie, index, tmdb_api_key, fast, recheck=bool(series_id)
+                )
+                all_providers = index.names(mask)
 
+                result = None
                 if all_providers:
-                    tag_series.update(
-                        {
-                            sonarr_id: {
-                                "title": title,
-                                "sonarr_object": serie,
-                                "jw_id": jw_id,
-                                "providers": sorted(all_providers),
-                            }
-                        }
-                    )
+                    result = {
+                        "title": title,
+                        "sonarr_object": serie,
+                        "jw_id": jw_id,
+                        "providers": sorted(all_providers),
+                    }
+
+                    logger.debug(f"{title} is streaming on {', '.join(sorted(all_providers))}")
+                elif not_available_tag:
+                    result = {
+                        "title": title,
+                        "sonarr_object": serie,
+                        "jw_id": jw_id,
+                        "providers": [not_available_tag],
+                    }
 
                     logger.debug(
-                        f"{title} is streaming on {', '.join(sorted(all_providers))}"
-                    )
-                elif not_available_tag:
-                    tag_series.update(
-                        {
-                            sonarr_id: {
-                                "title": title,
-                                "sonarr_object": serie,
-                                "jw_id": jw_id,
-                                "providers": [not_available_tag],
-                            }
-                        }
+                        f"{title} is not available on any provider, tagging with '{not_available_tag}'"
                     )
 
-                    logger.debug(f"{title} is not available on any provider, tagging with '{not_available_tag}'")
+                if checkpoint:
+                    checkpoint.add_result(sonarr_id, result)
 
-        return tag_series
+                if result:
+                    yield sonarr_id, result
 
-    def tag_series(self, series_with_providers):
-        """Add streaming provider tags to series in Sonarr."""
-        logger.debug("Starting the tagging process for series")
-        self._load_tags()
+    def get_series_to_tag(self, *args, **kwargs):
+        """Find series available on streaming providers and return them with provider names."""
+        return dict(self.iter_series_to_tag(*args, **kwargs))
+
+    def _plan(self, series, plan, checkpoint=None):
+        """Plan the tag change of each (sonarr_id, serie_data) pair, yield the ones to write."""
+        for sonarr_id, serie_data in series:
+            if checkpoint and checkpoint.is_written(sonarr_id):
+                continue
 
-        for sonarr_id, serie_data in series_with_providers.items():
             serie_obj = serie_data["sonarr_object"]
-            title = serie_data["title"]
-            provider_names = serie_data["providers"]
+            change = planner.plan_change(
+                sonarr_id,
+                serie_data["title"],
+                serie_obj.get("tags", []),
+                self._tag_cache,
+                add=[self._sanitize_tag(name) for name in serie_data.get("providers", [])],
+                remove=serie_data.get("tags_removed", []),
+            )
+            plan.add(change)
+
+            if change.action == planner.NOOP:
+                logger.debug(f"Tags of serie {change.title} (ID: {sonarr_id}) are up to date")
+                continue
 
-            current_tags = set(serie_obj.get("tags", []))
+            yield change, serie_obj
 
-            for provider_name in provider_names:
-                tag_id = self._get_or_create_tag(provider_name)
-                current_tags.add(tag_id)
+    def apply_change(self, change, serie_obj, checkpoint=None):
+        """Write a planned tag change of one serie to Sonarr, return whether it was written."""
+        current_tags = set(serie_obj.get("tags", []))
 
+        with tracing.item("sonarr", change.arr_id, change.title), tracing.phase("write"):
+            current_tags.update(self._get_or_create_tag(label) for label in change.add)
+            current_tags.difference_update(self._tag_cache[label] for label in change.remove)
             serie_obj["tags"] = list(current_tags)
 
             try:
-                logger.debug(f"Updating tags for serie: {title} (ID: {sonarr_id})")
+                logger.debug(
+                    f"Updating tags for serie: {change.title} (ID: {change.arr_id}), "
+                    f"adding {change.add}, removing {change.remove}"
+                )
                 self.sonarr_client.upd_series(serie_obj)
             except Exception as e:
-                logger.error(f"Failed to update tags for {title}: {e}")
+                logger.error(f"Failed to update tags for {change.title}: {e}")
+                return False
 
-    def get_series_to_clean(
-        self, providers, fast=True, disable_progress=False, tmdb_api_key=None, not_available_tag=None, series_id=None
-    ):
-        """Find series with stale streaming provider tags."""
-        clean_series = {}
+        self._record_tags({change.arr_id: current_tags})
 
+        if checkpoint:
+            checkpoint.mark_written(change.arr_id)
+
+        return True
+
+    def _write(self, series, checkpoint=None, plan=None, dry_run=False):
+        if isinstance(series, dict):
+            series = series.items()
+
+        plan = plan if plan is not None else planner.Plan()
+        changes = self._plan(series, plan, checkpoint)
+
+        if dry_run:
+            for change, _ in changes:
+                plan.done(change)
+            return
+
+        def write(entry):
+            if self.apply_change(*entry, checkpoint):
+                plan.done(entry[0])
+
+        pipeline.run(changes, write)
+
+    def plan_series(self, series, plan):
+        """Plan the tag changes of (sonarr_id, serie_data) pairs, yield the ones with a delta."""
+        self._load_tags()
+
+        if isinstance(series, dict):
+            series = series.items()
+
+        for change, _ in self._plan(series, plan):
+            plan.done(change)
+            yield change
+
+    def _put_series_editor(self, data):
+        # pyarr has no wrapper for the series editor endpoint. `_put` is private,
+        # setup.py pins the pyarr versions it was tested with
+        return self.sonarr_client._put("series/editor", self.sonarr_client.ver_uri, data=data)
+
+    def _edit_tags(self, sonarr_ids, labels, apply_tags):
+        """Add (`apply_tags` "add") or remove tags of many series with the Sonarr series editor."""
+        if apply_tags == "add":
+            tag_ids = [self._get_or_create_tag(label) for label in labels]
+        else:
+            tag_ids = [self._tag_cache[label] for label in labels if label in self._tag_cache]
+
+        if tag_ids:
+            self._put_series_editor(
+                {"seriesIds": sonarr_ids, "tags": tag_ids, "applyTags": apply_tags}
+            )
+
+    def apply_plan(self, changes, dry_run=False):
+        """
+        Apply planned changes in bulk, one editor request per batch of series
+        with the same delta. Returns the changes that are applied; the ones
+        partly applied, whose tags were added but not removed; the ones that
+        already were; and the conflicts, whose serie was deleted or had its
+        tags changed since the plan was made. Applying the plan again
+        finishes the partly applied changes.
+        """
+        self._load_tags()
+
+        logger.debug("Getting all the series from Sonarr")
+        current_tags = {
+            serie["id"]: set(serie.get("tags", [])) for serie in self.sonarr_client.get_series()
+        }
+
+        batches, up_to_date, conflicts = planner.group_changes(
+            changes, current_tags, self._tag_cache
+        )
+        applied = []
+        partial = []
+
+        for change in conflicts:
+            logger.warning(
+                f"{change.title} (ID: {change.arr_id}) was deleted or its tags changed since "
+                f"the plan was made, skipping it"
+            )
+
+        for (add, remove), batch in batches.items():
+            for chunk in planner.batched(batch):
+                sonarr_ids = [change.arr_id for change in chunk]
+
+                if dry_run:
+                    applied.extend(chunk)
+                    continue
+
+                logger.debug(
+                    f"Updating tags of {len(sonarr_ids)} series, "
+                    f"adding {list(add)}, removing {list(remove)}"
+                )
+                added = False
+                try:
+                    if add:
+                        self._edit_tags(sonarr_ids, add, "add")
+                        added = True
+                    if remove:
+                        self._edit_tags(sonarr_ids, remove, "remove")
+                except Exception as e:
+                    logger.error(f"Failed to update tags of {len(sonarr_ids)} series: {e}")
+
+                    # The tags were added but not removed, applying the plan again removes them
+                    if added:
+                        self._record_tags(
+                            {
+                                change.arr_id: set(change.current)
+                                | {self._tag_cache[label] for label in add}
+                                for change in chunk
+                            }
+                        )
+                        partial.extend(chunk)
+                    continue
+
+                self._record_tags(
+                    {change.arr_id: change.target(self._tag_cache) for change in chunk}
+                )
+                applied.extend(chunk)
+
+        return applied, partial, up_to_date, conflicts
+
+    def tag_series(self, series_with_providers, checkpoint=None, plan=None, dry_run=False):
+        """
+        Add streaming provider tags to series in Sonarr. Takes a dict or an
+        iterable of (sonarr_id, serie_data) pairs, which is written while it
+        is still being produced. Only the series missing a tag are written;
+        with `dry_run` nothing is, the `plan` just counts the changes.
+        """
+        logger.debug("Starting the tagging process for series")
+        self._load_tags()
+        self._write(series_with_providers, checkpoint, plan, dry_run)
+
+    def iter_series_to_clean(
+        self,
+        providers,
+        fast=True,
+        disable_progress=False,
+        tmdb_api_key=None,
+        not_available_tag=None,
+        series_id=None,
+        checkpoint=None,
+        shard=None,
+    ):
+        """Find series with stale provider tags, yielding (sonarr_id, serie_data) pairs."""
         if series_id:
             logger.debug(f"Getting series with ID {series_id} from Sonarr")
             sonarr_series = [self.sonarr_client.get_series(id_=series_id)]
@@ -280,6 +614,10 @@ class SonarrActions:
             logger.debug("Getting all the series from Sonarr")
             sonarr_series = self.sonarr_client.get_series()
 
+        if shard:
+            sonarr_series = shard.filter(sonarr_series)
+            logger.debug(f"Processing shard {shard}: {len(sonarr_series)} series")
+
         # Load tags and build reverse lookup (tag_id -> label)
         self._load_tags()
         tag_id_to_label = {v: k for k, v in self._tag_cache.items()}
@@ -287,17 +625,23 @@ class SonarrActions:
         # Build the set of provider tag labels we manage
         raw_jw_providers = self.justwatch_client.get_providers()
         jw_providers = filters.get_providers(raw_jw_providers, providers)
-        provider_labels = {v["clear_name"].lower() for _, v in jw_providers.items()}
+        index = provider_index(jw_providers, self.store)
+        if self.catalogue is not None:
+            self.catalogue.crawl(self.justwatch_client, jw_providers)
+        sonarr_series = self._prioritize(sonarr_series, index, not_available_tag)
+        label_bits = index.label_bits(self._sanitize_tag)
 
         # Include not_available_tag as a managed label
         not_available_label = self._sanitize_tag(not_available_tag) if not_available_tag else None
-        managed_labels = set(provider_labels)
+        managed_labels = set(label_bits)
         if not_available_label:
             managed_labels.add(not_available_label)
 
-        logger.debug(
-            f"Got the following providers: {', '.join(provider_labels)}"
-        )
+        logger.debug(f"Got the following providers: {', '.join(label_bits)}")
+
+        if checkpoint:
+            snapshot = library_snapshot(sonarr_series, ["tmdbId", "imdbId", "tvdbId"])
+            checkpoint.begin("sonarr clean", snapshot, jw_providers.keys())
 
         progress = Progress(disable=disable_progress)
         with progress:
@@ -306,6 +650,12 @@ class SonarrActions:
                 title = serie["title"]
                 current_tags = serie.get("tags", [])
 
+                if checkpoint and checkpoint.has_result(sonarr_id):
+                    result = checkpoint.get_result(sonarr_id)
+                    if result:
+                        yield sonarr_id, dict(result, sonarr_object=serie)
+                    continue
+
                 # Find which current tags are managed tags (providers + not_available_tag)
                 current_provider_tags = {}
                 for tag_id in current_tags:
@@ -317,63 +667,54 @@ class SonarrActions:
                 if not current_provider_tags:
                     continue
 
-                logger.debug(
-                    f"Processing title: {title} with Sonarr ID: {sonarr_id}"
-                )
+                # Out of budget, the item is left for the next run
+                if budget.exhausted():
+                    continue
 
-                # Find which providers the serie is currently on
-                jw_id, jw_serie_data = self._find_serie(
-                    serie, jw_providers, tmdb_api_key, fast
+                logger.debug(f"Processing title: {title} with Sonarr ID: {sonarr_id}")
+
+                # Find which providers the serie is currently on, rechecking the
+                # ones on a provider checked too long ago so that ended offers are noticed
+                jw_id, mask = self._find_serie_providers(
+                    serie,
+                    index,
+                    tmdb_api_key,
+                    fast,
+                    recheck=bool(series_id),
+                    max_age=self.clean_max_age,
                 )
 
-                current_jw_providers = set()
-                if jw_serie_data:
-                    jw_seasons = jw_serie_data.get("seasons", [])
-
-                    for jw_season in jw_seasons:
-                        jw_season_id = jw_season["id"]
-                        jw_season_data = self.justwatch_client.get_season(jw_season_id)
-                        jw_episodes = jw_season_data.get("episodes", [])
-
-                        for episode in jw_episodes:
-                            episode_providers = filters.get_jw_providers(episode)
-
-                            providers_match = [
-                                provider_details["clear_name"].lower()
-                                for provider_id, provider_details in jw_providers.items()
-                                if provider_id in episode_providers.keys()
-                            ]
-
-                            current_jw_providers.update(providers_match)
-
                 # Find stale tags
                 stale_tags = {}
                 for tag_id, label in current_provider_tags.items():
                     if label == not_available_label:
                         # not_available_tag is stale if the serie now has providers
-                        if current_jw_providers:
+                        if mask:
                             stale_tags[tag_id] = label
                     else:
                         # Provider tags are stale if no longer on that provider
-                        if label not in current_jw_providers:
+                        if not mask & label_bits[label]:
                             stale_tags[tag_id] = label
 
+                result = None
                 if stale_tags:
-                    clean_series.update(
-                        {
-                            sonarr_id: {
-                                "title": title,
-                                "sonarr_object": serie,
-                                "tags_removed": list(stale_tags.values()),
-                                "stale_tag_ids": list(stale_tags.keys()),
-                            }
-                        }
-                    )
-                    logger.debug(
-                        f"{title} has stale tags: {', '.join(stale_tags.values())}"
-                    )
+                    result = {
+                        "title": title,
+                        "sonarr_object": serie,
+                        "tags_removed": list(stale_tags.values()),
+                        "stale_tag_ids": list(stale_tags.keys()),
+                    }
+                    logger.debug(f"{title} has stale tags: {', '.join(stale_tags.values())}")
+
+                if checkpoint:
+                    checkpoint.add_result(sonarr_id, result)
 
-        return clean_series
+                if result:
+                    yield sonarr_id, result
+
+    def get_series_to_clean(self, *args, **kwargs):
+        """Find series with stale streaming provider tags."""
+        return dict(self.iter_series_to_clean(*args, **kwargs))
 
     def get_series_to_purge_tag(self, tag_label):
         """Find all series that have a specific tag."""
@@ -402,20 +743,12 @@ class SonarrActions:
 
         return purge_series
 
-    def clean_tags(self, series_with_stale_tags):
-        """Remove stale streaming provider tags from series in Sonarr."""
+    def clean_tags(self, series_with_stale_tags, checkpoint=None, plan=None, dry_run=False):
+        """
+        Remove stale streaming provider tags from series in Sonarr. Like
+        `tag_series`, takes a dict or an iterable of (sonarr_id, serie_data) pairs.
+        """
         logger.debug("Starting the tag cleanup process for series")
 
-        for sonarr_id, serie_data in series_with_stale_tags.items():
-            serie_obj = serie_data["sonarr_object"]
-            title = serie_data["title"]
-            stale_tag_ids = set(serie_data["stale_tag_ids"])
-
-            current_tags = set(serie_obj.get("tags", []))
-            serie_obj["tags"] = list(current_tags - stale_tag_ids)
-
-            try:
-                logger.debug(f"Cleaning tags for serie: {title} (ID: {sonarr_id})")
-                self.sonarr_client.upd_series(serie_obj)
-            except Exception as e:
-                logger.error(f"Failed to clean tags for {title}: {e}")
+        # The tags were loaded when the series to clean were found
+        self._write(series_with_stale_tags, checkpoint, plan, dry_run)
@@ -1,14 +1,19 @@
 import typer
 import sys
 
+from pathlib import Path
 from typing import Optional
 from loguru import logger
 
 import tagarr.commands.radarr as radarr
 import tagarr.commands.sonarr as sonarr
 import tagarr.commands.providers as providers
+import tagarr.commands.ids as ids
+import tagarr.commands.report as report
 
 from tagarr import __version__
+from tagarr.utils import fixtures, metrics, output, sharding, store, tracing
+from tagarr.utils.profiling import DEFAULT_PATH, Profiler
 
 
 app = typer.Typer()
@@ -17,6 +22,14 @@ app.add_typer(sonarr.app, name="sonarr", help="Gestiona etiquetas de series en S
 app.add_typer(
     providers.app, name="providers", help="Lista los proveedores de streaming disponibles para tu localización."
 )
+app.add_typer(
+    ids.app, name="ids", help="Gestiona el mapeo local de IDs externos (TVDB/IMDB → TMDB)."
+)
+app.add_typer(
+    report.app,
+    name="report",
+    help="Consulta la disponibilidad guardada por las ejecuciones anteriores, sin red.",
+)
 
 
 def version_callback(value: bool):
@@ -34,19 +47,61 @@ def _setup_logging(debug):
     if debug:
         log_level = "DEBUG"
 
-    logger.remove()
-    logger.add(
-        sys.stdout,
-        colorize=True,
-        format="[{time:YYYY-MM-DD HH:mm:ss}] - <level>{message}</level>",
-        level=log_level,
-    )
+    output.setup_logging(log_level)
 
 
 @app.callback()
 def main(
+    ctx: typer.Context,
     debug: bool = False,
     version: Optional[bool] = typer.Option(None, "--version", callback=version_callback),
+    record: Optional[Path] = typer.Option(
+        None,
+        "--record",
+        metavar="FILE",
+        help="Graba todas las peticiones HTTP y sus respuestas en un fichero comprimido.",
+    ),
+    replay: Optional[Path] = typer.Option(
+        None,
+        "--replay",
+        metavar="FILE",
+        exists=True,
+        dir_okay=False,
+        help=(
+            "Sirve las respuestas HTTP desde un fichero grabado con --record, "
+            "sin acceder a la red."
+        ),
+    ),
+    replay_speed: float = typer.Option(
+        1.0,
+        "--replay-speed",
+        metavar="FACTOR",
+        help="Multiplicador de las latencias grabadas al usar --replay (0 para no esperar).",
+    ),
+    profile: Optional[Path] = typer.Option(
+        None,
+        "--profile",
+        metavar="[=PATH]",
+        help=(
+            "Perfila el comando y escribe PATH.pstats y los stacks colapsados de tiempo "
+            f"real y CPU (PATH.wall.collapsed, PATH.cpu.collapsed). Por defecto: {DEFAULT_PATH}."
+        ),
+    ),
+    trace: Optional[Path] = typer.Option(
+        None,
+        "--trace",
+        metavar="FILE",
+        help=(
+            "Escribe una traza JSON Lines por título "
+            "(búsqueda, detalles, temporadas, TMDB, escritura)."
+        ),
+    ),
+    trace_top: int = typer.Option(
+        10,
+        "--trace-top",
+        metavar="N",
+        help="Número de títulos más lentos a mostrar al terminar cuando se usa --trace.",
+    ),
 ):
     """
     Tagarr etiqueta películas y series en Radarr/Sonarr con los proveedores de
@@ -60,9 +115,58 @@ def main(
     # Logging
     logger.debug(f"Starting Tagarr v{__version__}")
 
+    # Setup HTTP record or replay mode
+    if record and replay:
+        raise typer.BadParameter("--record and --replay cannot be used together")
+    if record:
+        fixtures.start_recording(record)
+    elif replay:
+        fixtures.start_replay(replay, replay_speed)
+    ctx.call_on_close(fixtures.stop)
+    ctx.call_on_close(metrics.log_summary)
+    ctx.call_on_close(store.close_all)
+
+    # Record a trace span per library item
+    if trace:
+        tracing.start(trace)
+
+        def _stop_tracing():
+            tracer = tracing.stop()
+            if tracer.spans and trace_top > 0:
+                output.print_slowest_titles(tracer.slowest(trace_top))
+
+        ctx.call_on_close(_stop_tracing)
+
+    # Worker processes would record, trace and profile only for themselves
+    sharding.set_single_process_options(
+        option
+        for option, value in (("--record", record), ("--trace", trace), ("--profile", profile))
+        if value
+    )
+
+    # Profile the rest of the run, the subcommand included
+    if profile:
+        profiler = Profiler(profile)
+        profiler.start()
+
+        def _stop_profiler():
+            profiler.stop()
+            output.print_profile_summary(profiler)
+
+        ctx.call_on_close(_stop_profiler)
+
+
+def _expand_optional_values(args):
+    """
+    `--profile` takes an optional value, so a bare `--profile` would swallow
+    the subcommand name. Like GNU getopt, a value must be given as
+    `--profile=PATH` and a bare flag means the default path.
+    """
+    return [f"--profile={DEFAULT_PATH}" if arg == "--profile" else arg for arg in args]
+
 
 def cli():
-    app(prog_name="tagarr")
+    app(args=_expand_optional_values(sys.argv[1:]), prog_name="tagarr")
 
 
 if __name__ == "__main__":
@@ -1,3 +0,0 @@
-class Manager(object):
-    def __init__(self, client):
-        self.client = client
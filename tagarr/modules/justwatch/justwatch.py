@@ -4,14 +4,143 @@ from urllib3.util.retry import Retry
 from requests.adapters import HTTPAdapter
 from json import JSONDecodeError
 
+from tagarr.utils.sessions import prepare_session
+
 from .exceptions import JustWatchTooManyRequests, JustWatchNotFound, JustWatchBadRequest
 
 
+DEFAULT_API_URL = "https://apis.justwatch.com"
+DEFAULT_LOCALE = "en_US"
+
+# Titles per page of search results, and when crawling the catalogue of a provider
+DEFAULT_PAGE_SIZE = 20
+CATALOGUE_PAGE_SIZE = 100
+
+# Status codes that are retried with exponential backoff before giving up
+RETRY_STATUS_CODES = [429, 500, 502, 503, 504]
+
+PROVIDERS_QUERY = """
+query GetPackages($country: Country!, $platform: Platform!) {
+    packages(country: $country, platform: $platform) {
+        packageId
+        clearName
+        shortName
+    }
+}
+"""
+
+POPULAR_TITLES_QUERY = """
+query GetPopularTitles(
+    $country: Country!,
+    $first: Int!,
+    $after: String,
+    $filter: TitleFilter,
+    $language: Language!
+) {
+    popularTitles(country: $country, first: $first, after: $after, filter: $filter) {
+        pageInfo {
+            endCursor
+            hasNextPage
+        }
+        edges {
+            node {
+                id
+                objectType
+                content(country: $country, language: $language) {
+                    title
+                    originalReleaseYear
+                    externalIds {
+                        imdbId
+                        tmdbId
+                    }
+                }
+            }
+        }
+    }
+}
+"""
+
+MOVIE_QUERY = """
+query GetMovie($nodeId: ID!, $country: Country!, $language: Language!) {
+    node(id: $nodeId) {
+        ... on Movie {
+            id
+            content(country: $country, language: $language) {
+                title
+                externalIds {
+                    imdbId
+                    tmdbId
+                }
+            }
+            offers(country: $country, platform: WEB) {
+                availableTo
+                package {
+                    packageId
+                    shortName
+                }
+            }
+        }
+    }
+}
+"""
+
+SHOW_QUERY = """
+query GetShow($nodeId: ID!, $country: Country!, $language: Language!) {
+    node(id: $nodeId) {
+        ... on Show {
+            id
+            content(country: $country, language: $language) {
+                title
+                externalIds {
+                    imdbId
+                    tmdbId
+                }
+            }
+            offers(country: $country, platform: WEB) {
+                availableTo
+                package {
+                    packageId
+                    shortName
+                }
+            }
+            seasons {
+                id
+            }
+        }
+    }
+}
+"""
+
+SEASON_QUERY = """
+query GetSeason($nodeId: ID!, $country: Country!, $language: Language!) {
+    node(id: $nodeId) {
+        ... on Season {
+            id
+            content(country: $country, language: $language) {
+                title
+            }
+            episodes {
+                id
+                offers(country: $country, platform: WEB) {
+                    availableTo
+                    package {
+                        packageId
+                        shortName
+                    }
+                }
+            }
+        }
+    }
+}
+"""
+
+
 class JustWatch(object):
-    def __init__(self, locale, ssl_verify=True):
+    def __init__(self, locale, ssl_verify=True, api_url=None, pool_size=10):
         # Setup base variables
-        self.locale_api_url = "https://apis.justwatch.com/content"
-        self.graphql_url = "https://apis.justwatch.com/graphql"
+        self.api_url = (api_url or DEFAULT_API_URL).rstrip("/")
+        self.locale_api_url = f"{self.api_url}/content"
+        self.graphql_url = f"{self.api_url}/graphql"
         self.ssl_verify = ssl_verify
 
         # Setup session
@@ -23,27 +152,23 @@ class JustWatch(object):
         retries = Retry(
             total=5,
             backoff_factor=0.5,
-            status_forcelist=[429, 500, 502, 503, 504],
+            status_forcelist=RETRY_STATUS_CODES,
             allowed_methods=["GET", "POST"],
         )
 
-        self.session.mount("http://", HTTPAdapter(max_retries=retries))
-        self.session.mount("https://", HTTPAdapter(max_retries=retries))
+        # Keep up to `pool_size` connections alive, for threads sharing the client
+        adapter = HTTPAdapter(max_retries=retries, pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        prepare_session(self.session)
 
         # Setup locale by verifying its input
-        self.locale = self._get_full_locale(locale)
-
-        # Extract country and language codes for GraphQL queries
-        # e.g. "es_ES" -> country="ES", language="es"
-        parts = self.locale.split("_")
-        self.language = parts[0]
-        self.country = parts[1] if len(parts) > 1 else parts[0].upper()
+        self._get_full_locale(locale)
 
     def __exit__(self, *args):
         self.session.close()
 
     def _get_full_locale(self, locale):
-        default_locale = "en_US"
         url = f"{self.locale_api_url}/locales/state"
 
         result = self.session.get(url)
@@ -55,11 +180,16 @@ class JustWatch(object):
         if not valid_locale:
             locale = "".join([i["full_locale"] for i in jw_locales if i["iso_3166_2"] == locale])
 
-        # If the locale is empty return the default locale
-        if not locale:
-            return default_locale
+        # If the locale is empty use the default locale
+        self.locale = locale or DEFAULT_LOCALE
 
-        return locale
+        # Extract country and language codes for GraphQL queries
+        # e.g. "es_ES" -> country="ES", language="es"
+        parts = self.locale.split("_")
+        self.language = parts[0]
+        self.country = parts[1] if len(parts) > 1 else parts[0].upper()
+
+        return self.locale
 
     def _graphql_query(self, query, variables=None):
         payload = {"query": query}
@@ -93,18 +223,24 @@ class JustWatch(object):
             return jw_id_str
         return f"{prefix}{jw_id_str}"
 
-    def get_providers(self):
-        query = """
-        query GetPackages($country: Country!, $platform: Platform!) {
-            packages(country: $country, platform: $platform) {
-                packageId
-                clearName
-                shortName
-            }
+    def _get_node(self, query, node_id):
+        variables = {
+            "nodeId": node_id,
+            "country": self.country,
+            "language": self.language,
         }
-        """
-        variables = {"country": self.country, "platform": "WEB"}
+
         data = self._graphql_query(query, variables)
+        node = data.get("node")
+
+        if not node:
+            raise JustWatchNotFound()
+
+        return node
+
+    def get_providers(self):
+        variables = {"country": self.country, "platform": "WEB"}
+        data = self._graphql_query(PROVIDERS_QUERY, variables)
 
         # Transform to legacy format: [{"id": ..., "clear_name": ..., "short_name": ...}]
         return [
@@ -116,12 +252,18 @@ class JustWatch(object):
             for p in data.get("packages", [])
         ]
 
-    def query_title(self, query, content_type, fast=True, result={}, page=1, **kwargs):
+    def query_title(
+        self, query, content_type, page_size=DEFAULT_PAGE_SIZE, max_items=None, **kwargs
+    ):
         """
-        Query JustWatch API to find information about a title
+        Query JustWatch API to find information about a title. Results are
+        yielded one at a time, the next page is only requested when the
+        previous one is consumed.
 
-        :query: the title of the show or movie to search for
+        :query: the title of the show or movie to search for, None to list every title matching the filters
         :content_type: can either be 'show' or 'movie'. Can also be a list of types.
+        :page_size: results per request
+        :max_items: stop after this many results, all of them if None
         """
         if isinstance(content_type, str):
             content_type = content_type.split(",")
@@ -130,17 +272,23 @@ class JustWatch(object):
         type_map = {"movie": "MOVIE", "show": "SHOW"}
         object_types = [type_map.get(ct, ct.upper()) for ct in content_type]
 
-        page_size = kwargs.get("page_size", 20)
-
-        # Build filter
+        # Build filter, without a query every title matching the filters is listed
         gql_filter = {
-            "searchQuery": query,
             "objectTypes": object_types,
         }
 
+        if query is not None:
+            gql_filter["searchQuery"] = query
+
         # Map legacy kwargs to GraphQL filter
         if "monetization_types" in kwargs:
-            monetization_map = {"flatrate": "FLATRATE", "rent": "RENT", "buy": "BUY", "free": "FREE", "ads": "ADS"}
+            monetization_map = {
+                "flatrate": "FLATRATE",
+                "rent": "RENT",
+                "buy": "BUY",
+                "free": "FREE",
+                "ads": "ADS",
+            }
             gql_filter["monetizationTypes"] = [
                 monetization_map.get(m, m.upper()) for m in kwargs["monetization_types"]
             ]
@@ -157,119 +305,59 @@ class JustWatch(object):
             else:
                 gql_filter["releaseYear"] = {"max": kwargs["release_year_until"]}
 
-        gql_query = """
-        query GetPopularTitles(
-            $country: Country!,
-            $first: Int!,
-            $filter: TitleFilter,
-            $language: Language!
-        ) {
-            popularTitles(country: $country, first: $first, filter: $filter) {
-                edges {
-                    node {
-                        id
-                        objectType
-                        content(country: $country, language: $language) {
-                            title
-                            originalReleaseYear
-                        }
-                    }
-                }
-            }
-        }
-        """
-        variables = {
-            "country": self.country,
-            "first": page_size,
-            "filter": gql_filter,
-            "language": self.language,
-        }
+        after = None
+        yielded = 0
 
-        data = self._graphql_query(gql_query, variables)
+        while True:
+            first = self._next_page_size(page_size, max_items, yielded)
+            if not first:
+                return
 
-        edges = data.get("popularTitles", {}).get("edges", [])
-        items = [{"id": edge["node"]["id"]} for edge in edges]
+            variables = {
+                "country": self.country,
+                "first": first,
+                "filter": gql_filter,
+                "language": self.language,
+            }
 
-        return {"items": items, "total_pages": 1}
+            if after is not None:
+                variables["after"] = after
 
-    def get_movie(self, jw_id):
-        node_id = self._normalize_id(jw_id, "tm")
-
-        query = """
-        query GetMovie($nodeId: ID!, $country: Country!, $language: Language!) {
-            node(id: $nodeId) {
-                ... on Movie {
-                    id
-                    content(country: $country, language: $language) {
-                        title
-                        externalIds {
-                            imdbId
-                            tmdbId
-                        }
-                    }
-                    offers(country: $country, platform: WEB) {
-                        package {
-                            packageId
-                            shortName
-                        }
-                    }
-                }
-            }
-        }
-        """
-        variables = {
-            "nodeId": node_id,
-            "country": self.country,
-            "language": self.language,
-        }
+            data = self._graphql_query(POPULAR_TITLES_QUERY, variables)
 
-        data = self._graphql_query(query, variables)
-        node = data.get("node")
+            titles = data.get("popularTitles") or {}
+            page_info = titles.get("pageInfo") or {}
+            items = [self._transform_search_item(edge["node"]) for edge in titles.get("edges", [])]
 
-        if not node:
-            raise JustWatchNotFound()
+            for item in items[:first]:
+                yield item
+                yielded += 1
 
-        return self._transform_title_data(node)
+            if not page_info.get("hasNextPage") or not page_info.get("endCursor"):
+                return
 
-    def get_show(self, jw_id):
-        node_id = self._normalize_id(jw_id, "ts")
-
-        query = """
-        query GetShow($nodeId: ID!, $country: Country!, $language: Language!) {
-            node(id: $nodeId) {
-                ... on Show {
-                    id
-                    content(country: $country, language: $language) {
-                        title
-                        externalIds {
-                            imdbId
-                            tmdbId
-                        }
-                    }
-                    offers(country: $country, platform: WEB) {
-                        package {
-                            packageId
-                            shortName
-                        }
-                    }
-                    seasons {
-                        id
-                    }
-                }
-            }
-        }
+            after = page_info["endCursor"]
+
+    def iter_catalogue(self, package, content_type, page_size=CATALOGUE_PAGE_SIZE):
         """
-        variables = {
-            "nodeId": node_id,
-            "country": self.country,
-            "language": self.language,
-        }
+        Yield every title of `content_type` ('movie' or 'show') with a flatrate
+        offer on `package` (a provider short name), one page at a time.
+        """
+        return self.query_title(
+            None,
+            content_type,
+            page_size=page_size,
+            monetization_types=["flatrate"],
+            providers=[package],
+        )
 
-        data = self._graphql_query(query, variables)
-        node = data.get("node")
+    def get_movie(self, jw_id):
+        node = self._get_node(MOVIE_QUERY, self._normalize_id(jw_id, "tm"))
 
-        if not node:
-            raise JustWatchNotFound()
+        return self._transform_title_data(node)
+
+    def get_show(self, jw_id):
+        node = self._get_node(SHOW_QUERY, self._normalize_id(jw_id, "ts"))
 
         result = self._transform_title_data(node)
 
@@ -282,58 +370,68 @@ class JustWatch(object):
         return result
 
     def get_season(self, jw_id):
-        node_id = self._normalize_id(jw_id, "tss")
-
-        query = """
-        query GetSeason($nodeId: ID!, $country: Country!, $language: Language!) {
-            node(id: $nodeId) {
-                ... on Season {
-                    id
-                    content(country: $country, language: $language) {
-                        title
-                    }
-                    episodes {
-                        id
-                        offers(country: $country, platform: WEB) {
-                            package {
-                                packageId
-                                shortName
-                            }
-                        }
-                    }
-                }
-            }
-        }
-        """
-        variables = {
-            "nodeId": node_id,
-            "country": self.country,
-            "language": self.language,
-        }
-
-        data = self._graphql_query(query, variables)
-        node = data.get("node")
-
-        if not node:
-            raise JustWatchNotFound()
+        node = self._get_node(SEASON_QUERY, self._normalize_id(jw_id, "tss"))
 
         # Transform episodes to legacy format with offers
         episodes = []
         for ep in node.get("episodes", []):
             episode_data = {"id": ep["id"]}
-            offers = []
-            for offer in ep.get("offers", []):
-                pkg = offer.get("package", {})
-                offers.append({
-                    "provider_id": pkg.get("packageId"),
-                    "package_short_name": pkg.get("shortName"),
-                })
+            offers = self._transform_offers(ep.get("offers", []))
             if offers:
                 episode_data["offers"] = offers
             episodes.append(episode_data)
 
         return {"episodes": episodes}
 
+    @staticmethod
+    def _next_page_size(page_size, max_items, yielded):
+        """The size of the next result page, 0 once `max_items` items were yielded."""
+        if max_items is None:
+            return page_size
+
+        return max(min(page_size, max_items - yielded), 0)
+
+    def _transform_search_item(self, node):
+        """Search results carry the external IDs, so callers can match without the details."""
+        content = node.get("content") or {}
+        item = {"id": node["id"]}
+
+        if "title" in content:
+            item["title"] = content["title"]
+            item["original_release_year"] = content.get("originalReleaseYear")
+        if "externalIds" in content:
+            item["external_ids"] = self._transform_external_ids(content["externalIds"])
+
+        return item
+
+    @staticmethod
+    def _transform_external_ids(ext_ids_raw):
+        external_ids = []
+        if not ext_ids_raw:
+            return external_ids
+
+        if ext_ids_raw.get("tmdbId"):
+            external_ids.append({"provider": "tmdb", "external_id": str(ext_ids_raw["tmdbId"])})
+        if ext_ids_raw.get("imdbId"):
+            external_ids.append({"provider": "imdb", "external_id": ext_ids_raw["imdbId"]})
+
+        return external_ids
+
+    @staticmethod
+    def _transform_offers(raw_offers):
+        offers = []
+        for offer in raw_offers:
+            pkg = offer.get("package", {})
+            offers.append(
+                {
+                    "provider_id": pkg.get("packageId"),
+                    "package_short_name": pkg.get("shortName"),
+                    "available_to": offer.get("availableTo"),
+                }
+            )
+
+        return offers
+
     def _transform_title_data(self, node):
         """Transform GraphQL node data to legacy REST format."""
         result = {}
@@ -341,27 +439,11 @@ class JustWatch(object):
         content = node.get("content", {})
 
         # Transform external_ids to legacy format
-        ext_ids_raw = content.get("externalIds", {})
-        if ext_ids_raw:
-            external_ids = []
-            if ext_ids_raw.get("tmdbId"):
-                external_ids.append({"provider": "tmdb", "external_id": str(ext_ids_raw["tmdbId"])})
-            if ext_ids_raw.get("imdbId"):
-                external_ids.append({"provider": "imdb", "external_id": ext_ids_raw["imdbId"]})
-            result["external_ids"] = external_ids
-        else:
-            result["external_ids"] = []
+        result["external_ids"] = self._transform_external_ids(content.get("externalIds", {}))
 
         # Transform offers to legacy format
         raw_offers = node.get("offers", [])
         if raw_offers:
-            offers = []
-            for offer in raw_offers:
-                pkg = offer.get("package", {})
-                offers.append({
-                    "provider_id": pkg.get("packageId"),
-                    "package_short_name": pkg.get("shortName"),
-                })
-            result["offers"] = offers
+            result["offers"] = self._transform_offers(raw_offers)
 
         return result
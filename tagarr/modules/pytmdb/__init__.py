@@ -4,6 +4,10 @@
 import requests
 
 from json import JSONDecodeError
+from urllib3.util.retry import Retry
+from requests.adapters import HTTPAdapter
+
+from tagarr.utils.sessions import prepare_session
 
 from .exceptions import TMDBException
 from .v3.movies import Movie
@@ -12,18 +16,35 @@ from .v3.find import Find
 
 
 class TMDB(object):
-    def __init__(self, api_key, api_version="3", ssl_verify=True):
+    def __init__(self, api_key, api_version="3", ssl_verify=True, cache=None, cache_ttl=2592000):
         # Setup base variables
         self._api_version = str(api_version)
         self._base_url = "https://api.themoviedb.org"
         self.api_url = "{}/{}".format(self._base_url, self._api_version)
         self.api_key = api_key
 
+        # Optional persistent cache, any object with get_cached(key) and
+        # set_cached(key, value, ttl), e.g. tagarr.utils.store.Store
+        self.cache = cache
+        self.cache_ttl = cache_ttl
+
         # Setup session
         self.session = requests.Session()
         self.session.verify = ssl_verify
         self.session.params = {"api_key": self.api_key}
 
+        # Setup retries on failure
+        retries = Retry(
+            total=5,
+            backoff_factor=0.5,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=["GET"],
+        )
+
+        self.session.mount("http://", HTTPAdapter(max_retries=retries))
+        self.session.mount("https://", HTTPAdapter(max_retries=retries))
+        prepare_session(self.session)
+
         # Register managers
         self.movie = Movie(self)
         self.tv = TV(self)
@@ -57,5 +78,17 @@ class TMDB(object):
 
         return self._filter_api_error(result_json)
 
-    def http_get(self, path, params=None):
-        return self.http_request("get", path, params=params)
+    def http_get(self, path, params=None, cached=False):
+        if not cached or self.cache is None:
+            return self.http_request("get", path, params=params)
+
+        key = "tmdb:{}?{}".format(path, sorted((params or {}).items()))
+        data = self.cache.get_cached(key)
+        if data is None:
+            data = self.http_request("get", path, params=params)
+
+            # Only cache successful JSON responses, errors raise before this point
+            if isinstance(data, dict):
+                self.cache.set_cached(key, data, self.cache_ttl)
+
+        return data
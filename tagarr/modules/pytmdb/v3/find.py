@@ -6,4 +6,4 @@ class Find(Manager):
         path = "/find/{}".format(external_id)
 
         params = {"external_source": external_source}
-        return self.client.http_get(path, params=params)
+        return self.client.http_get(path, params=params, cached=True)
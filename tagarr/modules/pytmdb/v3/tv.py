@@ -5,7 +5,7 @@ class TV(Manager):
     def get_details(self, tv_id):
         path = "/tv/{}".format(tv_id)
 
-        return self.client.http_get(path)
+        return self.client.http_get(path, cached=True)
 
     def get_watch_providers(self, tv_id):
         path = "/tv/{}/watch/providers".format(tv_id)
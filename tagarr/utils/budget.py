@@ -0,0 +1,102 @@
+"""
+Time and request budgets of a run.
+
+`--time-budget` and `--request-budget` bound how long a tag, clean or plan
+run resolves the library and how many lookup requests (JustWatch and TMDB)
+it makes. The budget is checked before each library item is resolved: once
+it is spent the remaining items are deferred, what was already found is
+written and the run ends as usual. A budgeted run processes the library in
+priority order (see `tagarr.core.priority`), so the refreshes that matter
+most happen first and the next run picks up where this one stopped.
+
+Like the tracer, the budget is run-wide state: `start` sets it, the lookup
+sessions count their requests with the `count_request` response hook and
+`exhausted` tells the resolving loops when to stop. Worker processes start
+their own.
+"""
+
+import re
+import threading
+import time
+
+from loguru import logger
+
+import tagarr.utils.metrics as metrics
+
+
+DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 7 * 86400}
+
+_budget = None
+
+
+def parse_duration(value):
+    """Parse a duration such as 45s, 30m, 12h, 7d or 2w into seconds."""
+    match = re.fullmatch(r"(\d+)([smhdw])", value.strip())
+    if not match:
+        raise ValueError(f"'{value}' is not a duration, use e.g. 30m, 12h, 7d or 2w")
+
+    return int(match.group(1)) * DURATION_UNITS[match.group(2)]
+
+
+class Budget:
+    def __init__(self, seconds=None, requests=None):
+        self.seconds = seconds
+        self.requests = requests
+        self.deadline = time.monotonic() + seconds if seconds is not None else None
+        self.used = 0
+
+        # "time" or "request" once spent
+        self.spent = None
+
+        # Requests are counted from the writer and resolver threads
+        self._lock = threading.Lock()
+
+    def count_request(self):
+        with self._lock:
+            self.used += 1
+
+    def exhausted(self):
+        if self.spent:
+            return True
+
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            self.spent = "time"
+        elif self.requests is not None and self.used >= self.requests:
+            self.spent = "request"
+        else:
+            return False
+
+        logger.info(f"The {self.spent} budget of the run is spent, deferring the remaining items")
+        return True
+
+
+def start(seconds=None, requests=None):
+    """Set the budget of the run, none if neither `seconds` nor `requests` is given."""
+    global _budget
+    _budget = Budget(seconds, requests) if seconds is not None or requests is not None else None
+    return _budget
+
+
+def limited():
+    return _budget is not None
+
+
+def exhausted():
+    """Whether the budget of the run is spent, counting the item as deferred if it is."""
+    if _budget is None or not _budget.exhausted():
+        return False
+
+    metrics.increment("budget.deferred")
+    return True
+
+
+def deferred():
+    """How many items the budget deferred to the next run, the workers' included."""
+    return metrics.snapshot("budget.deferred").get("budget.deferred", 0)
+
+
+def count_request(response, *args, **kwargs):
+    """Response hook counting a lookup request against the budget of the run."""
+    if _budget is not None:
+        _budget.count_request()
+    return response
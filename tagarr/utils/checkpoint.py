@@ -0,0 +1,141 @@
+"""
+Checkpoints of long `tag` and `clean` runs.
+
+While a run resolves and writes the library, every finished item is appended
+to a JSON lines file in the data directory: first its result, then a marker
+once it has been written to Radarr/Sonarr. The file starts with a header
+that identifies the run (command, library snapshot and provider set).
+
+With `--resume` a run whose header matches the checkpoint reuses the stored
+results and skips the writes that already happened, so an interrupted run
+continues where it stopped. The checkpoint is removed when a run completes.
+"""
+
+import hashlib
+import json
+import threading
+import time
+
+from pathlib import Path
+
+from loguru import logger
+
+
+# Seconds between flushes of the checkpoint file to disk
+FLUSH_INTERVAL = 1
+
+
+def library_snapshot(items, id_fields):
+    """Hash of the IDs, titles and external IDs of a library, ignoring its tags."""
+    digest = hashlib.sha1()
+    for item in sorted(items, key=lambda item: item["id"]):
+        values = [item["id"], item.get("title")] + [item.get(field) for field in id_fields]
+        digest.update(json.dumps(values).encode("utf-8"))
+
+    return digest.hexdigest()
+
+
+class Checkpoint:
+    def __init__(self, path, resume=False):
+        self.path = Path(path)
+        self.resume = resume
+        self.results = {}
+        self.written = set()
+        self._file = None
+        self._last_flush = 0.0
+
+        # Results are added while the writer thread marks items as written
+        self._lock = threading.Lock()
+
+    def _load(self, header):
+        """Read the entries of a checkpoint made for the same run, return False otherwise."""
+        if not self.path.is_file():
+            logger.info(f"No checkpoint to resume at {self.path}, starting from the beginning")
+            return False
+
+        with open(self.path, "r") as _file:
+            lines = _file.read().splitlines()
+
+        try:
+            stored_header = json.loads(lines[0])
+        except (IndexError, ValueError):
+            stored_header = None
+
+        if stored_header != header:
+            logger.warning(
+                "The checkpoint was made for another library or provider set, starting over"
+            )
+            return False
+
+        for line in lines[1:]:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # The last line may be cut short by the interruption
+                continue
+
+            if entry.get("written"):
+                self.written.add(entry["id"])
+            else:
+                self.results[entry["id"]] = entry["result"]
+
+        logger.info(
+            f"Resuming from checkpoint: {len(self.results)} items resolved, {len(self.written)} written"
+        )
+        return True
+
+    def begin(self, command, snapshot, providers):
+        """Open the checkpoint of a run, loading the previous one when resuming it."""
+        header = {"command": command, "snapshot": snapshot, "providers": sorted(providers)}
+        resumed = self.resume and self._load(header)
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "a" if resumed else "w")
+        if not resumed:
+            self.results = {}
+            self.written = set()
+            self._append(header)
+
+    def has_result(self, arr_id):
+        return arr_id in self.results
+
+    def get_result(self, arr_id):
+        return self.results[arr_id]
+
+    def add_result(self, arr_id, result):
+        """Remember the result of an item, None when there is nothing to write."""
+        if result is not None:
+            result = {key: value for key, value in result.items() if not key.endswith("_object")}
+
+        self.results[arr_id] = result
+        self._append({"id": arr_id, "result": result})
+
+    def is_written(self, arr_id):
+        return arr_id in self.written
+
+    def mark_written(self, arr_id):
+        self.written.add(arr_id)
+        self._append({"id": arr_id, "written": True})
+
+    def _append(self, entry):
+        with self._lock:
+            self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+            now = time.monotonic()
+            if now - self._last_flush >= FLUSH_INTERVAL:
+                self._file.flush()
+                self._last_flush = now
+
+    def finish(self):
+        """The run completed, the checkpoint is no longer needed."""
+        if self._file:
+            self._file.close()
+            self._file = None
+
+        self.path.unlink(missing_ok=True)
+        logger.debug(f"Removed checkpoint {self.path}")
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
@@ -13,6 +13,9 @@ class Config:
         self.__class__ = Config
         self.config = None
 
+        # Instance whose section the properties read, by service
+        self.selected = {}
+
         possible_locations = (
             "/etc/tagarr/tagarr.yml",
             f"{Path.home()}/.config/tagarr/tagarr.yml",
@@ -58,19 +61,60 @@ class Config:
 
     @property
     def general_section(self):
-        return self.config.get("general", {})
+        return (self.config or {}).get("general", {})
 
     @property
     def tmdb_section(self):
-        return self.config.get("tmdb", {})
+        return (self.config or {}).get("tmdb", {})
+
+    @property
+    def justwatch_section(self):
+        return (self.config or {}).get("justwatch", {})
+
+    def _instance_sections(self, service):
+        """
+        The sections of the instances of `service` by name. The service section
+        is either a single instance, named after the service, or a list of
+        instances with a `name` each (numbered when missing).
+        """
+        section = (self.config or {}).get(service) or {}
+
+        if isinstance(section, list):
+            return {
+                str(entry.get("name") or number): entry
+                for number, entry in enumerate(section, start=1)
+            }
+
+        return {str(section.get("name") or service): section}
+
+    def instances(self, service):
+        return list(self._instance_sections(service))
+
+    def use_instance(self, service, name):
+        """Make the `<service>_*` properties read the section of instance `name`."""
+        if name not in self._instance_sections(service):
+            raise ValueError(f"There is no {service} instance named '{name}' in the configuration")
+
+        self.selected[service] = name
+
+    def _instance_section(self, service):
+        sections = self._instance_sections(service)
+        name = self.selected.get(service)
+
+        return sections[name] if name in sections else next(iter(sections.values()))
+
+    def _instance_key(self, service):
+        """Identifies the selected instance in the local state: the service name for a single one."""
+        name = self.selected.get(service) or self.instances(service)[0]
+        return service if name == service else f"{service}-{name}"
 
     @property
     def radarr_section(self):
-        return self.config.get("radarr", {})
+        return self._instance_section("radarr")
 
     @property
     def sonarr_section(self):
-        return self.config.get("sonarr", {})
+        return self._instance_section("sonarr")
 
     @property
     def locale(self):
@@ -88,10 +132,42 @@ class Config:
     def fast_search(self):
         return self.general_section.get("fast_search", True)
 
+    @property
+    def catalogue_mode(self):
+        return self.general_section.get("catalogue_mode", False)
+
+    @property
+    def recheck_days(self):
+        return self.general_section.get("recheck_days", 7)
+
+    @property
+    def clean_recheck_days(self):
+        return self.general_section.get("clean_recheck_days", 1)
+
+    @property
+    def data_dir(self):
+        return self.general_section.get("data_dir", f"{Path.home()}/.tagarr/data")
+
     @property
     def tmdb_api_key(self):
         return self.tmdb_section.get("api_key", None)
 
+    @property
+    def tmdb_cache_days(self):
+        return self.tmdb_section.get("cache_days", 30)
+
+    @property
+    def justwatch_url(self):
+        return self.justwatch_section.get("url", None)
+
+    @property
+    def justwatch_pool_size(self):
+        return self.justwatch_section.get("pool_size", 10)
+
+    @property
+    def radarr_instance(self):
+        return self._instance_key("radarr")
+
     @property
     def radarr_url(self):
         return self.radarr_section.get("url", None)
@@ -102,12 +178,28 @@ class Config:
 
     @property
     def radarr_verify_ssl(self):
-        return self.radarr_section.get("verify_ssl", False)
+        return self.radarr_section.get("verify_ssl", True)
+
+    @property
+    def radarr_timeout(self):
+        return self.radarr_section.get("timeout", 30)
+
+    @property
+    def radarr_retries(self):
+        return self.radarr_section.get("retries", 3)
+
+    @property
+    def radarr_pool_size(self):
+        return self.radarr_section.get("pool_size", 10)
 
     @property
     def radarr_excludes(self):
         return self.radarr_section.get("exclude") or []
 
+    @property
+    def sonarr_instance(self):
+        return self._instance_key("sonarr")
+
     @property
     def sonarr_url(self):
         return self.sonarr_section.get("url", None)
@@ -118,7 +210,19 @@ class Config:
 
     @property
     def sonarr_verify_ssl(self):
-        return self.sonarr_section.get("verify_ssl", False)
+        return self.sonarr_section.get("verify_ssl", True)
+
+    @property
+    def sonarr_timeout(self):
+        return self.sonarr_section.get("timeout", 30)
+
+    @property
+    def sonarr_retries(self):
+        return self.sonarr_section.get("retries", 3)
+
+    @property
+    def sonarr_pool_size(self):
+        return self.sonarr_section.get("pool_size", 10)
 
     @property
     def sonarr_excludes(self):
@@ -0,0 +1,10 @@
+from enum import Enum
+
+
+class RunOutput(str, Enum):
+    """Output of the tag and clean commands."""
+
+    table = "table"
+    jsonl = "jsonl"
+    csv = "csv"
+    summary = "summary"
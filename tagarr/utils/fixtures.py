@@ -0,0 +1,189 @@
+"""
+Record and replay of the HTTP traffic of a Tagarr run.
+
+In record mode every request sent through a prepared session is forwarded
+as usual and the exchange is appended to a gzip compressed JSON lines file.
+In replay mode nothing leaves the machine: responses are served from that
+file, in recorded order per request, after sleeping the recorded latency.
+"""
+
+import gzip
+import hashlib
+import json
+import threading
+import time
+
+from collections import defaultdict
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from loguru import logger
+from requests.adapters import BaseAdapter
+from requests.exceptions import ConnectionError
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+
+
+# Query parameters that carry secrets and must never end up in a fixture
+REDACTED_PARAMS = {"api_key", "apikey"}
+
+_recorder = None
+_replayer = None
+
+
+def _redact_url(url):
+    parts = urlsplit(url)
+    query = sorted((k, v) for k, v in parse_qsl(parts.query) if k.lower() not in REDACTED_PARAMS)
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), ""))
+
+
+def _request_key(request):
+    body = request.body or b""
+    if isinstance(body, str):
+        body = body.encode()
+
+    digest = hashlib.sha1(body).hexdigest()[:16] if body else ""
+    return f"{request.method} {_redact_url(request.url)} {digest}"
+
+
+class Recorder:
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self._file = gzip.open(path, "wt", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def add(self, request, response, elapsed):
+        entry = {
+            "key": _request_key(request),
+            "status": response.status_code,
+            "content_type": response.headers.get("Content-Type"),
+            "body": response.text,
+            "elapsed": round(elapsed, 4),
+        }
+        line = json.dumps(entry, separators=(",", ":"))
+
+        with self._lock:
+            self._file.write(line + "\n")
+            self.count += 1
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+        logger.debug(f"Recorded {self.count} HTTP exchanges to {self.path}")
+
+
+class Replayer:
+    def __init__(self, path, speed=1.0):
+        self.path = path
+        self.speed = speed
+        self._entries = defaultdict(list)
+        self._cursors = defaultdict(int)
+        self._lock = threading.Lock()
+
+        with gzip.open(path, "rt", encoding="utf-8") as _file:
+            for line in _file:
+                entry = json.loads(line)
+                self._entries[entry["key"]].append(entry)
+
+        logger.debug(f"Loaded {len(self._entries)} recorded requests from {path}")
+
+    def get(self, request):
+        """Return the next recorded exchange for `request`, repeating the last one when exhausted."""
+        key = _request_key(request)
+
+        with self._lock:
+            entries = self._entries.get(key)
+            if not entries:
+                return None
+
+            index = min(self._cursors[key], len(entries) - 1)
+            self._cursors[key] += 1
+
+        return entries[index]
+
+
+class RecordingAdapter(BaseAdapter):
+    """Wraps the adapter a session already uses and records what goes through it."""
+
+    def __init__(self, adapter, recorder):
+        super().__init__()
+        self.adapter = adapter
+        self.recorder = recorder
+
+    def send(self, request, **kwargs):
+        start = time.perf_counter()
+        response = self.adapter.send(request, **kwargs)
+        self.recorder.add(request, response, time.perf_counter() - start)
+        return response
+
+    def close(self):
+        self.adapter.close()
+
+
+class ReplayAdapter(BaseAdapter):
+    def __init__(self, replayer):
+        super().__init__()
+        self.replayer = replayer
+
+    def send(self, request, **kwargs):
+        entry = self.replayer.get(request)
+        if entry is None:
+            raise ConnectionError(
+                f"No recorded response for {request.method} {_redact_url(request.url)}",
+                request=request,
+            )
+
+        if self.replayer.speed:
+            time.sleep(entry["elapsed"] * self.replayer.speed)
+
+        response = Response()
+        response.status_code = entry["status"]
+        response.headers = CaseInsensitiveDict()
+        if entry["content_type"]:
+            response.headers["Content-Type"] = entry["content_type"]
+        response._content = entry["body"].encode("utf-8")
+        response.encoding = "utf-8"
+        response.url = request.url
+        response.request = request
+
+        return response
+
+    def close(self):
+        pass
+
+
+def start_recording(path):
+    global _recorder
+    _recorder = Recorder(path)
+    logger.debug(f"Recording HTTP traffic to {path}")
+
+
+def start_replay(path, speed=1.0):
+    global _replayer
+    _replayer = Replayer(path, speed)
+    logger.debug(f"Replaying HTTP traffic from {path} at speed {speed}")
+
+
+def stop():
+    global _recorder, _replayer
+
+    if _recorder:
+        _recorder.close()
+
+    _recorder = None
+    _replayer = None
+
+
+def install(session):
+    """Hook the active record or replay mode, if any, into a requests session."""
+    if _replayer:
+        adapter = ReplayAdapter(_replayer)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+    elif _recorder:
+        for prefix, adapter in list(session.adapters.items()):
+            if not isinstance(adapter, RecordingAdapter):
+                session.mount(prefix, RecordingAdapter(adapter, _recorder))
+
+    return session
@@ -0,0 +1,121 @@
+"""
+Readers for bulk external id mapping files, imported with `tagarr ids import`.
+
+Two formats are accepted, optionally gzip compressed:
+
+- CSV with a header row, e.g. `tvdb_id,imdb_id,tmdb_id`
+- JSON Lines with one object per line, e.g. `{"tvdb_id": 81189, "tmdb_id": 1396}`
+
+Column names are matched loosely (`tvdb`, `tvdb_id` and `tvdbId` are the
+same column). Rows without a TMDB id or without any TVDB/IMDB id are skipped,
+and so are JSON lines that do not parse to an object.
+
+The mappings are for Sonarr series, Radarr movies carry their TMDB id.
+"""
+
+import csv
+import gzip
+import json
+
+from pathlib import Path
+
+from loguru import logger
+
+
+SOURCES = ("tvdb", "imdb")
+
+# Media type of the mappings in the local store
+MEDIA_TYPE = "tv"
+
+COLUMN_ALIASES = {
+    "tvdb": "tvdb",
+    "tvdbid": "tvdb",
+    "thetvdb": "tvdb",
+    "imdb": "imdb",
+    "imdbid": "imdb",
+    "tmdb": "tmdb",
+    "tmdbid": "tmdb",
+    "themoviedb": "tmdb",
+}
+
+
+def _open(path):
+    if path.suffix == ".gz":
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+
+    return open(path, "r", encoding="utf-8", newline="")
+
+
+def _is_jsonl(path):
+    suffixes = [suffix.lower() for suffix in path.suffixes if suffix != ".gz"]
+    return bool(suffixes) and suffixes[-1] in (".json", ".jsonl", ".ndjson")
+
+
+def _normalize_row(row):
+    ids = {}
+    for column, value in row.items():
+        if column is None or value in (None, ""):
+            continue
+
+        name = COLUMN_ALIASES.get(column.strip().lower().replace("_", ""))
+        if name:
+            ids[name] = str(value).strip()
+
+    return ids
+
+
+def _read_rows(path):
+    """Yield the rows of the file as dicts, None for a line that is not a JSON object."""
+    with _open(path) as _file:
+        if _is_jsonl(path):
+            for number, line in enumerate(_file, start=1):
+                if not line.strip():
+                    continue
+
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    row = None
+
+                if not isinstance(row, dict):
+                    logger.warning(f"Skipping line {number} of {path}, it is not a JSON object")
+                    row = None
+
+                yield row
+        else:
+            yield from csv.DictReader(_file)
+
+
+class MappingReader:
+    """
+    Iterate over (media_type, source, external_id, tmdb_id) tuples for every
+    TVDB and IMDB id in the file at `path`, ready for `Store.add_id_mappings`.
+    `rows` and `skipped` count the rows read so far.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.rows = 0
+        self.skipped = 0
+
+    def __iter__(self):
+        for row in _read_rows(self.path):
+            self.rows += 1
+            if row is None:
+                self.skipped += 1
+                continue
+
+            ids = _normalize_row(row)
+
+            try:
+                tmdb_id = int(ids.get("tmdb", ""))
+            except ValueError:
+                tmdb_id = None
+
+            sources = [source for source in SOURCES if source in ids]
+            if tmdb_id is None or not sources:
+                self.skipped += 1
+                continue
+
+            for source in sources:
+                yield MEDIA_TYPE, source, ids[source], tmdb_id
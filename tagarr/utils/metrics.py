@@ -0,0 +1,36 @@
+"""
+Run-wide counters, e.g. how many titles each resolver step and search tier
+found. Counting is always on and cheap; the totals are logged at debug level
+when the run ends and are available to the summary output.
+"""
+
+import threading
+
+from collections import Counter
+
+from loguru import logger
+
+
+_counters = Counter()
+_lock = threading.Lock()
+
+
+def increment(name, value=1):
+    with _lock:
+        _counters[name] += value
+
+
+def snapshot(prefix=""):
+    """Return a copy of the counters whose name starts with `prefix`."""
+    with _lock:
+        return {name: value for name, value in _counters.items() if name.startswith(prefix)}
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+
+
+def log_summary():
+    for name, value in sorted(snapshot().items()):
+        logger.debug(f"Metric {name}: {value}")
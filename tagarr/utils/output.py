@@ -1,67 +1,89 @@
+import csv
+import json
+import sys
+import threading
+
+from collections import Counter
+
+from loguru import logger
 from rich.console import Console
 from rich.table import Table
 from rich.live import Live
 from rich import box
 
 
+LOG_FORMAT = "[{time:YYYY-MM-DD HH:mm:ss}] - <level>{message}</level>"
+
+
+def setup_logging(level, sink=None):
+    """Send the logs of `level` and above to `sink`, stdout by default."""
+    logger.remove()
+    logger.add(sink or sys.stdout, colorize=True, format=LOG_FORMAT, level=level)
+
+
 def print_movies_tagged(movies):
     console = Console()
 
+    # Rendered once: a live table redraws every row it already has on each new one
     table = Table(show_footer=False, row_styles=["none", "dim"], box=box.MINIMAL, pad_edge=False)
-    with Live(table, console=console, screen=False):
-        table.add_column("Title")
-        table.add_column("Providers Tagged")
+    table.add_column("Title")
+    table.add_column("Providers Tagged")
 
-        for _, movie in movies.items():
-            title = movie["title"]
-            providers = ", ".join(movie["providers"])
+    for _, movie in movies.items():
+        title = movie["title"]
+        providers = ", ".join(movie["providers"])
 
-            table.add_row(title, providers)
+        table.add_row(title, providers)
+
+    console.print(table)
 
 
 def print_series_tagged(series):
     console = Console()
 
     table = Table(show_footer=False, row_styles=["none", "dim"], box=box.MINIMAL, pad_edge=False)
-    with Live(table, console=console, screen=False):
-        table.add_column("Title")
-        table.add_column("Providers Tagged")
+    table.add_column("Title")
+    table.add_column("Providers Tagged")
 
-        for _, serie in series.items():
-            title = serie["title"]
-            providers = ", ".join(serie["providers"])
+    for _, serie in series.items():
+        title = serie["title"]
+        providers = ", ".join(serie["providers"])
 
-            table.add_row(title, providers)
+        table.add_row(title, providers)
+
+    console.print(table)
 
 
 def print_movies_cleaned(movies):
     console = Console()
 
     table = Table(show_footer=False, row_styles=["none", "dim"], box=box.MINIMAL, pad_edge=False)
-    with Live(table, console=console, screen=False):
-        table.add_column("Title")
-        table.add_column("Tags Removed")
+    table.add_column("Title")
+    table.add_column("Tags Removed")
 
-        for _, movie in movies.items():
-            title = movie["title"]
-            tags_removed = ", ".join(movie["tags_removed"])
+    for _, movie in movies.items():
+        title = movie["title"]
+        tags_removed = ", ".join(movie["tags_removed"])
 
-            table.add_row(title, tags_removed)
+        table.add_row(title, tags_removed)
+
+    console.print(table)
 
 
 def print_series_cleaned(series):
     console = Console()
 
     table = Table(show_footer=False, row_styles=["none", "dim"], box=box.MINIMAL, pad_edge=False)
-    with Live(table, console=console, screen=False):
-        table.add_column("Title")
-        table.add_column("Tags Removed")
+    table.add_column("Title")
+    table.add_column("Tags Removed")
 
-        for _, serie in series.items():
-            title = serie["title"]
-            tags_removed = ", ".join(serie["tags_removed"])
+    for _, serie in series.items():
+        title = serie["title"]
+        tags_removed = ", ".join(serie["tags_removed"])
 
-            table.add_row(title, tags_removed)
+        table.add_row(title, tags_removed)
+
+    console.print(table)
 
 
 def print_providers(providers):
@@ -77,3 +99,177 @@ def print_providers(providers):
             clear_name = provider["clear_name"]
 
             table.add_row(id, clear_name)
+
+
+def print_profile_summary(profiler):
+    console = Console(stderr=True)
+
+    waiting = max(profiler.wall_time - profiler.cpu_time, 0.0)
+    share = (waiting / profiler.wall_time * 100) if profiler.wall_time else 0.0
+
+    table = Table(show_header=False, box=box.MINIMAL, pad_edge=False)
+    table.add_column("Metric")
+    table.add_column("Value")
+
+    table.add_row("Wall time", f"{profiler.wall_time:.2f}s")
+    table.add_row("CPU time", f"{profiler.cpu_time:.2f}s")
+    table.add_row("Waiting (I/O)", f"{waiting:.2f}s ({share:.0f}%)")
+    for path in profiler.files:
+        table.add_row("Written", str(path))
+
+    console.print(table)
+
+
+def print_slowest_titles(spans):
+    console = Console(stderr=True)
+
+    table = Table(show_footer=False, row_styles=["none", "dim"], box=box.MINIMAL, pad_edge=False)
+    table.add_column("Title")
+    table.add_column("Seconds", justify="right")
+    table.add_column("Requests", justify="right")
+    table.add_column("Breakdown")
+
+    for span in spans:
+        breakdown = ", ".join(
+            f"{phase} {values['seconds']:.2f}s/{values['requests']}"
+            for phase, values in sorted(
+                span.phases.items(), key=lambda item: item[1]["seconds"], reverse=True
+            )
+        )
+
+        table.add_row(span.title, f"{span.duration:.2f}", str(span.requests), breakdown)
+
+    console.print("\nSlowest titles:")
+    console.print(table)
+
+
+def print_plan_counts(plan):
+    console = Console()
+
+    counts = ", ".join(
+        f"{plan.counts[action]} {label}"
+        for action, label in [
+            ("add", "to add"),
+            ("remove", "to remove"),
+            ("update", "to update"),
+            ("noop", "up to date"),
+        ]
+    )
+
+    console.print(f"Plan: {counts}.")
+
+
+def print_changes(changes):
+    console = Console()
+
+    table = Table(show_footer=False, row_styles=["none", "dim"], box=box.MINIMAL, pad_edge=False)
+    table.add_column("Title")
+    table.add_column("Tags Added")
+    table.add_column("Tags Removed")
+
+    for change in changes:
+        table.add_row(change.title, ", ".join(change.add), ", ".join(change.remove))
+
+    console.print(table)
+
+
+def print_records(records, columns, output_format="table"):
+    """
+    Print dict records as a table, a JSON array or CSV. `columns` are
+    (key, heading) pairs; list values are joined in tables and CSV.
+    """
+    if output_format == "json":
+        print(
+            json.dumps(
+                [{key: record[key] for key, _ in columns} for record in records], ensure_ascii=False
+            )
+        )
+        return
+
+    if output_format == "csv":
+        writer = RecordWriter(columns, output_format)
+        writer.header()
+        for record in records:
+            writer.write(record)
+        return
+
+    console = Console()
+
+    table = Table(show_footer=False, row_styles=["none", "dim"], box=box.MINIMAL, pad_edge=False)
+    for _, heading in columns:
+        table.add_column(heading)
+
+    for record in records:
+        table.add_row(*[_join(record[key]) for key, _ in columns])
+
+    console.print(table)
+
+
+class RecordWriter:
+    """
+    Write dict records to stdout as they come, one JSON object per line
+    (`jsonl`) or one CSV row (`csv`). Every record is flushed, so forked
+    shard processes can share the output.
+    """
+
+    def __init__(self, columns, output_format="jsonl"):
+        self.columns = columns
+        self.output_format = output_format
+        self._csv = csv.writer(sys.stdout) if output_format == "csv" else None
+
+        # Changes are planned while the writer thread applies them
+        self._lock = threading.Lock()
+
+    def header(self):
+        """Write the CSV header row, once per output."""
+        if self._csv is not None:
+            self._csv.writerow([key for key, _ in self.columns])
+            sys.stdout.flush()
+
+    def write(self, record):
+        with self._lock:
+            if self._csv is not None:
+                self._csv.writerow([_join(record[key]) for key, _ in self.columns])
+            else:
+                values = {key: record[key] for key, _ in self.columns}
+                sys.stdout.write(json.dumps(values, ensure_ascii=False) + "\n")
+            sys.stdout.flush()
+
+
+CHANGE_COLUMNS = [
+    ("instance", "Instance"),
+    ("id", "ID"),
+    ("title", "Title"),
+    ("action", "Action"),
+    ("add", "Tags Added"),
+    ("remove", "Tags Removed"),
+]
+
+
+def change_record(instance, change):
+    return {
+        "instance": instance,
+        "id": change.arr_id,
+        "title": change.title,
+        "action": change.action,
+        "add": change.add,
+        "remove": change.remove,
+    }
+
+
+def print_change_summary(plan):
+    """Print how many items each tag was added to and removed from."""
+    console = Console()
+
+    added = Counter(label for change in plan.changes for label in change.add)
+    removed = Counter(label for change in plan.changes for label in change.remove)
+
+    for label in sorted(set(added) | set(removed)):
+        console.print(f"{label}: {added[label]} added, {removed[label]} removed.")
+
+
+def _join(value):
+    if isinstance(value, (list, tuple)):
+        return ", ".join(str(item) for item in value)
+
+    return "" if value is None else str(value)
@@ -0,0 +1,62 @@
+"""
+Resolve-and-write pipeline of `tag` and `clean` runs.
+
+The items are produced (resolved on JustWatch) in the calling thread, so the
+progress bar keeps working, and written to Radarr/Sonarr by a writer thread
+as soon as they are ready. The queue between both is bounded: when writes
+fall behind, producing waits, so at most `queue_size` results are held in
+memory at any time.
+"""
+
+import queue
+import threading
+
+from loguru import logger
+
+
+DEFAULT_QUEUE_SIZE = 100
+
+_DONE = object()
+
+
+def run(items, write, queue_size=DEFAULT_QUEUE_SIZE):
+    """Call `write(item)` for every item of the `items` iterable while it is still being produced."""
+    pending = queue.Queue(maxsize=queue_size)
+    cancelled = threading.Event()
+    errors = []
+
+    def writer():
+        while True:
+            item = pending.get()
+            if item is _DONE:
+                return
+
+            # After an error or an interruption the queued items are dropped
+            if cancelled.is_set():
+                continue
+
+            try:
+                write(item)
+            except Exception as e:
+                errors.append(e)
+                cancelled.set()
+
+    thread = threading.Thread(target=writer, name="tagarr-writer", daemon=True)
+    thread.start()
+
+    try:
+        for item in items:
+            if cancelled.is_set():
+                break
+
+            pending.put(item)
+    except BaseException:
+        cancelled.set()
+        raise
+    finally:
+        pending.put(_DONE)
+        thread.join()
+
+    if errors:
+        logger.error(f"Writing stopped after an error: {errors[0]}")
+        raise errors[0]
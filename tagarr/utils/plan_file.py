@@ -0,0 +1,105 @@
+"""
+Plan files, written by `tagarr radarr|sonarr plan` and read by `apply`.
+
+A plan file is JSON Lines, gzip compressed when its name ends with `.gz`.
+The first line is a header with the format version and the service, instance
+and command the plan was made for; every other line is one planned change:
+
+    {"plan": 1, "service": "radarr", "instance": "4k", "command": "tag", "url": "http://radarr:7878", ...}
+    {"id": 12, "title": "The Batman", "tags": [1, 4], "add": ["netflix"], "remove": []}
+
+`tags` are the tag IDs the item had when it was planned, so `apply` can tell
+whether it changed since. Changes are written as they are planned and read
+back one at a time; `apply` still keeps them all, grouped by delta, to send
+one editor request per group.
+"""
+
+import gzip
+import json
+import time
+
+from pathlib import Path
+
+from tagarr.core.planner import Change
+
+
+PLAN_VERSION = 1
+
+
+class InvalidPlanFile(Exception):
+    pass
+
+
+def _open(path, mode):
+    if path.suffix == ".gz":
+        return gzip.open(path, mode + "t", encoding="utf-8")
+
+    return open(path, mode, encoding="utf-8")
+
+
+class PlanWriter:
+    def __init__(self, path, service, command, url=None, instance=None):
+        self.path = Path(path)
+        self.header = {
+            "plan": PLAN_VERSION,
+            "service": service,
+            "instance": instance,
+            "command": command,
+            "url": url,
+            "created": int(time.time()),
+        }
+        self.changes = 0
+        self._file = None
+
+    def __enter__(self):
+        self._file = _open(self.path, "w")
+        self._write(self.header)
+        return self
+
+    def __exit__(self, *exc):
+        self._file.close()
+        self._file = None
+
+    def _write(self, entry):
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def write(self, change):
+        self._write(change.to_dict())
+        self.changes += 1
+
+
+class PlanReader:
+    """Iterate the changes of a plan file. The header is read and checked on creation."""
+
+    def __init__(self, path, service):
+        self.path = Path(path)
+
+        with _open(self.path, "r") as _file:
+            try:
+                self.header = json.loads(_file.readline())
+            except ValueError:
+                self.header = None
+
+        if not isinstance(self.header, dict) or "plan" not in self.header:
+            raise InvalidPlanFile(f"{self.path} is not a plan file")
+        if self.header["plan"] != PLAN_VERSION:
+            raise InvalidPlanFile(
+                f"{self.path} has an unsupported plan version: {self.header['plan']}"
+            )
+        if self.header.get("service") != service:
+            raise InvalidPlanFile(
+                f"{self.path} is a plan for {self.header.get('service')}, not {service}"
+            )
+
+    def __iter__(self):
+        with _open(self.path, "r") as _file:
+            _file.readline()
+
+            for number, line in enumerate(_file, start=2):
+                if not line.strip():
+                    continue
+
+                try:
+                    yield Change.from_dict(json.loads(line))
+                except (ValueError, KeyError) as e:
+                    raise InvalidPlanFile(f"{self.path}, line {number}: {e}")
@@ -0,0 +1,134 @@
+"""
+Profiling of a complete CLI run.
+
+Two profilers run side by side:
+
+- cProfile traces the main thread deterministically and is written as a
+  pstats file (`<path>.pstats`), readable with `python -m pstats` or snakeviz.
+- A sampling thread snapshots the stack of every thread at a fixed interval
+  and writes flame graph compatible collapsed stacks. Every sample counts
+  towards wall time (`<path>.wall.collapsed`); samples where the thread
+  actually consumed CPU since the previous snapshot also count towards CPU
+  time (`<path>.cpu.collapsed`). The difference between both graphs is
+  time spent waiting, mostly on the network.
+"""
+
+import cProfile
+import sys
+import threading
+import time
+
+from collections import Counter
+from pathlib import Path
+
+from loguru import logger
+
+
+DEFAULT_PATH = "tagarr-profile"
+
+
+def _thread_cpu_time(thread_id):
+    try:
+        return time.clock_gettime(time.pthread_getcpuclockid(thread_id))
+    except (AttributeError, OSError):
+        return None
+
+
+def _collapse(frame):
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append(f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+        frame = frame.f_back
+
+    return ";".join(reversed(stack))
+
+
+class StackSampler(threading.Thread):
+    def __init__(self, interval):
+        super().__init__(name="tagarr-profiler", daemon=True)
+        self.interval = interval
+        self.wall_stacks = Counter()
+        self.cpu_stacks = Counter()
+        self.cpu_supported = True
+        self._stopped = threading.Event()
+        self._cpu_times = {}
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == self.ident:
+                continue
+
+            stack = f"{names.get(thread_id, thread_id)};{_collapse(frame)}"
+            self.wall_stacks[stack] += 1
+
+            cpu_time = _thread_cpu_time(thread_id)
+            if cpu_time is None:
+                self.cpu_supported = False
+                continue
+
+            previous = self._cpu_times.get(thread_id, cpu_time)
+            self._cpu_times[thread_id] = cpu_time
+
+            # The thread was on CPU for most of the interval
+            if cpu_time - previous >= self.interval / 2:
+                self.cpu_stacks[stack] += 1
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+
+class Profiler:
+    def __init__(self, path=DEFAULT_PATH, interval=0.005):
+        base = Path(path)
+        if base.suffix in (".prof", ".pstats"):
+            base = base.with_suffix("")
+
+        self.pstats_path = Path(f"{base}.pstats")
+        self.wall_path = Path(f"{base}.wall.collapsed")
+        self.cpu_path = Path(f"{base}.cpu.collapsed")
+
+        self.profile = cProfile.Profile()
+        self.sampler = StackSampler(interval)
+        self.wall_time = 0.0
+        self.cpu_time = 0.0
+
+    def start(self):
+        logger.debug(f"Starting profiler, writing to {self.pstats_path}")
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.process_time()
+        self.sampler.start()
+        self.profile.enable()
+
+    def stop(self):
+        self.profile.disable()
+        self.sampler.stop()
+        self.wall_time = time.perf_counter() - self._wall_start
+        self.cpu_time = time.process_time() - self._cpu_start
+
+        self.profile.dump_stats(self.pstats_path)
+        self._write_collapsed(self.wall_path, self.sampler.wall_stacks)
+        if self.sampler.cpu_supported:
+            self._write_collapsed(self.cpu_path, self.sampler.cpu_stacks)
+        else:
+            logger.warning("Per-thread CPU clocks are not available, skipping the CPU flame graph")
+
+    @staticmethod
+    def _write_collapsed(path, stacks):
+        with open(path, "w") as _file:
+            for stack, count in stacks.most_common():
+                _file.write(f"{stack} {count}\n")
+
+    @property
+    def files(self):
+        files = [self.pstats_path, self.wall_path]
+        if self.sampler.cpu_supported:
+            files.append(self.cpu_path)
+        return files
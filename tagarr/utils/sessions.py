@@ -0,0 +1,58 @@
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from tagarr.utils import budget, fixtures, tracing
+
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter that applies a default timeout to requests sent without one."""
+
+    def __init__(self, *args, timeout=None, **kwargs):
+        self.timeout = timeout
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        return super().send(request, **kwargs)
+
+
+def prepare_session(session, budgeted=True):
+    """
+    Apply the run-wide HTTP settings to a requests session. Every client
+    (JustWatch, TMDB and the Arr clients) passes its session through here
+    once its own adapters are mounted. The requests of `budgeted` sessions
+    count against the request budget of the run.
+    """
+    fixtures.install(session)
+    session.hooks["response"].append(tracing.count_request)
+    if budgeted:
+        session.hooks["response"].append(budget.count_request)
+
+    return session
+
+
+def configure_arr_session(session, verify_ssl=True, timeout=30, retries=3, pool_size=10):
+    """
+    Setup the session of a Radarr/Sonarr client: a keep-alive pool of
+    `pool_size` connections, a per-request timeout and retries with
+    exponential backoff on 5xx responses. Only idempotent methods are
+    retried, so a tag is never created twice.
+    """
+    retry = Retry(
+        total=retries,
+        backoff_factor=0.5,
+        status_forcelist=[500, 502, 503, 504],
+        allowed_methods=["GET", "PUT", "DELETE"],
+        raise_on_status=False,
+    )
+    adapter = TimeoutHTTPAdapter(
+        timeout=timeout, max_retries=retry, pool_connections=1, pool_maxsize=pool_size
+    )
+
+    session.verify = verify_ssl
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    # Arr requests are bounded by the library, only the lookups are budgeted
+    return prepare_session(session, budgeted=False)
@@ -0,0 +1,139 @@
+"""
+Library sharding, to split a run over several processes or hosts.
+
+`--shard I/N` makes a run handle only the library items whose Arr ID hashes
+to slice I of N. The hash is stable, so the same item always falls in the
+same shard and N runs with I = 1..N cover the library exactly once, e.g. one
+per cron host. `--workers N` does the same on one host: it forks N shard
+processes and merges what they did.
+
+Shards share the Arr tags. A tag is created under `TagLock`, a file lock in
+the data directory, after re-reading the tags, so a tag another shard just
+created is reused instead of created again. The lock coordinates the
+processes of one host; between hosts the re-read leaves only the moment
+between reading and creating the tag.
+
+Only the metrics of the workers are merged back. The HTTP recording, the
+trace and the profile of a run live in the process that started them, so
+those options are refused with `--workers`.
+"""
+
+import hashlib
+import threading
+
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+
+import tagarr.utils.metrics as metrics
+import tagarr.utils.store as store
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+# Options of the run that a forked worker cannot hand back to the parent
+_single_process_options = []
+
+
+def set_single_process_options(options):
+    """Set the options of the run that rule out `--workers`."""
+    global _single_process_options
+    _single_process_options = list(options)
+
+
+def check_workers(count):
+    """Raise ValueError if `count` worker processes cannot be used with the options of the run."""
+    if count > 1 and _single_process_options:
+        raise ValueError(f"--workers cannot be combined with {', '.join(_single_process_options)}")
+
+
+class Shard:
+    def __init__(self, index, count):
+        self.index = index
+        self.count = count
+
+    @classmethod
+    def parse(cls, value):
+        """Parse an "I/N" shard, with I counted from 1."""
+        try:
+            index, count = (int(part) for part in value.split("/"))
+        except ValueError:
+            raise ValueError(f"'{value}' is not a shard, use I/N, e.g. 1/3")
+
+        if count < 1 or not 1 <= index <= count:
+            raise ValueError(f"'{value}' is not a shard, I must be between 1 and N")
+
+        return cls(index, count)
+
+    def __contains__(self, arr_id):
+        digest = hashlib.sha1(str(arr_id).encode("utf-8")).digest()
+        return int.from_bytes(digest[:8], "big") % self.count == self.index - 1
+
+    def __str__(self):
+        return f"{self.index}/{self.count}"
+
+    def filter(self, items):
+        """Keep the Arr objects in this shard."""
+        return [item for item in items if item["id"] in self]
+
+
+class TagLock:
+    """Lock held while a tag is created, shared by the threads and shard processes of a host."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._file = None
+
+    def __enter__(self):
+        self._lock.acquire()
+
+        if fcntl is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.path, "a")
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+
+        return self
+
+    def __exit__(self, *exc):
+        if self._file is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+
+        self._lock.release()
+
+
+def _run_shard(target, shard, kwargs):
+    # The counters inherited from the parent, or from an earlier shard of this process
+    metrics.reset()
+    try:
+        result = target(shard=shard, **kwargs)
+    finally:
+        store.close_all()
+
+    return result, metrics.snapshot()
+
+
+def run_workers(target, count, **kwargs):
+    """
+    Call `target(shard=..., **kwargs)` for every shard of `count` in its own
+    forked process. Return the results in shard order; the metrics of the
+    workers are added to the ones of this process.
+    """
+    shards = [Shard(index, count) for index in range(1, count + 1)]
+
+    with ProcessPoolExecutor(max_workers=count, mp_context=get_context("fork")) as executor:
+        futures = [executor.submit(_run_shard, target, shard, kwargs) for shard in shards]
+        outcomes = [future.result() for future in futures]
+
+    results = []
+    for result, counters in outcomes:
+        for name, value in counters.items():
+            metrics.increment(name, value)
+        results.append(result)
+
+    return results
@@ -0,0 +1,415 @@
+"""
+Local state that survives between runs, kept in a single SQLite database in
+the configured data directory.
+
+A process opens the database once: `open_store` hands the same `Store` to
+every instance of a run, and `close_all` closes it when the run ends.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from pathlib import Path
+
+from loguru import logger
+
+
+DATABASE_NAME = "tagarr.db"
+
+# Availability masks are stored as signed 64-bit SQLite integers
+MAX_PROVIDERS = 63
+
+
+class TooManyProviders(ValueError):
+    pass
+
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS cache (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL,
+        expires REAL NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS id_map (
+        media_type TEXT NOT NULL,
+        source TEXT NOT NULL,
+        external_id TEXT NOT NULL,
+        tmdb_id INTEGER NOT NULL,
+        PRIMARY KEY (media_type, source, external_id)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS resolutions (
+        instance TEXT NOT NULL,
+        arr_id INTEGER NOT NULL,
+        fingerprint TEXT NOT NULL,
+        jw_id TEXT NOT NULL,
+        step TEXT NOT NULL,
+        updated REAL NOT NULL,
+        PRIMARY KEY (instance, arr_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS checks (
+        instance TEXT NOT NULL,
+        arr_id INTEGER NOT NULL,
+        fingerprint TEXT NOT NULL,
+        outcome TEXT NOT NULL,
+        jw_id TEXT,
+        failures INTEGER NOT NULL,
+        next_check REAL NOT NULL,
+        PRIMARY KEY (instance, arr_id)
+    )
+    """,
+    # Every provider gets a bit for good, so stored masks stay comparable
+    # between runs with other provider sets. SQLite integers hold 63 of them.
+    """
+    CREATE TABLE IF NOT EXISTS providers (
+        provider_id INTEGER PRIMARY KEY,
+        bit INTEGER NOT NULL UNIQUE,
+        name TEXT NOT NULL
+    )
+    """,
+    # `mask` is the availability of the title on the `providers` it was checked for
+    """
+    CREATE TABLE IF NOT EXISTS availability (
+        instance TEXT NOT NULL,
+        arr_id INTEGER NOT NULL,
+        title TEXT NOT NULL,
+        jw_id TEXT,
+        mask INTEGER NOT NULL,
+        providers INTEGER NOT NULL,
+        tags TEXT NOT NULL,
+        checked REAL NOT NULL,
+        PRIMARY KEY (instance, arr_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS availability_changes (
+        instance TEXT NOT NULL,
+        arr_id INTEGER NOT NULL,
+        title TEXT NOT NULL,
+        provider_id INTEGER NOT NULL,
+        change TEXT NOT NULL,
+        changed REAL NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS availability_changes_changed ON availability_changes (changed)",
+]
+
+
+class Store:
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        logger.debug(f"Opening local store: {self.path}")
+        # Shard processes share the database, wait for each other's writes
+        self.connection = sqlite3.connect(
+            self.path, timeout=30, check_same_thread=False, isolation_level=None
+        )
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        # Every write is its own transaction, don't wait for the disk on each commit
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self._lock = threading.Lock()
+
+        with self._lock:
+            for statement in SCHEMA:
+                self.connection.execute(statement)
+
+    def close(self):
+        _stores.pop((self.path, os.getpid()), None)
+
+        with self._lock:
+            self.connection.close()
+
+    def execute(self, statement, parameters=()):
+        with self._lock:
+            return self.connection.execute(statement, parameters).fetchall()
+
+    def executemany(self, statement, rows):
+        """Run `statement` for every row in a single transaction."""
+        with self._lock:
+            self.connection.execute("BEGIN")
+            try:
+                self.connection.executemany(statement, rows)
+            except Exception:
+                self.connection.execute("ROLLBACK")
+                raise
+            self.connection.execute("COMMIT")
+
+    def get_cached(self, key):
+        """Return the cached JSON value for `key`, or None when missing or expired."""
+        rows = self.execute("SELECT value, expires FROM cache WHERE key = ?", (key,))
+        if not rows or rows[0][1] < time.time():
+            return None
+
+        return json.loads(rows[0][0])
+
+    def set_cached(self, key, value, ttl):
+        self.execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)",
+            (key, json.dumps(value), time.time() + ttl),
+        )
+
+    def add_id_mappings(self, mappings):
+        """Store (media_type, source, external_id, tmdb_id) tuples, replacing known ids."""
+        self.executemany(
+            "INSERT OR REPLACE INTO id_map (media_type, source, external_id, tmdb_id) "
+            "VALUES (?, ?, ?, ?)",
+            mappings,
+        )
+
+    def get_tmdb_id(self, media_type, source, external_id):
+        """Return the TMDB id mapped to a TVDB/IMDB id, or None when unknown."""
+        rows = self.execute(
+            "SELECT tmdb_id FROM id_map WHERE media_type = ? AND source = ? AND external_id = ?",
+            (media_type, source, str(external_id)),
+        )
+
+        return rows[0][0] if rows else None
+
+    def count_id_mappings(self):
+        return self.execute("SELECT COUNT(*) FROM id_map")[0][0]
+
+    def get_resolution(self, instance, arr_id, fingerprint):
+        """
+        Return (jw_id, step) for an Arr item resolved by an earlier run, or None.
+        A resolution made for other external IDs (`fingerprint`) is ignored.
+        """
+        rows = self.execute(
+            "SELECT jw_id, step FROM resolutions WHERE instance = ? AND arr_id = ? AND fingerprint = ?",
+            (instance, arr_id, fingerprint),
+        )
+
+        return tuple(rows[0]) if rows else None
+
+    def set_resolution(self, instance, arr_id, fingerprint, jw_id, step):
+        self.execute(
+            "INSERT OR REPLACE INTO resolutions (instance, arr_id, fingerprint, jw_id, step, updated) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (instance, arr_id, fingerprint, jw_id, step, time.time()),
+        )
+
+    def delete_resolution(self, instance, arr_id):
+        self.execute(
+            "DELETE FROM resolutions WHERE instance = ? AND arr_id = ?", (instance, arr_id)
+        )
+
+    def get_check(self, instance, arr_id):
+        """Return (fingerprint, outcome, jw_id, failures, next_check) of an item, or None."""
+        rows = self.execute(
+            "SELECT fingerprint, outcome, jw_id, failures, next_check FROM checks "
+            "WHERE instance = ? AND arr_id = ?",
+            (instance, arr_id),
+        )
+
+        return tuple(rows[0]) if rows else None
+
+    def set_check(self, instance, arr_id, fingerprint, outcome, jw_id, failures, next_check):
+        self.execute(
+            "INSERT OR REPLACE INTO checks "
+            "(instance, arr_id, fingerprint, outcome, jw_id, failures, next_check) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (instance, arr_id, fingerprint, outcome, jw_id, failures, next_check),
+        )
+
+    def delete_check(self, instance, arr_id):
+        self.execute("DELETE FROM checks WHERE instance = ? AND arr_id = ?", (instance, arr_id))
+
+    def provider_bits(self, providers):
+        """
+        Return the bit of every provider of `providers` (provider ID -> name),
+        assigning new ones. When no bit is left, the bits of the providers that
+        no stored availability was checked for are freed for them first.
+        Raise TooManyProviders if there are still too few.
+        """
+        with self._lock:
+            missing = self._assign_bits(providers)
+            if missing:
+                self._free_bits(providers)
+                missing = self._assign_bits(providers)
+
+        if missing:
+            raise TooManyProviders(
+                f"The local store can keep the availability of at most {MAX_PROVIDERS} providers, "
+                f"there is no bit left for {', '.join(missing)}"
+            )
+
+        rows = self.execute("SELECT provider_id, bit FROM providers")
+        return {provider_id: bit for provider_id, bit in rows if provider_id in providers}
+
+    def _assign_bits(self, providers):
+        """Give new providers the lowest free bit, return the names of those left without one."""
+        for provider_id, name in providers.items():
+            # One statement, so shard processes never hand out the same bit twice
+            self.connection.execute(
+                "WITH RECURSIVE bits(bit) AS "
+                "(SELECT 0 UNION ALL SELECT bit + 1 FROM bits WHERE bit + 1 < ?) "
+                "INSERT OR IGNORE INTO providers (provider_id, bit, name) "
+                "SELECT ?, bit, ? FROM bits WHERE bit NOT IN (SELECT bit FROM providers) "
+                "ORDER BY bit LIMIT 1",
+                (MAX_PROVIDERS, provider_id, name),
+            )
+
+        assigned = {
+            provider_id
+            for (provider_id,) in self.connection.execute("SELECT provider_id FROM providers")
+        }
+        return [name for provider_id, name in providers.items() if provider_id not in assigned]
+
+    def _free_bits(self, providers):
+        """Drop the providers, other than `providers`, whose bit no stored availability uses."""
+        keep = list(providers)
+        freed = self.connection.execute(
+            "DELETE FROM providers "
+            f"WHERE provider_id NOT IN ({', '.join('?' for _ in keep)}) "
+            "AND NOT EXISTS (SELECT 1 FROM availability a WHERE a.providers & (1 << providers.bit))",
+            keep,
+        ).rowcount
+        logger.debug(f"Freed the bits of {freed} providers without stored availability")
+
+    def get_providers(self):
+        """Return (provider_id, bit, name) of every provider ever checked."""
+        return self.execute("SELECT provider_id, bit, name FROM providers ORDER BY name")
+
+    def get_availability(self, instance, arr_id):
+        """Return (mask, providers, checked) stored for an Arr item, or None."""
+        rows = self.execute(
+            "SELECT mask, providers, checked FROM availability WHERE instance = ? AND arr_id = ?",
+            (instance, arr_id),
+        )
+
+        return tuple(rows[0]) if rows else None
+
+    def get_checked(self, instance):
+        """Return Arr ID -> time of the last availability check of every item of an instance."""
+        return dict(
+            self.execute("SELECT arr_id, checked FROM availability WHERE instance = ?", (instance,))
+        )
+
+    def set_availability(self, instance, arr_id, title, jw_id, mask, providers, tags, changes=()):
+        """Store the availability of an Arr item and its (provider_id, change) changes in one transaction."""
+        now = time.time()
+
+        with self._lock:
+            self.connection.execute("BEGIN")
+            try:
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO availability "
+                    "(instance, arr_id, title, jw_id, mask, providers, tags, checked) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (instance, arr_id, title, jw_id, mask, providers, json.dumps(tags), now),
+                )
+                self.connection.executemany(
+                    "INSERT INTO availability_changes (instance, arr_id, title, provider_id, change, changed) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    [
+                        (instance, arr_id, title, provider_id, change, now)
+                        for provider_id, change in changes
+                    ],
+                )
+            except Exception:
+                self.connection.execute("ROLLBACK")
+                raise
+            self.connection.execute("COMMIT")
+
+    def set_availability_tags(self, instance, tags):
+        """Replace the stored tags of Arr items once written, `tags` maps their Arr IDs to tag labels."""
+        self.executemany(
+            "UPDATE availability SET tags = ? WHERE instance = ? AND arr_id = ?",
+            [(json.dumps(sorted(labels)), instance, arr_id) for arr_id, labels in tags.items()],
+        )
+
+    @staticmethod
+    def _instance_filter(instance, column="instance"):
+        """An instance key, or a service or instance prefix: "radarr" matches every Radarr instance."""
+        return f"({column} = ? OR {column} LIKE ?)", [instance, f"{instance}-%"]
+
+    def query_availability(self, instance=None, provider_mask=0, no_provider=False, tag=None):
+        """
+        Return (instance, arr_id, title, mask, providers, tags, checked) of the
+        stored titles on any provider of `provider_mask`, or on none of the
+        providers they were checked for with `no_provider`.
+        """
+        conditions, parameters = [], []
+
+        if instance:
+            condition, values = self._instance_filter(instance)
+            conditions.append(condition)
+            parameters.extend(values)
+        if provider_mask:
+            conditions.append("mask & ? != 0")
+            parameters.append(provider_mask)
+        if no_provider:
+            conditions.append("mask & providers = 0")
+        if tag:
+            conditions.append("EXISTS (SELECT 1 FROM json_each(tags) WHERE value = ?)")
+            parameters.append(tag)
+
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        rows = self.execute(
+            "SELECT instance, arr_id, title, mask, providers, tags, checked FROM availability"
+            f"{where} ORDER BY instance, title",
+            parameters,
+        )
+
+        return [row[:5] + (json.loads(row[5]), row[6]) for row in rows]
+
+    def query_changes(self, since, instance=None, provider_ids=None, change=None, tag=None):
+        """Return (changed, instance, arr_id, title, provider, change) of the availability changes after `since`."""
+        conditions, parameters = ["c.changed >= ?"], [since]
+
+        if instance:
+            condition, values = self._instance_filter(instance, "c.instance")
+            conditions.append(condition)
+            parameters.extend(values)
+        if provider_ids:
+            conditions.append(f"c.provider_id IN ({', '.join('?' for _ in provider_ids)})")
+            parameters.extend(provider_ids)
+        if change:
+            conditions.append("c.change = ?")
+            parameters.append(change)
+        if tag:
+            conditions.append(
+                "EXISTS (SELECT 1 FROM availability a, json_each(a.tags) "
+                "WHERE a.instance = c.instance AND a.arr_id = c.arr_id AND json_each.value = ?)"
+            )
+            parameters.append(tag)
+
+        return self.execute(
+            "SELECT c.changed, c.instance, c.arr_id, c.title, "
+            "COALESCE(p.name, 'provider ' || c.provider_id), c.change "
+            "FROM availability_changes c LEFT JOIN providers p ON p.provider_id = c.provider_id "
+            f"WHERE {' AND '.join(conditions)} ORDER BY c.changed DESC, c.title",
+            parameters,
+        )
+
+
+# Stores opened by each process, by (path, pid): forked workers open their own
+_stores = {}
+
+
+def open_store(data_dir):
+    """The store in `data_dir`, opened once per process."""
+    path = Path(data_dir).expanduser() / DATABASE_NAME
+    key = (path, os.getpid())
+
+    if key not in _stores:
+        _stores[key] = Store(path)
+
+    return _stores[key]
+
+
+def close_all():
+    """Close the stores opened by this process."""
+    pid = os.getpid()
+    for path, store_pid in list(_stores):
+        if store_pid == pid:
+            _stores[(path, store_pid)].close()
@@ -0,0 +1,158 @@
+"""
+Per-title trace spans.
+
+While tracing is enabled every library item gets a span that accumulates
+the time and HTTP requests spent in each phase of its processing (search,
+candidate detail fetches, season fetches, TMDB fallback and the write).
+The spans are written as JSON lines when the run ends.
+
+When tracing is disabled `item()` and `phase()` return no-op contexts.
+"""
+
+import json
+import threading
+import time
+
+from contextlib import contextmanager, nullcontext
+
+from loguru import logger
+
+
+_tracer = None
+
+
+class Span:
+    def __init__(self, service, item_id, title):
+        self.service = service
+        self.item_id = item_id
+        self.title = title
+        self.start = time.time()
+        self.duration = 0.0
+        self.requests = 0
+        self.phases = {}
+        self.attributes = {}
+
+    def add(self, phase, seconds=0.0, requests=0):
+        entry = self.phases.setdefault(phase, {"seconds": 0.0, "requests": 0})
+        entry["seconds"] += seconds
+        entry["requests"] += requests
+
+    def to_dict(self):
+        data = {
+            "service": self.service,
+            "id": self.item_id,
+            "title": self.title,
+            "start": round(self.start, 3),
+            "duration": round(self.duration, 4),
+            "requests": self.requests,
+            "phases": {
+                phase: {"seconds": round(values["seconds"], 4), "requests": values["requests"]}
+                for phase, values in self.phases.items()
+            },
+        }
+        data.update(self.attributes)
+
+        return data
+
+
+class Tracer:
+    def __init__(self, path):
+        self.path = path
+        self.spans = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def item(self, service, item_id, title):
+        """Open the span of a library item. Re-entering it later adds to the same span."""
+        key = (service, item_id)
+        with self._lock:
+            span = self.spans.get(key)
+            if span is None:
+                span = self.spans[key] = Span(service, item_id, title)
+
+        previous = getattr(self._local, "span", None)
+        self._local.span = span
+        start = time.perf_counter()
+        try:
+            yield span
+        finally:
+            span.duration += time.perf_counter() - start
+            self._local.span = previous
+
+    @contextmanager
+    def phase(self, name):
+        span = getattr(self._local, "span", None)
+        if span is None:
+            yield
+            return
+
+        previous = getattr(self._local, "phase", None)
+        self._local.phase = name
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            span.add(name, seconds=time.perf_counter() - start)
+            self._local.phase = previous
+
+    def annotate(self, **attributes):
+        span = getattr(self._local, "span", None)
+        if span is not None:
+            span.attributes.update(attributes)
+
+    def count_request(self):
+        span = getattr(self._local, "span", None)
+        if span is None:
+            return
+
+        span.requests += 1
+        span.add(getattr(self._local, "phase", None) or "other", requests=1)
+
+    def slowest(self, count):
+        return sorted(self.spans.values(), key=lambda span: span.duration, reverse=True)[:count]
+
+    def write(self):
+        with open(self.path, "w") as _file:
+            for span in sorted(self.spans.values(), key=lambda span: span.start):
+                _file.write(json.dumps(span.to_dict(), ensure_ascii=False) + "\n")
+
+        logger.debug(f"Wrote {len(self.spans)} trace spans to {self.path}")
+
+
+def start(path):
+    global _tracer
+    _tracer = Tracer(path)
+    return _tracer
+
+
+def stop():
+    global _tracer
+
+    tracer = _tracer
+    if tracer:
+        tracer.write()
+
+    _tracer = None
+    return tracer
+
+
+def item(service, item_id, title):
+    return _tracer.item(service, item_id, title) if _tracer else nullcontext()
+
+
+def phase(name):
+    return _tracer.phase(name) if _tracer else nullcontext()
+
+
+def annotate(**attributes):
+    """Attach attributes (e.g. the search tier that matched) to the current span."""
+    if _tracer:
+        _tracer.annotate(**attributes)
+
+
+def count_request(response, *args, **kwargs):
+    """Response hook counting every HTTP request against the current span."""
+    if _tracer:
+        _tracer.count_request()
+    return response
@@ -0,0 +1,40 @@
+import pytest
+
+from types import SimpleNamespace
+
+from benchmarks.library import generate_movies, generate_series
+from benchmarks.mock_servers import arr_server, justwatch_server
+from benchmarks.run import _write_config
+
+
+@pytest.fixture
+def no_config(tmp_path, monkeypatch):
+    """Run from an empty home and working directory, so no configfile is found."""
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def library(no_config):
+    """
+    Start the JustWatch and Radarr/Sonarr stand-ins of the benchmarks on a
+    small synthetic library and write a configfile pointing at them.
+    Returns a function taking the service, the library size and extra
+    general settings.
+    """
+    servers = []
+
+    def start(service, size=40, **general):
+        items, catalogue = (generate_movies if service == "radarr" else generate_series)(size)
+        justwatch = justwatch_server(catalogue).start()
+        arr = arr_server("movie" if service == "radarr" else "series", items).start()
+        servers.extend([justwatch, arr])
+
+        _write_config(no_config, service, justwatch.url, arr.url, True, **general)
+        return SimpleNamespace(catalogue=catalogue, justwatch=justwatch, arr=arr)
+
+    yield start
+
+    for server in servers:
+        server.stop()
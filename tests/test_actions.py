@@ -0,0 +1,32 @@
+import pytest
+
+from tagarr.core.radarr_actions import RadarrActions
+from tagarr.core.sonarr_actions import SonarrActions
+
+
+@pytest.mark.parametrize(
+    "service, actions_class, client",
+    [("radarr", RadarrActions, "radarr_client"), ("sonarr", SonarrActions, "sonarr_client")],
+)
+def test_creating_a_tag_leaves_the_cache_being_iterated_alone(
+    library, service, actions_class, client
+):
+    servers = library(service)
+    actions = actions_class(servers.arr.url, "test", "en_US")
+    actions._get_or_create_tag("first")
+
+    arr_client = getattr(actions, client)
+    create_tag = arr_client.create_tag
+    reading = []
+
+    def create_tag_while_reading(label):
+        # Another thread starts reading the freshly loaded cache meanwhile
+        reading.append(iter(actions._tag_cache.items()))
+        next(reading[0])
+        return create_tag(label)
+
+    arr_client.create_tag = create_tag_while_reading
+    tag_id = actions._get_or_create_tag("second")
+    list(reading[0])
+
+    assert actions._get_tag_labels([tag_id]) == ["second"]
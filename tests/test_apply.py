@@ -0,0 +1,90 @@
+import pytest
+import yaml
+
+from typer.testing import CliRunner
+
+from tagarr.core.planner import Change
+from tagarr.core.radarr_actions import RadarrActions
+from tagarr.main import app
+from tagarr.utils.plan_file import PlanWriter
+
+
+runner = CliRunner()
+
+
+def _plan(service):
+    result = runner.invoke(app, [service, "plan", "--out", "plan.jsonl"])
+    assert result.exit_code == 0, result.output
+
+
+@pytest.mark.parametrize("service", ["radarr", "sonarr"])
+def test_apply_twice_counts_the_changes_up_to_date(library, service):
+    servers = library(service)
+    _plan(service)
+
+    result = runner.invoke(app, [service, "apply", "plan.jsonl"])
+    assert result.exit_code == 0, result.output
+    assert "Plan aplicado" in result.output
+
+    # Applying a plan talks to Radarr/Sonarr only
+    servers.justwatch.reset_counts()
+    result = runner.invoke(app, [service, "apply", "plan.jsonl"])
+    assert result.exit_code == 0, result.output
+    assert "Plan aplicado" not in result.output
+    assert "ya estaban al día" in result.output
+    assert not servers.justwatch.requests
+
+
+@pytest.mark.parametrize("service", ["radarr", "sonarr"])
+def test_apply_refuses_a_plan_of_another_instance(library, no_config, service):
+    library(service)
+
+    # Two instances of the same server, the plan is made for the first one
+    config_file = no_config / ".tagarr.yml"
+    config = yaml.safe_load(config_file.read_text())
+    section = config[service]
+    config[service] = [dict(section, name="main"), dict(section, name="4k")]
+    config_file.write_text(yaml.safe_dump(config))
+
+    result = runner.invoke(app, [service, "--instance", "main", "plan", "--out", "plan.jsonl"])
+    assert result.exit_code == 0, result.output
+
+    result = runner.invoke(app, [service, "--instance", "4k", "apply", "plan.jsonl"])
+    assert result.exit_code == 1
+    assert "'main'" in result.output and "'4k'" in result.output
+
+    result = runner.invoke(app, [service, "apply", "plan.jsonl"])
+    assert result.exit_code == 0, result.output
+
+
+def test_apply_again_finishes_a_partly_applied_plan(library, monkeypatch):
+    servers = library("radarr")
+
+    # A movie with a tag the plan removes while adding another one
+    servers.arr.tags[99] = {"id": 99, "label": "old"}
+    movie = next(iter(servers.arr.items.values()))
+    movie["tags"] = [99]
+
+    with PlanWriter("plan.jsonl", "radarr", "tag") as writer:
+        writer.write(Change(movie["id"], movie["title"], [99], add=["netflix"], remove=["old"]))
+
+    edit_tags = RadarrActions._edit_tags
+
+    def fail_removing(self, radarr_ids, labels, apply_tags):
+        if apply_tags == "remove":
+            raise RuntimeError("Radarr is down")
+        return edit_tags(self, radarr_ids, labels, apply_tags)
+
+    monkeypatch.setattr(RadarrActions, "_edit_tags", fail_removing)
+    result = runner.invoke(app, ["radarr", "apply", "plan.jsonl"])
+    assert result.exit_code == 1
+    assert "pero no se eliminaron" in result.output
+
+    netflix = next(tag["id"] for tag in servers.arr.tags.values() if tag["label"] == "netflix")
+    assert set(movie["tags"]) == {99, netflix}
+
+    monkeypatch.setattr(RadarrActions, "_edit_tags", edit_tags)
+    result = runner.invoke(app, ["radarr", "apply", "plan.jsonl"])
+    assert result.exit_code == 0, result.output
+    assert "Plan aplicado" in result.output
+    assert set(movie["tags"]) == {netflix}
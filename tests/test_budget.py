@@ -0,0 +1,117 @@
+import pytest
+
+from datetime import datetime, timezone
+
+from typer.testing import CliRunner
+
+from tagarr.core import priority
+from tagarr.core.radarr_actions import RadarrActions
+from tagarr.main import app
+from tagarr.utils import budget
+
+
+runner = CliRunner()
+
+NOW = 1_000_000_000
+DAY = 86400
+
+
+@pytest.mark.parametrize(
+    "value, seconds", [("45s", 45), ("30m", 1800), (" 12h", 43200), ("2w", 1209600)]
+)
+def test_parse_duration(value, seconds):
+    assert budget.parse_duration(value) == seconds
+
+
+@pytest.mark.parametrize("value", ["12", "h", "1.5h", "-1d", "3y"])
+def test_parse_duration_refuses_other_values(value):
+    with pytest.raises(ValueError, match="is not a duration"):
+        budget.parse_duration(value)
+
+
+def test_request_budget_is_spent_after_its_requests():
+    run_budget = budget.start(requests=2)
+    assert budget.limited()
+
+    budget.count_request(None)
+    assert not budget.exhausted()
+    budget.count_request(None)
+    assert budget.exhausted() and run_budget.spent == "request"
+
+    budget.start()
+    assert not budget.limited() and not budget.exhausted()
+
+
+def test_time_budget_is_spent_at_its_deadline(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(budget.time, "monotonic", lambda: clock[0])
+
+    run_budget = budget.start(seconds=60)
+    clock[0] = 159.0
+    assert not budget.exhausted()
+    clock[0] = 160.0
+    assert budget.exhausted() and run_budget.spent == "time"
+    budget.start()
+
+
+def _added(days_ago):
+    return datetime.fromtimestamp(NOW - days_ago * DAY, timezone.utc).isoformat()
+
+
+def test_prioritize_orders_by_group_then_age():
+    provider_tag, not_available_tag = 1, 2
+    items = [
+        {"id": 1, "added": _added(100), "tags": []},
+        {"id": 2, "added": _added(100), "tags": [not_available_tag]},
+        {"id": 3, "added": _added(100), "tags": [provider_tag]},
+        {"id": 4, "added": _added(1), "tags": []},
+        {"id": 5, "added": _added(50), "tags": []},
+        {"id": 6, "added": _added(10), "tags": []},
+        {"id": 7, "added": _added(100), "tags": [provider_tag]},
+        {"id": 8, "added": _added(100), "tags": []},
+    ]
+    checked = {1: NOW - 5 * DAY, 2: NOW - 9 * DAY, 3: NOW - 2 * DAY, 4: NOW - DAY}
+    checked.update({7: NOW - 3 * DAY, 8: NOW - 6 * DAY})
+
+    ordered = priority.prioritize(items, checked, {provider_tag}, not_available_tag, now=NOW)
+    assert [item["id"] for item in ordered] == [
+        # Never checked, newest first
+        6,
+        5,
+        # Recently added
+        4,
+        # Provider tags, checked longest ago first
+        7,
+        3,
+        # The rest
+        8,
+        1,
+        # Not available
+        2,
+    ]
+
+
+def test_budgeted_runs_resolve_the_items_never_checked_first(library, monkeypatch):
+    servers = library("radarr", size=30)
+
+    get_movie_providers = RadarrActions._get_movie_providers
+    resolved = []
+
+    def recorded(self, movie, *args, **kwargs):
+        resolved.append(movie["id"])
+        return get_movie_providers(self, movie, *args, **kwargs)
+
+    monkeypatch.setattr(RadarrActions, "_get_movie_providers", recorded)
+
+    result = runner.invoke(app, ["radarr", "tag", "--request-budget", "10"])
+    assert result.exit_code == 0, result.output
+    first_run = list(resolved)
+    assert 0 < len(first_run) < len(servers.arr.items)
+
+    # The next run starts with what the first one deferred
+    resolved.clear()
+    result = runner.invoke(app, ["radarr", "tag", "--request-budget", "1000"])
+    assert result.exit_code == 0, result.output
+
+    deferred = len(servers.arr.items) - len(first_run)
+    assert set(resolved[:deferred]) == set(servers.arr.items) - set(first_run)
@@ -0,0 +1,96 @@
+import pytest
+
+from typer.testing import CliRunner
+
+from tagarr.core.catalogue import Catalogue
+from tagarr.main import app
+
+
+runner = CliRunner()
+
+
+def _title(jw_id, tmdb_id=None, imdb_id=None):
+    external_ids = []
+    if tmdb_id:
+        external_ids.append({"provider": "tmdb", "external_id": str(tmdb_id)})
+    if imdb_id:
+        external_ids.append({"provider": "imdb", "external_id": imdb_id})
+    return {"id": jw_id, "external_ids": external_ids}
+
+
+class FakeJustWatch:
+    def __init__(self, catalogues):
+        self.catalogues = catalogues
+        self.crawls = []
+
+    def iter_catalogue(self, package, content_type, page_size):
+        self.crawls.append(package)
+        return iter(self.catalogues[package])
+
+
+PROVIDERS = {
+    8: {"short_name": "nfx", "clear_name": "Netflix"},
+    9: {"short_name": "amp", "clear_name": "Amazon Prime Video"},
+}
+
+
+def test_catalogue_joins_by_tmdb_and_imdb_id():
+    justwatch = FakeJustWatch(
+        {
+            "nfx": [_title("tm1", tmdb_id=603, imdb_id="tt0133093"), _title("tm2", tmdb_id=604)],
+            "amp": [_title("tm1", tmdb_id=603), _title("tm3", imdb_id="tt0234215")],
+        }
+    )
+    catalogue = Catalogue("movie")
+    catalogue.crawl(justwatch, PROVIDERS)
+
+    assert catalogue.find({"tmdb": 603}) == ("tm1", {8, 9})
+    assert catalogue.find({"tmdb": 604, "imdb": "tt0000001"}) == ("tm2", {8})
+
+    # The IMDB ID is used when the TMDB ID is unknown or missing
+    assert catalogue.find({"tmdb": 999, "imdb": "tt0234215"}) == ("tm3", {9})
+    assert catalogue.find({"imdb": "tt0133093"}) == ("tm1", {8, 9})
+
+    # In no catalogue, so on no provider
+    assert catalogue.find({"tmdb": 999, "imdb": "tt0000001"}) == (None, set())
+    assert catalogue.find({}) == (None, set())
+
+
+def test_catalogue_crawls_every_provider_once():
+    justwatch = FakeJustWatch({"nfx": [_title("tm1", tmdb_id=603)], "amp": []})
+    catalogue = Catalogue("movie")
+
+    catalogue.crawl(justwatch, {8: PROVIDERS[8]})
+    catalogue.crawl(justwatch, PROVIDERS)
+    catalogue.crawl(justwatch, PROVIDERS)
+
+    assert justwatch.crawls == ["nfx", "amp"]
+    assert catalogue.crawled == {8, 9}
+
+
+def _tags(server):
+    return {
+        arr_id: sorted(server.tags[tag_id]["label"] for tag_id in item["tags"])
+        for arr_id, item in server.items.items()
+    }
+
+
+@pytest.mark.parametrize("service", ["radarr", "sonarr"])
+def test_catalogue_mode_tags_like_the_title_lookups(library, no_config, service):
+    lookups = library(service)
+    result = runner.invoke(app, [service, "tag"])
+    assert result.exit_code == 0, result.output
+
+    # Its own data directory, so nothing is known of the library yet
+    crawled = library(service, data_dir=str(no_config / "crawled"))
+    result = runner.invoke(app, [service, "tag", "--catalogue"])
+    assert result.exit_code == 0, result.output
+
+    assert _tags(crawled.arr) == _tags(lookups.arr)
+
+    # The titles are not looked up one by one
+    assert crawled.justwatch.requests["graphql node"] == 0
+    assert (
+        crawled.justwatch.requests["graphql popularTitles"]
+        < lookups.justwatch.requests["graphql popularTitles"]
+    )
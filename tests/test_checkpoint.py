@@ -0,0 +1,132 @@
+import json
+
+from typer.testing import CliRunner
+
+from tagarr.core.radarr_actions import RadarrActions
+from tagarr.main import app
+from tagarr.utils import checkpoint as checkpoint_module
+from tagarr.utils.checkpoint import Checkpoint, library_snapshot
+
+
+runner = CliRunner()
+
+
+def _interrupted_run(path):
+    checkpoint = Checkpoint(path)
+    checkpoint.begin("radarr tag", "snapshot", [8, 9])
+    checkpoint.add_result(1, {"title": "Up", "radarr_object": {"id": 1}, "providers": ["Netflix"]})
+    checkpoint.add_result(2, None)
+    checkpoint.mark_written(1)
+    checkpoint.close()
+
+
+def test_resume_reuses_results_and_skips_written_items(tmp_path):
+    path = tmp_path / "tag.jsonl"
+    _interrupted_run(path)
+
+    checkpoint = Checkpoint(path, resume=True)
+    checkpoint.begin("radarr tag", "snapshot", [9, 8])
+
+    # The Radarr/Sonarr objects are not stored, they are read again from the library
+    assert checkpoint.get_result(1) == {"title": "Up", "providers": ["Netflix"]}
+    assert checkpoint.has_result(2) and checkpoint.get_result(2) is None
+    assert not checkpoint.has_result(3)
+    assert checkpoint.is_written(1) and not checkpoint.is_written(2)
+
+    checkpoint.add_result(3, None)
+    checkpoint.finish()
+    assert not path.exists()
+
+
+def test_checkpoint_of_another_run_is_not_resumed(tmp_path):
+    path = tmp_path / "tag.jsonl"
+
+    for command, snapshot, providers in [
+        ("radarr clean", "snapshot", [8, 9]),
+        ("radarr tag", "changed library", [8, 9]),
+        ("radarr tag", "snapshot", [8]),
+    ]:
+        _interrupted_run(path)
+
+        checkpoint = Checkpoint(path, resume=True)
+        checkpoint.begin(command, snapshot, providers)
+        assert checkpoint.results == {} and checkpoint.written == set()
+        checkpoint.close()
+
+        # The new run starts its own checkpoint
+        header = json.loads(path.read_text().splitlines()[0])
+        assert header == {"command": command, "snapshot": snapshot, "providers": providers}
+
+
+def test_resume_skips_a_line_cut_short_by_the_interruption(tmp_path):
+    path = tmp_path / "tag.jsonl"
+    _interrupted_run(path)
+    with open(path, "a") as _file:
+        _file.write('{"id": 3, "res')
+
+    checkpoint = Checkpoint(path, resume=True)
+    checkpoint.begin("radarr tag", "snapshot", [8, 9])
+    assert sorted(checkpoint.results) == [1, 2]
+    checkpoint.close()
+
+
+def test_runs_without_resume_start_over(tmp_path):
+    path = tmp_path / "tag.jsonl"
+    _interrupted_run(path)
+
+    checkpoint = Checkpoint(path)
+    checkpoint.begin("radarr tag", "snapshot", [8, 9])
+    assert checkpoint.results == {} and checkpoint.written == set()
+    checkpoint.close()
+    assert len(path.read_text().splitlines()) == 1
+
+
+def test_library_snapshot_ignores_tags_and_order():
+    movies = [
+        {"id": 2, "title": "Down", "tmdbId": 20, "imdbId": "tt2", "tags": []},
+        {"id": 1, "title": "Up", "tmdbId": 10, "imdbId": "tt1", "tags": [1]},
+    ]
+    retagged = [dict(movie, tags=[3]) for movie in reversed(movies)]
+    renamed = [dict(movies[0], title="Sideways"), movies[1]]
+
+    snapshot = library_snapshot(movies, ["tmdbId", "imdbId"])
+    assert library_snapshot(retagged, ["tmdbId", "imdbId"]) == snapshot
+    assert library_snapshot(renamed, ["tmdbId", "imdbId"]) != snapshot
+
+
+def test_resumed_tag_run_finishes_an_interrupted_one(library, no_config, monkeypatch):
+    servers = library("radarr", size=20)
+    monkeypatch.setattr(checkpoint_module, "FLUSH_INTERVAL", 0)
+
+    # The run stops after resolving half of the library
+    get_movie_providers = RadarrActions._get_movie_providers
+    calls = []
+
+    def interrupted(self, *args, **kwargs):
+        calls.append(args[0]["id"])
+        if len(calls) > 10:
+            raise RuntimeError("interrupted")
+        return get_movie_providers(self, *args, **kwargs)
+
+    monkeypatch.setattr(RadarrActions, "_get_movie_providers", interrupted)
+    result = runner.invoke(app, ["radarr", "tag"])
+    assert isinstance(result.exception, RuntimeError)
+
+    checkpoints = list((no_config / ".tagarr" / "data" / "checkpoints").iterdir())
+    assert len(checkpoints) == 1
+    assert any(item["tags"] for item in servers.arr.items.values())
+
+    # Only the movies left are resolved again
+    resolved_again = []
+
+    def resumed(self, *args, **kwargs):
+        resolved_again.append(args[0]["id"])
+        return get_movie_providers(self, *args, **kwargs)
+
+    monkeypatch.setattr(RadarrActions, "_get_movie_providers", resumed)
+    result = runner.invoke(app, ["radarr", "tag", "--resume"])
+    assert result.exit_code == 0, result.output
+
+    assert set(resolved_again).isdisjoint(calls[:10])
+    assert sorted(resolved_again + calls[:10]) == sorted(servers.arr.items)
+    assert not checkpoints[0].exists()
@@ -0,0 +1,99 @@
+import sqlite3
+import time
+
+import pytest
+
+from datetime import datetime, timezone
+from typer.testing import CliRunner
+
+from tagarr.main import app
+
+
+runner = CliRunner()
+
+
+def _provider_tags(arr):
+    """The IDs of the provider tags on each item of the Arr stand-in, by item ID."""
+    provider_tag_ids = {tag["id"] for tag in arr.tags.values() if tag["label"] != "no-streaming"}
+    return {item_id: set(item["tags"]) & provider_tag_ids for item_id, item in arr.items.items()}
+
+
+def _execute(home, statement, parameters=()):
+    """Run a statement on the local store of a test run."""
+    with sqlite3.connect(home / ".tagarr" / "data" / "tagarr.db") as connection:
+        return connection.execute(statement, parameters).fetchall()
+
+
+def _tag_then_end_offers(service, servers):
+    result = runner.invoke(app, [service, "tag"])
+    assert result.exit_code == 0, result.output
+
+    tagged = _provider_tags(servers.arr)
+    assert any(tagged.values())
+
+    # The offers end without JustWatch announcing it
+    for node in servers.catalogue.titles.values():
+        node["offers"] = []
+
+    servers.justwatch.reset_counts()
+    return tagged
+
+
+@pytest.mark.parametrize("service", ["radarr", "sonarr"])
+def test_clean_skips_recently_checked_titles(library, service):
+    servers = library(service)
+    tagged = _tag_then_end_offers(service, servers)
+
+    result = runner.invoke(app, [service, "clean"])
+    assert result.exit_code == 0, result.output
+
+    assert _provider_tags(servers.arr) == tagged
+    assert servers.justwatch.requests["graphql node"] == 0
+
+
+@pytest.mark.parametrize("service", ["radarr", "sonarr"])
+def test_clean_rechecks_titles_checked_too_long_ago(library, no_config, service):
+    servers = library(service)
+    _tag_then_end_offers(service, servers)
+
+    # The default maximum age is a day
+    _execute(no_config, "UPDATE availability SET checked = checked - 2 * 86400")
+
+    result = runner.invoke(app, [service, "clean"])
+    assert result.exit_code == 0, result.output
+
+    assert not any(_provider_tags(servers.arr).values())
+
+
+def test_clean_recheck_days_zero_rechecks_every_run(library):
+    servers = library("radarr", clean_recheck_days=0)
+    _tag_then_end_offers("radarr", servers)
+
+    result = runner.invoke(app, ["radarr", "clean"])
+    assert result.exit_code == 0, result.output
+
+    assert not any(_provider_tags(servers.arr).values())
+
+
+def test_clean_removes_tags_when_offers_expire(library, no_config):
+    servers = library("radarr")
+
+    expires = int(time.time()) + 3600
+    available_to = datetime.fromtimestamp(expires, timezone.utc).isoformat()
+    for node in servers.catalogue.titles.values():
+        for offer in node["offers"]:
+            offer["availableTo"] = available_to
+
+    _tag_then_end_offers("radarr", servers)
+
+    # Titles on a provider are rechecked when their offers end, well before the maximum age
+    next_checks = _execute(no_config, "SELECT next_check FROM checks WHERE outcome = 'available'")
+    assert next_checks
+    assert all(next_check == pytest.approx(expires) for (next_check,) in next_checks)
+
+    _execute(no_config, "UPDATE checks SET next_check = next_check - 7200")
+
+    result = runner.invoke(app, ["radarr", "clean"])
+    assert result.exit_code == 0, result.output
+
+    assert not any(_provider_tags(servers.arr).values())
@@ -0,0 +1,47 @@
+import pytest
+
+from typer.testing import CliRunner
+
+from tagarr.main import app
+
+
+runner = CliRunner()
+
+
+@pytest.mark.parametrize(
+    "args",
+    [
+        ["--help"],
+        ["radarr", "--help"],
+        ["radarr", "tag", "--help"],
+        ["radarr", "clean", "--help"],
+        ["sonarr", "--help"],
+        ["sonarr", "tag", "--help"],
+        ["sonarr", "apply", "--help"],
+    ],
+)
+def test_help_without_config(no_config, args):
+    result = runner.invoke(app, args)
+
+    assert result.exit_code == 0, result.output
+    assert "Usage" in result.output
+
+
+@pytest.mark.parametrize("service", ["radarr", "sonarr"])
+def test_unknown_instance_without_config(no_config, service):
+    result = runner.invoke(app, [service, "--instance", "missing", "tag"])
+
+    assert result.exit_code == 2
+    assert "missing" in result.output
+
+
+@pytest.mark.parametrize("service", ["radarr", "sonarr"])
+@pytest.mark.parametrize("command", ["tag", "clean"])
+@pytest.mark.parametrize(
+    "option", [["--record", "http.jsonl.gz"], ["--trace", "trace.jsonl"], ["--profile=tagarr"]]
+)
+def test_workers_refuse_single_process_options(no_config, service, command, option):
+    result = runner.invoke(app, option + [service, command, "--workers", "2"])
+
+    assert result.exit_code == 2
+    assert "--workers cannot be combined with" in result.output
@@ -0,0 +1,16 @@
+import pytest
+import yaml
+
+from tagarr.utils.config import Config
+
+
+@pytest.mark.parametrize("service", ["radarr", "sonarr"])
+def test_verify_ssl_is_on_unless_disabled(no_config, service):
+    config_file = no_config / ".tagarr.yml"
+    section = {"url": "https://arr.example", "api_key": "key"}
+
+    config_file.write_text(yaml.safe_dump({service: section}))
+    assert getattr(Config(), f"{service}_verify_ssl") is True
+
+    config_file.write_text(yaml.safe_dump({service: dict(section, verify_ssl=False)}))
+    assert getattr(Config(), f"{service}_verify_ssl") is False
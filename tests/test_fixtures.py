@@ -0,0 +1,43 @@
+import gzip
+
+import yaml
+
+from typer.testing import CliRunner
+
+from tagarr.main import app
+
+
+runner = CliRunner()
+
+
+def test_replayed_run_matches_the_recorded_one_offline(library, no_config):
+    servers = library("radarr", size=10)
+    args = ["radarr", "tag", "--dry-run", "--output", "jsonl"]
+
+    recorded = runner.invoke(app, ["--record", "run.jsonl.gz", *args])
+    assert recorded.exit_code == 0, recorded.output
+    assert recorded.stdout
+
+    # The API key of the Arr server is left out of the fixture
+    with gzip.open(no_config / "run.jsonl.gz", "rt") as _file:
+        assert "benchmark" not in _file.read()
+
+    servers.justwatch.stop()
+    servers.arr.stop()
+
+    # A fresh data directory, so every request of the recorded run is made again
+    config_file = no_config / ".tagarr.yml"
+    config = yaml.safe_load(config_file.read_text())
+    config["general"]["data_dir"] = str(no_config / "replay")
+    config_file.write_text(yaml.safe_dump(config))
+
+    replayed = runner.invoke(app, ["--replay", "run.jsonl.gz", "--replay-speed", "0", *args])
+    assert replayed.exit_code == 0, replayed.output
+    assert sorted(replayed.stdout.splitlines()) == sorted(recorded.stdout.splitlines())
+
+
+def test_record_and_replay_cannot_be_combined(library):
+    library("radarr")
+
+    result = runner.invoke(app, ["--record", "a.gz", "--replay", "b.gz", "radarr", "tag"])
+    assert result.exit_code == 2
@@ -0,0 +1,48 @@
+import gzip
+
+from typer.testing import CliRunner
+
+from tagarr.main import app
+from tagarr.utils.id_mapping import MappingReader
+from tagarr.utils.store import open_store
+
+
+runner = CliRunner()
+
+
+def test_mapping_reader_skips_malformed_lines(tmp_path):
+    path = tmp_path / "series.jsonl.gz"
+    with gzip.open(path, "wt") as _file:
+        _file.write('{"tvdb_id": 81189, "tmdb_id": 1396}\n')
+        _file.write('{"tvdb_id": 121361, "tmdb_\n')
+        _file.write("\n")
+        _file.write("[81189, 1396]\n")
+        _file.write('{"TheTVDB": "79168", "imdbId": "tt0108778", "tmdb": "1668"}\n')
+        _file.write('{"tvdb_id": 73244}\n')
+
+    reader = MappingReader(path)
+    assert list(reader) == [
+        ("tv", "tvdb", "81189", 1396),
+        ("tv", "tvdb", "79168", 1668),
+        ("tv", "imdb", "tt0108778", 1668),
+    ]
+    assert (reader.rows, reader.skipped) == (5, 3)
+
+
+def test_import_loads_the_mappings_into_the_store(no_config):
+    (no_config / "series.csv").write_text(
+        "tvdb_id,imdb_id,tmdb_id\n81189,,1396\n79168,tt0108778,\n"
+    )
+
+    result = runner.invoke(app, ["ids", "import", "series.csv"])
+    assert result.exit_code == 0, result.output
+    assert "Importadas 1 filas" in result.output
+
+    store = open_store(no_config / ".tagarr" / "data")
+    assert store.get_tmdb_id("tv", "tvdb", 81189) == 1396
+    assert store.count_id_mappings() == 1
+    store.close()
+
+    # Only series are mapped
+    result = runner.invoke(app, ["ids", "import", "series.csv", "--type", "movie"])
+    assert result.exit_code == 2
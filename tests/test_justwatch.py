@@ -0,0 +1,68 @@
+from itertools import islice
+
+from tagarr.modules.justwatch.justwatch import JustWatch
+
+
+class PagedJustWatch(JustWatch):
+    """A client answering popularTitles from a list of titles, recording the requested pages."""
+
+    def __init__(self, titles):
+        self.titles = titles
+        self.country = "US"
+        self.language = "en"
+        self.pages = []
+
+    def _graphql_query(self, query, variables=None):
+        offset = int(variables.get("after") or 0)
+        first = variables["first"]
+        self.pages.append((offset, first))
+
+        page = self.titles[offset : offset + first]
+        return {
+            "popularTitles": {
+                "pageInfo": {
+                    "endCursor": str(offset + len(page)),
+                    "hasNextPage": offset + len(page) < len(self.titles),
+                },
+                "edges": [{"node": {"id": jw_id}} for jw_id in page],
+            }
+        }
+
+
+TITLES = [f"tm{index}" for index in range(1, 46)]
+
+
+def test_query_title_requests_pages_as_they_are_consumed():
+    justwatch = PagedJustWatch(TITLES)
+
+    results = justwatch.query_title("Up", "movie", page_size=20)
+    assert justwatch.pages == []
+
+    assert [item["id"] for item in islice(results, 20)] == TITLES[:20]
+    assert justwatch.pages == [(0, 20)]
+
+    assert next(results)["id"] == "tm21"
+    assert justwatch.pages == [(0, 20), (20, 20)]
+
+    # The last page ends the results
+    assert len(list(results)) == 24
+    assert justwatch.pages == [(0, 20), (20, 20), (40, 20)]
+
+
+def test_query_title_requests_no_more_than_max_items():
+    justwatch = PagedJustWatch(TITLES)
+
+    results = list(justwatch.query_title("Up", "movie", page_size=20, max_items=25))
+    assert [item["id"] for item in results] == TITLES[:25]
+    assert justwatch.pages == [(0, 20), (20, 5)]
+
+    justwatch.pages = []
+    assert list(justwatch.query_title("Up", "movie", max_items=0)) == []
+    assert justwatch.pages == []
+
+
+def test_catalogue_is_listed_in_catalogue_pages():
+    justwatch = PagedJustWatch(TITLES * 5)
+
+    assert len(list(justwatch.iter_catalogue("nfx", "movie"))) == 225
+    assert justwatch.pages == [(0, 100), (100, 100), (200, 100)]
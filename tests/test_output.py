@@ -0,0 +1,48 @@
+import json
+
+import pytest
+
+from typer.testing import CliRunner
+
+from tagarr.core.radarr_actions import RadarrActions
+from tagarr.main import app
+
+
+runner = CliRunner()
+
+
+@pytest.mark.parametrize("service", ["radarr", "sonarr"])
+def test_jsonl_output_keeps_logs_off_stdout(library, service):
+    library(service)
+
+    result = runner.invoke(app, [service, "tag", "-o", "jsonl"])
+    assert result.exit_code == 0, result.output
+
+    records = [json.loads(line) for line in result.stdout.splitlines()]
+    assert records
+    assert all(record["action"] == "add" for record in records)
+
+    # The logs of the command itself go to stderr
+    result = runner.invoke(app, ["--debug", service, "clean", "-o", "jsonl"])
+    assert result.exit_code == 0, result.output
+    assert "Got clean as subcommand" in result.stderr
+    assert "Got clean as subcommand" not in result.stdout
+
+
+def test_jsonl_output_leaves_out_failed_writes(library, monkeypatch):
+    library("radarr")
+    put_movie = RadarrActions._put_movie
+
+    def fail_odd_ids(self, movie_obj):
+        if movie_obj["id"] % 2:
+            raise RuntimeError("Radarr is down")
+        return put_movie(self, movie_obj)
+
+    monkeypatch.setattr(RadarrActions, "_put_movie", fail_odd_ids)
+
+    result = runner.invoke(app, ["radarr", "tag", "-o", "jsonl"])
+    assert result.exit_code == 0, result.output
+
+    ids = [json.loads(line)["id"] for line in result.stdout.splitlines()]
+    assert ids
+    assert all(arr_id % 2 == 0 for arr_id in ids)
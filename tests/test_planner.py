@@ -0,0 +1,47 @@
+from tagarr.core import planner
+
+
+def test_plan_streams_done_changes_to_its_listener_without_keeping_them():
+    streamed = []
+    plan = planner.Plan(streamed.append)
+
+    written = planner.plan_change(1, "Up", [], {"netflix": 1}, add=["netflix"])
+    failed = planner.plan_change(2, "Failed", [], {"netflix": 1}, add=["netflix"])
+    for change in (written, failed):
+        plan.add(change)
+    plan.add(planner.plan_change(3, "Down", [1], {"netflix": 1}, add=["netflix"]))
+    plan.done(written)
+
+    assert [change.arr_id for change in streamed] == [1]
+    assert plan.changes == []
+    assert plan.counts == {planner.ADD: 2, planner.NOOP: 1}
+
+
+def test_plan_keeps_done_changes_without_listener():
+    plan = planner.Plan()
+
+    change = planner.plan_change(1, "Up", [], {"netflix": 1}, add=["netflix"])
+    plan.add(change)
+    assert plan.changes == []
+
+    plan.done(change)
+    assert [change.arr_id for change in plan.changes] == [1]
+
+
+def test_group_changes_batches_what_is_left_of_partly_applied_changes():
+    tag_ids = {"netflix": 1, "hbo": 2, "other": 3}
+    change = planner.Change(7, "Half", [2], add=["netflix"], remove=["hbo"])
+
+    # Added but not removed: only the removal is left
+    batches, up_to_date, conflicts = planner.group_changes([change], {7: {1, 2}}, tag_ids)
+    assert [(key, [left.arr_id for left in batch]) for key, batch in batches.items()] == [
+        (((), ("hbo",)), [7])
+    ]
+    assert up_to_date == conflicts == []
+
+    batches, up_to_date, conflicts = planner.group_changes([change], {7: {1}}, tag_ids)
+    assert batches == {} and up_to_date == [change] and conflicts == []
+
+    # Retagged since planning
+    batches, up_to_date, conflicts = planner.group_changes([change], {7: {2, 3}}, tag_ids)
+    assert batches == {} and up_to_date == [] and conflicts == [change]
@@ -0,0 +1,43 @@
+import pstats
+
+from typer.testing import CliRunner
+
+from tagarr.main import _expand_optional_values, app
+from tagarr.utils.profiling import DEFAULT_PATH, Profiler
+
+
+runner = CliRunner()
+
+
+def test_bare_profile_flag_uses_the_default_path():
+    assert _expand_optional_values(["--profile", "radarr", "tag"]) == [
+        f"--profile={DEFAULT_PATH}",
+        "radarr",
+        "tag",
+    ]
+    assert _expand_optional_values(["--profile=run", "radarr"]) == ["--profile=run", "radarr"]
+
+
+def test_profiler_files_drop_a_profile_suffix(tmp_path):
+    profiler = Profiler(tmp_path / "run.prof")
+
+    assert profiler.pstats_path == tmp_path / "run.pstats"
+    assert profiler.wall_path == tmp_path / "run.wall.collapsed"
+    assert profiler.cpu_path == tmp_path / "run.cpu.collapsed"
+
+
+def test_profiled_run_writes_the_profiles(library, no_config):
+    library("radarr", size=10)
+
+    result = runner.invoke(app, ["--profile=run", "radarr", "tag"])
+    assert result.exit_code == 0, result.output
+    assert "Wall time" in result.stderr
+
+    # The deterministic profile covers the subcommand
+    stats = pstats.Stats(str(no_config / "run.pstats"))
+    assert any(function == "tag" for _, _, function in stats.stats)
+
+    # Collapsed stacks: "thread;frame;frame count"
+    for line in (no_config / "run.wall.collapsed").read_text().splitlines():
+        stack, count = line.rsplit(" ", 1)
+        assert ";" in stack and int(count) > 0
@@ -0,0 +1,95 @@
+import json
+
+import pytest
+
+from typer.testing import CliRunner
+
+from tagarr.main import app
+from tagarr.utils.store import open_store
+
+
+runner = CliRunner()
+
+
+def _report(*args):
+    result = runner.invoke(app, ["report", *args, "-o", "json"])
+    assert result.exit_code == 0, result.output
+
+    return json.loads(result.output.strip().splitlines()[-1])
+
+
+def _arr_labels(arr, item_id):
+    return sorted(arr.tags[tag_id]["label"] for tag_id in arr.items[item_id]["tags"])
+
+
+@pytest.mark.parametrize("service", ["radarr", "sonarr"])
+def test_report_shows_the_tags_written_by_tag(library, service):
+    servers = library(service)
+
+    result = runner.invoke(app, [service, "tag"])
+    assert result.exit_code == 0, result.output
+
+    records = _report("titles")
+    assert records
+    for record in records:
+        assert record["tags"] == _arr_labels(servers.arr, record["id"])
+
+    netflix = {
+        item_id for item_id in servers.arr.items if "netflix" in _arr_labels(servers.arr, item_id)
+    }
+    assert netflix
+    assert {record["id"] for record in _report("titles", "--tag", "netflix")} == netflix
+
+
+@pytest.mark.parametrize("service", ["radarr", "sonarr"])
+@pytest.mark.parametrize("args", [["tag", "--dry-run"], ["clean", "--dry-run"], ["plan"]])
+def test_runs_that_write_nothing_leave_the_store(library, no_config, service, args):
+    library(service)
+
+    result = runner.invoke(app, [service, *args])
+    assert result.exit_code == 0, result.output
+    assert _report("titles") == []
+
+    # Nothing is scheduled either, the next run checks every title again
+    store = open_store(no_config / ".tagarr" / "data")
+    assert store.execute("SELECT COUNT(*) FROM checks") == [(0,)]
+    store.close()
+
+
+@pytest.mark.parametrize("service", ["radarr", "sonarr"])
+def test_report_shows_the_tags_written_by_apply(library, service):
+    servers = library(service)
+
+    result = runner.invoke(app, [service, "tag"])
+    assert result.exit_code == 0, result.output
+
+    servers.catalogue.churn(0.5)
+
+    result = runner.invoke(app, [service, "plan", "--clean", "--out", "plan.jsonl"])
+    assert result.exit_code == 0, result.output
+    result = runner.invoke(app, [service, "apply", "plan.jsonl"])
+    assert result.exit_code == 0, result.output
+
+    records = _report("titles")
+    assert any(record["tags"] for record in records)
+    for record in records:
+        assert record["tags"] == _arr_labels(servers.arr, record["id"])
+
+
+def test_report_selects_providers_by_clear_name_or_tag_label(library):
+    servers = library("radarr")
+
+    result = runner.invoke(app, ["radarr", "tag"])
+    assert result.exit_code == 0, result.output
+
+    prime = {
+        item_id
+        for item_id in servers.arr.items
+        if "amazon-prime-video" in _arr_labels(servers.arr, item_id)
+    }
+    assert prime
+    for provider in ("Amazon Prime Video", "amazon-prime-video"):
+        assert {record["id"] for record in _report("titles", "-p", provider)} == prime
+
+    result = runner.invoke(app, ["report", "titles", "-p", "hbo-max"])
+    assert result.exit_code == 2
@@ -0,0 +1,143 @@
+import pytest
+
+from tagarr.core.resolver import Lookup, Resolver, rank_candidates
+from tagarr.modules.justwatch.exceptions import JustWatchNotFound
+from tagarr.utils import store
+
+
+MOVIE = {"external_ids": [{"provider": "tmdb", "external_id": "603"}], "offers": []}
+
+
+class FakeJustWatch:
+    """Answers title searches with `results`, or with `tier_results` by search tier."""
+
+    def __init__(self, results=(), details=None, tier_results=None):
+        self.tier_results = tier_results or {}
+        self.results = list(results)
+        self.details = details or {}
+        self.queries = []
+        self.detail_requests = []
+
+    @staticmethod
+    def tier(payload):
+        if "providers" not in payload:
+            return "open"
+        if payload.get("release_year_from") != payload.get("release_year_until"):
+            return "year"
+        return "exact"
+
+    def query_title(self, query, content_type, **payload):
+        tier = self.tier(payload)
+        self.queries.append(tier)
+        return self.tier_results.get(tier, self.results)
+
+    def get_movie(self, jw_id):
+        self.detail_requests.append(jw_id)
+        if jw_id not in self.details:
+            raise JustWatchNotFound()
+        return self.details[jw_id]
+
+
+def _lookup(**kwargs):
+    return Lookup(1, "The Matrix", {"tmdb": 603}, year=1999, **kwargs)
+
+
+@pytest.fixture
+def local_store(tmp_path):
+    local_store = store.Store(tmp_path / "tagarr.db")
+    yield local_store
+    local_store.close()
+
+
+def test_resolved_items_go_straight_to_their_stored_id(local_store):
+    client = FakeJustWatch(
+        [{"id": "tm1", "title": "The Matrix", "external_ids": MOVIE["external_ids"]}],
+        details={"tm1": MOVIE},
+    )
+    resolver = Resolver(client, "movie", local_store)
+
+    assert resolver.resolve(_lookup()) == ("tm1", MOVIE)
+    assert client.queries
+
+    client.queries.clear()
+    lookup = _lookup()
+    assert resolver.resolve(lookup) == ("tm1", MOVIE)
+    assert lookup.step == "stored"
+    assert client.queries == []
+
+
+def test_a_stored_id_gone_from_justwatch_is_searched_again(local_store):
+    local_store.set_resolution("movie", 1, _lookup().fingerprint, "tm404", "search")
+    client = FakeJustWatch(
+        [{"id": "tm1", "title": "The Matrix", "external_ids": MOVIE["external_ids"]}],
+        details={"tm1": MOVIE},
+    )
+
+    lookup = _lookup()
+    assert Resolver(client, "movie", local_store).resolve(lookup) == ("tm1", MOVIE)
+    assert lookup.step == "search"
+    assert local_store.get_resolution("movie", 1, lookup.fingerprint)[0] == "tm1"
+
+
+def test_added_steps_run_when_the_search_misses():
+    client = FakeJustWatch()
+    resolver = Resolver(client, "movie")
+    resolver.add_step("fallback", lambda lookup: ("tm2", MOVIE))
+
+    lookup = _lookup()
+    assert resolver.resolve(lookup) == ("tm2", MOVIE)
+    assert lookup.step == "fallback"
+
+
+def test_searches_escalate_to_the_first_tier_that_finds_the_item():
+    found = [{"id": "tm1", "title": "The Matrix", "external_ids": MOVIE["external_ids"]}]
+    client = FakeJustWatch(tier_results={"exact": [], "year": found}, details={"tm1": MOVIE})
+
+    lookup = _lookup()
+    assert Resolver(client, "movie").resolve(lookup) == ("tm1", MOVIE)
+    assert client.queries == ["exact", "year"]
+    assert lookup.tier == "year"
+
+
+def test_every_tier_is_queried_once_per_item():
+    client = FakeJustWatch()
+    resolver = Resolver(client, "movie")
+
+    lookup = _lookup()
+    assert resolver.match(lookup, {"tmdb": 603}) == (None, None)
+    assert resolver.match(lookup, {"imdb": "tt0133093"}) == (None, None)
+    assert client.queries == ["exact", "year", "open"]
+
+
+@pytest.mark.parametrize(
+    "kwargs, tiers", [({"fast": False}, ["open"]), ({"year": None}, ["exact", "open"])]
+)
+def test_tiers_without_fast_search_or_year(kwargs, tiers):
+    client = FakeJustWatch()
+    lookup = Lookup(1, "The Matrix", {"tmdb": 603}, **dict({"year": 1999}, **kwargs))
+
+    Resolver(client, "movie").resolve(lookup)
+    assert client.queries == tiers
+
+
+def test_candidates_rank_by_title_similarity_then_year_distance():
+    entries = [
+        {"id": "tm1", "title": "Matrix Reloaded", "original_release_year": 2003},
+        {"id": "tm2", "title": "The Matrix", "original_release_year": 2003},
+        {"id": "tm3", "title": "The Matrix", "original_release_year": 1999},
+        {"id": "tm4", "title": "The Matrix!", "original_release_year": 1999},
+    ]
+
+    ranked = [candidate.entry["id"] for candidate in rank_candidates(_lookup(), entries)]
+    assert ranked == ["tm3", "tm4", "tm2", "tm1"]
+
+
+def test_details_are_fetched_best_candidate_first():
+    results = [
+        {"id": "tm1", "title": "Matrix Reloaded", "original_release_year": 2003},
+        {"id": "tm2", "title": "The Matrix", "original_release_year": 1999},
+    ]
+    client = FakeJustWatch(results, details={"tm1": {"external_ids": []}, "tm2": MOVIE})
+
+    assert Resolver(client, "movie").resolve(_lookup()) == ("tm2", MOVIE)
+    assert client.detail_requests == ["tm2"]
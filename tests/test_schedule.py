@@ -0,0 +1,89 @@
+import time
+
+import pytest
+
+from types import SimpleNamespace
+
+from tagarr.core import schedule
+from tagarr.utils import store
+
+
+DAY = 86400
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SimpleNamespace(now=time.time())
+    monkeypatch.setattr(schedule, "time", SimpleNamespace(time=lambda: clock.now))
+    return clock
+
+
+@pytest.fixture
+def local_store(tmp_path):
+    local_store = store.Store(tmp_path / "tagarr.db")
+    yield local_store
+    local_store.close()
+
+
+def _next_check(local_store, arr_id=1):
+    return local_store.get_check("radarr", arr_id)[4]
+
+
+def test_titles_without_providers_back_off(local_store, clock):
+    checks = schedule.CheckSchedule(local_store, "radarr")
+
+    delays = []
+    for _ in range(7):
+        checks.record(1, "abc", schedule.NO_PROVIDER)
+        delays.append(round((_next_check(local_store) - clock.now) / DAY))
+
+    assert delays == [1, 2, 4, 8, 16, 30, 30]
+    assert checks.pending(1, "abc") == (schedule.NO_PROVIDER, None, 0)
+
+    # The backoff starts over when the item changes
+    assert checks.pending(1, "other") is None
+    checks.record(1, "other", schedule.NOT_FOUND)
+    assert round((_next_check(local_store) - clock.now) / DAY) == 1
+
+
+def test_titles_are_due_once_their_recheck_time_passes(local_store, clock):
+    checks = schedule.CheckSchedule(local_store, "radarr")
+    checks.record(1, "abc", schedule.NOT_FOUND)
+
+    clock.now += DAY - 1
+    assert checks.pending(1, "abc") is not None
+
+    clock.now += 1
+    assert checks.pending(1, "abc") is None
+
+
+def test_available_titles_are_rechecked_when_their_first_offer_ends(local_store, clock):
+    checks = schedule.CheckSchedule(local_store, "radarr", interval=7 * DAY)
+
+    checks.record(1, "abc", schedule.AVAILABLE, "tm1", expires=clock.now + DAY)
+    assert _next_check(local_store) == clock.now + DAY
+
+    # Without an end date, or one after the interval, they wait for the interval
+    checks.record(1, "abc", schedule.AVAILABLE, "tm1")
+    assert _next_check(local_store) == clock.now + 7 * DAY
+    checks.record(1, "abc", schedule.AVAILABLE, "tm1", expires=clock.now + 30 * DAY)
+    assert _next_check(local_store) == clock.now + 7 * DAY
+
+
+def test_no_recheck_interval_checks_available_titles_every_run(local_store, clock):
+    checks = schedule.CheckSchedule(local_store, "radarr", interval=0)
+    local_store.set_availability("radarr", 1, "Movie", "tm1", 1, 1, [])
+
+    checks.record(1, "abc", schedule.AVAILABLE, "tm1")
+    assert checks.pending(1, "abc") is None
+
+
+def test_available_titles_keep_their_stored_availability_up_to_a_maximum_age(local_store, clock):
+    checks = schedule.CheckSchedule(local_store, "radarr", interval=7 * DAY)
+    local_store.set_availability("radarr", 1, "Movie", "tm1", 5, 7, [])
+    checks.record(1, "abc", schedule.AVAILABLE, "tm1")
+
+    clock.now += 2 * DAY
+    assert checks.pending(1, "abc") == (schedule.AVAILABLE, "tm1", 5)
+    assert checks.pending(1, "abc", max_age=3 * DAY) == (schedule.AVAILABLE, "tm1", 5)
+    assert checks.pending(1, "abc", max_age=DAY) is None
@@ -0,0 +1,99 @@
+import pytest
+
+from typer.testing import CliRunner
+
+from tagarr.main import app
+from tagarr.utils import metrics, sharding
+from tagarr.utils.sharding import Shard
+
+
+runner = CliRunner()
+
+
+@pytest.mark.parametrize("value", ["2", "0/3", "4/3", "1/0", "a/b"])
+def test_shard_parse_refuses_malformed_shards(value):
+    with pytest.raises(ValueError, match="is not a shard"):
+        Shard.parse(value)
+
+
+def test_shards_split_the_library_exactly_once():
+    shards = [Shard.parse(f"{index}/3") for index in range(1, 4)]
+    items = [{"id": arr_id} for arr_id in range(1, 301)]
+
+    parts = [shard.filter(items) for shard in shards]
+    assert sorted(item["id"] for part in parts for item in part) == list(range(1, 301))
+    assert all(part for part in parts)
+
+    # The same item always falls in the same shard
+    assert [Shard(1, 3).filter(items) for _ in range(2)] == [parts[0], parts[0]]
+
+
+def _count_shard(shard, items):
+    metrics.increment("test.items", len(shard.filter(items)))
+    return str(shard)
+
+
+def test_run_workers_returns_results_in_shard_order_and_merges_metrics():
+    metrics.reset()
+    items = [{"id": arr_id} for arr_id in range(1, 101)]
+
+    assert sharding.run_workers(_count_shard, 3, items=items) == ["1/3", "2/3", "3/3"]
+    assert metrics.snapshot("test.") == {"test.items": 100}
+    metrics.reset()
+
+
+def test_workers_are_refused_with_single_process_options(monkeypatch):
+    monkeypatch.setattr(sharding, "_single_process_options", [])
+    sharding.check_workers(2)
+
+    sharding.set_single_process_options(["--trace"])
+    sharding.check_workers(1)
+    with pytest.raises(ValueError, match="--trace"):
+        sharding.check_workers(2)
+
+
+def _tags(server):
+    return {
+        arr_id: sorted(server.tags[tag_id]["label"] for tag_id in item["tags"])
+        for arr_id, item in server.items.items()
+    }
+
+
+@pytest.mark.parametrize("service", ["radarr", "sonarr"])
+def test_shard_runs_tag_like_a_run_of_the_whole_library(library, no_config, service):
+    whole = library(service)
+    result = runner.invoke(app, [service, "tag"])
+    assert result.exit_code == 0, result.output
+
+    # Its own data directory, so nothing is known of the library yet
+    sharded = library(service, data_dir=str(no_config / "sharded"))
+    result = runner.invoke(app, [service, "tag", "--shard", "1/2"])
+    assert result.exit_code == 0, result.output
+
+    # The first run writes only the items of its shard
+    tagged = [arr_id for arr_id, labels in _tags(sharded.arr).items() if labels]
+    assert tagged and all(arr_id in Shard(1, 2) for arr_id in tagged)
+
+    result = runner.invoke(app, [service, "tag", "--shard", "2/2"])
+    assert result.exit_code == 0, result.output
+
+    assert _tags(sharded.arr) == _tags(whole.arr)
+
+
+def test_workers_tag_like_a_single_process(library, no_config):
+    single = library("radarr")
+    result = runner.invoke(app, ["radarr", "tag"])
+    assert result.exit_code == 0, result.output
+
+    forked = library("radarr", data_dir=str(no_config / "forked"))
+    result = runner.invoke(app, ["radarr", "tag", "--workers", "3"])
+    assert result.exit_code == 0, result.output
+
+    assert _tags(forked.arr) == _tags(single.arr)
+
+
+def test_workers_cannot_be_combined_with_a_shard(library):
+    library("radarr")
+
+    result = runner.invoke(app, ["radarr", "tag", "--workers", "2", "--shard", "1/2"])
+    assert result.exit_code == 2
@@ -0,0 +1,81 @@
+import pytest
+
+from typer.testing import CliRunner
+
+from tagarr.main import app
+from tagarr.utils import store
+
+
+runner = CliRunner()
+
+
+def test_open_store_is_shared_until_closed(tmp_path):
+    first = store.open_store(tmp_path)
+    assert store.open_store(tmp_path) is first
+
+    store.close_all()
+    second = store.open_store(tmp_path)
+    assert second is not first
+
+    second.close()
+    assert store._stores == {}
+
+
+@pytest.mark.parametrize("workers", ["1", "2"])
+def test_runs_close_the_store(library, workers):
+    library("radarr")
+
+    result = runner.invoke(app, ["radarr", "tag", "--workers", workers])
+    assert result.exit_code == 0, result.output
+    assert store._stores == {}
+
+
+def test_provider_bits_refuse_more_providers_than_bits(tmp_path):
+    local_store = store.Store(tmp_path / "tagarr.db")
+
+    bits = local_store.provider_bits(
+        {provider_id: f"Provider {provider_id}" for provider_id in range(63)}
+    )
+    assert sorted(bits.values()) == list(range(63))
+
+    # Every bit is in use by a stored availability
+    all_bits = (1 << 63) - 1
+    local_store.set_availability("radarr", 1, "Movie", None, all_bits, all_bits, [])
+
+    with pytest.raises(store.TooManyProviders, match="at most 63 providers"):
+        local_store.provider_bits({1000: "One Too Many"})
+
+    # Known providers keep their bits
+    assert local_store.provider_bits({0: "Provider 0"}) == {0: bits[0]}
+    local_store.close()
+
+
+def test_provider_bits_reuse_unused_bits(tmp_path):
+    local_store = store.Store(tmp_path / "tagarr.db")
+
+    bits = local_store.provider_bits(
+        {provider_id: f"Provider {provider_id}" for provider_id in range(63)}
+    )
+    local_store.set_availability(
+        "radarr", 1, "Movie", None, 1 << bits[5], 1 << bits[5], [], changes=[(5, "added")]
+    )
+
+    # The lowest bit no stored availability uses goes to the new provider
+    assert local_store.provider_bits({1000: "New"}) == {1000: 0}
+    assert local_store.provider_bits({5: "Provider 5"}) == {5: bits[5]}
+    assert [row[4] for row in local_store.query_changes(0)] == ["Provider 5"]
+    local_store.close()
+
+
+def test_too_many_providers_is_a_clean_error(library, monkeypatch):
+    library("radarr")
+
+    def provider_bits(self, providers):
+        raise store.TooManyProviders("no bit left")
+
+    monkeypatch.setattr(store.Store, "provider_bits", provider_bits)
+
+    result = runner.invoke(app, ["radarr", "tag"])
+    assert result.exit_code == 1
+    assert "no bit left" in result.output
+    assert result.exception is None or isinstance(result.exception, SystemExit)
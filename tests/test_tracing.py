@@ -0,0 +1,78 @@
+import json
+
+import pytest
+
+from typer.testing import CliRunner
+
+from tagarr.main import app
+from tagarr.utils import tracing
+
+
+runner = CliRunner()
+
+
+def test_spans_add_up_phases_and_requests(tmp_path):
+    tracer = tracing.start(tmp_path / "trace.jsonl")
+    try:
+        with tracing.item("radarr", 1, "Up"):
+            with tracing.phase("search"):
+                tracing.count_request(None)
+                tracing.count_request(None)
+            tracing.count_request(None)
+            tracing.annotate(tier="exact")
+
+        # Re-entering an item adds to its span
+        with tracing.item("radarr", 1, "Up"):
+            with tracing.phase("write"):
+                tracing.count_request(None)
+
+        with tracing.item("radarr", 2, "Down"):
+            pass
+
+        # Requests outside of an item are not counted
+        tracing.count_request(None)
+    finally:
+        tracing.stop()
+
+    spans = [json.loads(line) for line in (tmp_path / "trace.jsonl").read_text().splitlines()]
+    assert [(span["id"], span["requests"]) for span in spans] == [(1, 4), (2, 0)]
+    assert {phase: values["requests"] for phase, values in spans[0]["phases"].items()} == {
+        "search": 2,
+        "other": 1,
+        "write": 1,
+    }
+    assert spans[0]["tier"] == "exact"
+    assert tracer.slowest(1)[0].item_id in (1, 2)
+
+
+def test_disabled_tracing_is_a_no_op():
+    assert tracing.stop() is None
+
+    with tracing.item("radarr", 1, "Up"), tracing.phase("search"):
+        tracing.count_request(None)
+        tracing.annotate(tier="exact")
+
+
+@pytest.mark.parametrize("service", ["radarr", "sonarr"])
+def test_trace_has_a_span_per_library_item(library, no_config, service):
+    servers = library(service, size=10)
+
+    result = runner.invoke(app, ["--trace", "trace.jsonl", "--trace-top", "3", service, "tag"])
+    assert result.exit_code == 0, result.output
+
+    spans = [json.loads(line) for line in (no_config / "trace.jsonl").read_text().splitlines()]
+    assert sorted(span["id"] for span in spans) == sorted(servers.arr.items)
+    assert all(span["service"] == service for span in spans)
+
+    # Every JustWatch request of the run happened for one of the titles
+    lookups = servers.justwatch.requests["graphql popularTitles"]
+    lookups += servers.justwatch.requests["graphql node"]
+    assert sum(span["requests"] for span in spans) >= lookups > 0
+
+
+def test_trace_cannot_be_combined_with_workers(library):
+    library("radarr")
+
+    result = runner.invoke(app, ["--trace", "trace.jsonl", "radarr", "tag", "--workers", "2"])
+    assert result.exit_code == 2
+    assert "--trace" in result.output